@@ -1,5 +1,5 @@
 from django.utils import timezone
-from .models import AuditLog
+from .audit_writer import write_audit_log
 
 def log_attempt(request, action, data=None):
     ip = request.META.get("REMOTE_ADDR")
@@ -19,7 +19,7 @@ def log_attempt(request, action, data=None):
         "data": data or {},
     }
 
-    AuditLog.objects.create(
+    write_audit_log(
         action=action,
         username=username,
         ip_address=ip,
@@ -1,5 +1,6 @@
 # auth_app/admin.py
 from django.contrib import admin
+from .search import search_students
 from .models import (
     User,
     Profile,
@@ -15,6 +16,18 @@ from .models import (
 )
 
 
+class StudentSearchMixin:
+    """Resolve the admin search box through the student search index."""
+    student_search_field = "pk"
+    max_indexed_matches = 2000
+
+    def get_search_results(self, request, queryset, search_term):
+        student_ids = search_students(search_term, limit=self.max_indexed_matches + 1, split_terms=True)
+        if student_ids is None or len(student_ids) > self.max_indexed_matches:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(**{f"{self.student_search_field}__in": student_ids}), False
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ("username", "full_name", "role", "is_staff")
@@ -30,7 +43,7 @@ class ProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(StudentSearchMixin, admin.ModelAdmin):
     list_display = ("student_id", "full_name", "has_face", "created_at")
     search_fields = ("student_id", "full_name")
     list_filter = ("created_at",)
@@ -50,7 +63,8 @@ class RoomAccessAdmin(admin.ModelAdmin):
 
 
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(StudentSearchMixin, admin.ModelAdmin):
+    student_search_field = "student_id"
     list_display = ("student", "room", "status", "confidence", "timestamp")
     list_filter = ("status", "room")
     search_fields = ("student__student_id", "student__full_name")
@@ -78,8 +92,8 @@ class CourseAdmin(admin.ModelAdmin):
 
 @admin.register(CourseSession)
 class CourseSessionAdmin(admin.ModelAdmin):
-    list_display = ("course", "room", "start_time", "end_time")
-    list_filter = ("room",)
+    list_display = ("course", "room", "weekday", "start_time", "end_time")
+    list_filter = ("room", "weekday")
 
 
 @admin.register(Enrollment)
@@ -1,4 +1,38 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def _serving_process():
+    # only the development server's serving process (not its autoreloader
+    # parent); gunicorn and other WSGI servers load the engine per worker
+    # through their own hook (see README), and everything else (management
+    # commands, django-admin, pytest, celery) never needs it
+    if len(sys.argv) < 2 or os.path.basename(sys.argv[0]) != "manage.py" or sys.argv[1] != "runserver":
+        return False
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+
+
+def _worker_count():
+    # gunicorn takes its default worker count from WEB_CONCURRENCY
+    try:
+        return int(os.environ.get("WEB_CONCURRENCY", "1"))
+    except ValueError:
+        return 1
+
+
+def _check_shared_cache():
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend.endswith((".LocMemCache", ".DummyCache")) and _worker_count() > 1:
+        raise ImproperlyConfigured(
+            f"CACHES['default'] is {backend}, which is per process, but WEB_CONCURRENCY="
+            f"{_worker_count()}: version stamps would not reach the other workers. "
+            "Set CACHE_URL to a shared cache (filecache://, redis://, memcache://)."
+        )
+
 
 class AuthAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
@@ -6,3 +40,12 @@ class AuthAppConfig(AppConfig):
 
     def ready(self):
         import auth_app.signals
+        from django.db.backends.signals import connection_created
+        from auth_app.db_writer import configure_sqlite_connection
+
+        _check_shared_cache()
+        connection_created.connect(configure_sqlite_connection, dispatch_uid="auth_app.sqlite_pragmas")
+
+        if getattr(settings, "FACE_EAGER_LOAD", False) and _serving_process():
+            from auth_app.views import preload_face_engine
+            preload_face_engine(with_gallery=False)
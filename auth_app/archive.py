@@ -0,0 +1,374 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Attendance
+
+
+# Cold tier for old Attendance rows: one .npy file per column, sorted by (timestamp, id),
+# listed in manifest.json. Readers only see "purged" segments, so a row is served from one tier.
+
+MANIFEST = "manifest.json"
+COLUMN_DTYPES = {
+    "id": np.int64,
+    "ts": np.int64,
+    "student": np.int64,
+    "room": np.int64,
+    "session": np.int64,
+    "status": np.uint8,
+    "device": np.int32,
+    "confidence": np.float64,
+    "signature": bytes,
+}
+COLUMNS = tuple(COLUMN_DTYPES)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# rows scanned per step when paging backwards through a segment
+SCAN_BLOCK = 65536
+
+_LOCK = threading.Lock()
+_STATE = None  # (manifest path, mtime, [Segment])
+
+
+def archive_dir():
+    return getattr(settings, "ATTENDANCE_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, "archive"))
+
+
+def to_micros(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class Segment:
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.name = os.path.basename(path)
+        self.strings = self.meta["strings"]
+        self.columns = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in COLUMNS}
+        self.first_ts = self.meta["first_ts"]
+        self.last_ts = self.meta["last_ts"]
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def code(self, kind, value):
+        """Index of ``value`` in the string table, or None if no row has it."""
+        try:
+            return self.strings[kind].index(value)
+        except ValueError:
+            return None
+
+    def span(self, start=None, end=None):
+        """[lo, hi) row range with start <= ts < end (microseconds)."""
+        ts = self.columns["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, "left"))
+        hi = len(self) if end is None else int(np.searchsorted(ts, end, "left"))
+        return lo, hi
+
+    def before(self, ts_value, pk):
+        """Number of leading rows strictly before the keyset (ts_value, pk)."""
+        ts = self.columns["ts"]
+        lo = int(np.searchsorted(ts, ts_value, "left"))
+        hi = int(np.searchsorted(ts, ts_value, "right"))
+        # ties on the timestamp are sorted by id
+        return lo + int(np.searchsorted(self.columns["id"][lo:hi], pk, "left"))
+
+    def row(self, i):
+        c = self.columns
+        signature = bytes(c["signature"][i]).decode()
+        return {
+            "id": int(c["id"][i]),
+            "timestamp": from_micros(c["ts"][i]),
+            "student_id": int(c["student"][i]),
+            "room_id": None if c["room"][i] < 0 else int(c["room"][i]),
+            "session_id": None if c["session"][i] < 0 else int(c["session"][i]),
+            "status": self.strings["status"][c["status"][i]],
+            "device": self.strings["device"][c["device"][i]],
+            "confidence": float(c["confidence"][i]),
+            "signature": signature or None,
+        }
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"cutoff": None, "segments": []}
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def segments():
+    """Memory-mapped purged segments of the current archive, oldest first."""
+    global _STATE
+
+    path = os.path.join(archive_dir(), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _LOCK:
+        if _STATE is None or _STATE[0] != path or _STATE[1] != mtime:
+            directory = os.path.dirname(path)
+            manifest = read_manifest(directory)
+            _STATE = (path, mtime, [
+                Segment(os.path.join(directory, s["name"])) for s in manifest["segments"] if s.get("purged")
+            ])
+        return _STATE[2]
+
+
+def cold_range(start=None, end=None, status=None, columns=("student", "session", "room", "ts")):
+    """
+    {column: array} of archived rows with start <= timestamp < end, optionally
+    only one status, concatenated over segments (copies, not views).
+    """
+    start_us = None if start is None else to_micros(start)
+    end_us = None if end is None else to_micros(end)
+    parts = {c: [] for c in columns}
+    for seg in segments():
+        lo, hi = seg.span(start_us, end_us)
+        if lo >= hi:
+            continue
+        keep = slice(lo, hi)
+        if status is not None:
+            code = seg.code("status", status)
+            if code is None:
+                continue
+            keep = lo + np.flatnonzero(seg.columns["status"][lo:hi] == code)
+        for c in columns:
+            parts[c].append(np.asarray(seg.columns[c][keep]))
+    empty = {"ts": np.int64, "confidence": np.float64}
+    return {
+        c: np.concatenate(parts[c]) if parts[c] else np.empty(0, dtype=empty.get(c, np.int64))
+        for c in columns
+    }
+
+
+def cold_page(limit, before=None, start=None, end=None, students=None, status=None):
+    """
+    Up to ``limit`` archived rows (dicts, see Segment.row) newest first, with
+    (timestamp, id) strictly below the ``before`` keyset and start <=
+    timestamp < end. ``students`` restricts to an array of student pks.
+    """
+    start_us = None if start is None else to_micros(start)
+    end_us = None if end is None else to_micros(end)
+    if students is not None:
+        students = np.asarray(students, dtype=np.int64)
+    rows = []
+    for seg in segments():
+        lo, hi = seg.span(start_us, end_us)
+        if before is not None:
+            hi = min(hi, seg.before(to_micros(before[0]), before[1]))
+        code = None
+        if status:
+            code = seg.code("status", status)
+            if code is None:
+                continue
+
+        picked = []
+        while hi > lo and len(picked) < limit:
+            block = max(lo, hi - SCAN_BLOCK)
+            mask = np.ones(hi - block, dtype=bool)
+            if code is not None:
+                mask &= seg.columns["status"][block:hi] == code
+            if students is not None:
+                mask &= np.isin(seg.columns["student"][block:hi], students)
+            hits = (block + np.flatnonzero(mask))[::-1]
+            picked.extend(hits[:limit - len(picked)].tolist())
+            hi = block
+        rows.extend(seg.row(i) for i in picked)
+
+    rows.sort(key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+    return rows[:limit]
+
+
+def _purge(ids):
+    # Raw DELETE: QuerySet.delete() would load every row to send post_delete
+    table = connection.ops.quote_name(Attendance._meta.db_table)
+    ids = np.asarray(ids).tolist()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def _save(path, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_segment(directory, columns, strings):
+    ts = columns["ts"]
+    name = f"seg_{int(ts[0])}_{int(columns['id'].min())}"
+    tmp = os.path.join(directory, f".{name}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    for c in COLUMNS:
+        _save(os.path.join(tmp, f"{c}.npy"), columns[c])
+    meta = {
+        "rows": int(ts.size),
+        "first_ts": int(ts[0]),
+        "last_ts": int(ts[-1]),
+        "min_id": int(columns["id"].min()),
+        "max_id": int(columns["id"].max()),
+        "strings": strings,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(directory, name))
+    return name, meta
+
+
+def archive_before(cutoff, directory=None, segment_rows=1_000_000, chunk_size=20000, progress=None):
+    """
+    Move Attendance rows with timestamp < ``cutoff`` into new segments.
+    Returns the number of rows archived.
+    """
+    from .signals import publish_attendance_change
+
+    directory = directory or archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+
+    for entry in manifest["segments"]:
+        if not entry.get("purged"):
+            _purge(np.load(os.path.join(directory, entry["name"], "id.npy")))
+            entry["purged"] = True
+            _write_manifest(directory, manifest)
+
+    # one bounded query per segment: the previous segment's rows are
+    # already deleted, so no cursor stays open across the deletes
+    queryset = (
+        Attendance.objects
+        .filter(timestamp__lt=cutoff)
+        .order_by("timestamp", "id")
+        .values_list("id", "timestamp", "student_id", "room_id", "session_id", "status", "device",
+                     "confidence", "signature")
+    )
+
+    archived = 0
+    while True:
+        columns = {c: [] for c in COLUMNS}
+        pending = {c: [] for c in COLUMNS}
+        strings = {"status": [], "device": []}
+        lookup = {"status": {}, "device": {}}
+
+        def intern(kind, value):
+            table = lookup[kind]
+            if value not in table:
+                table[value] = len(strings[kind])
+                strings[kind].append(value)
+            return table[value]
+
+        def flush_chunk():
+            for c, dtype in COLUMN_DTYPES.items():
+                columns[c].append(np.asarray(pending[c], dtype=dtype))
+                pending[c].clear()
+
+        for pk, timestamp, student_pk, room_pk, session_pk, status, device, confidence, signature in (
+            queryset[:segment_rows].iterator(chunk_size=chunk_size)
+        ):
+            pending["id"].append(pk)
+            pending["ts"].append(to_micros(timestamp))
+            pending["student"].append(student_pk)
+            pending["room"].append(-1 if room_pk is None else room_pk)
+            pending["session"].append(-1 if session_pk is None else session_pk)
+            pending["status"].append(intern("status", status))
+            pending["device"].append(intern("device", device))
+            pending["confidence"].append(confidence)
+            pending["signature"].append((signature or "").encode())
+            if len(pending["id"]) >= chunk_size:
+                flush_chunk()
+        if pending["id"]:
+            flush_chunk()
+        if not columns["id"]:
+            break
+
+        # fixed-width bytes: widen every chunk to the longest signature
+        width = max(max(a.dtype.itemsize for a in columns["signature"]), 1)
+        columns["signature"] = [a.astype(f"S{width}") for a in columns["signature"]]
+        columns = {c: np.concatenate(parts) for c, parts in columns.items()}
+
+        name, meta = _write_segment(directory, columns, strings)
+        manifest["segments"].append({"name": name, "rows": meta["rows"], "first_ts": meta["first_ts"],
+                                     "last_ts": meta["last_ts"], "purged": False})
+        _write_manifest(directory, manifest)
+        _purge(columns["id"])
+        manifest["segments"][-1]["purged"] = True
+        _write_manifest(directory, manifest)
+
+        archived += meta["rows"]
+        if progress:
+            progress(archived)
+
+    previous = manifest["cutoff"]
+    if previous is None or cutoff.isoformat() > previous:
+        manifest["cutoff"] = cutoff.isoformat()
+    _write_manifest(directory, manifest)
+    if archived:
+        publish_attendance_change()
+    return archived
+
+
+def rows_in_id_range(lo, hi):
+    """Archived rows (Segment.row dicts) with lo <= id <= hi, in no particular order."""
+    rows = []
+    for seg in segments():
+        if seg.meta["max_id"] < lo or seg.meta["min_id"] > hi:
+            continue
+        ids = seg.columns["id"]
+        rows.extend(seg.row(i) for i in np.flatnonzero((ids >= lo) & (ids <= hi)).tolist())
+    return rows
+
+
+def rows_in_time_range(start=None, end=None):
+    """Archived rows (Segment.row dicts) with start <= timestamp < end."""
+    start_us = None if start is None else to_micros(start)
+    end_us = None if end is None else to_micros(end)
+    rows = []
+    for seg in segments():
+        lo, hi = seg.span(start_us, end_us)
+        rows.extend(seg.row(i) for i in range(lo, hi))
+    return rows
+
+
+def archived_mask(ids):
+    """Boolean array, True where the id is held by an archive segment."""
+    ids = np.asarray(ids, dtype=np.int64)
+    mask = np.zeros(len(ids), dtype=bool)
+    if not len(ids):
+        return mask
+    lo, hi = int(ids.min()), int(ids.max())
+    for seg in segments():
+        if seg.meta["max_id"] < lo or seg.meta["min_id"] > hi:
+            continue
+        mask |= np.isin(ids, seg.columns["id"])
+    return mask
+
+
+def archived_id_bounds():
+    """(min id, max id) over the archive, or (None, None) when it is empty."""
+    segs = segments()
+    if not segs:
+        return None, None
+    return min(seg.meta["min_id"] for seg in segs), max(seg.meta["max_id"] for seg in segs)
@@ -0,0 +1,282 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog, hmac_signature
+
+
+logger = logging.getLogger(__name__)
+
+
+# AuditLog retention: one gzip NDJSON segment per local day; manifest.json signs each
+# segment's SHA-256, so an edited or swapped segment is refused on load.
+
+MANIFEST = "manifest.json"
+FIELDS = ("id", "action", "username", "ip_address", "user_agent", "data", "signature", "created_at")
+
+# decompressed day segments kept in memory
+CACHE_SEGMENTS = 8
+
+_CACHE_LOCK = threading.Lock()
+_CACHE = OrderedDict()  # (path, sha256) -> (keys, rows)
+
+
+class SegmentIntegrityError(Exception):
+    pass
+
+
+def audit_archive_dir():
+    return getattr(settings, "AUDIT_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, "audit_archive"))
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"segments": []}
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def entry_signature(entry):
+    payload = "|".join(str(entry[k]) for k in ("file", "day", "rows", "first", "last", "min_id", "max_id", "sha256"))
+    return hmac_signature(payload)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
+
+def _encode(row):
+    row = dict(row, created_at=row["created_at"].isoformat())
+    return json.dumps(row, separators=(",", ":"), ensure_ascii=False)
+
+
+def _purge(ids):
+    # AuditLog has no delete receivers or dependents, so this is a plain DELETE
+    for start in range(0, len(ids), 900):
+        AuditLog.objects.filter(id__in=ids[start:start + 900]).delete()
+
+
+def _write_day(directory, day, chunk_size, compresslevel):
+    start, end = _day_bounds(day)
+    rows = (
+        AuditLog.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .order_by("created_at", "id")
+        .values(*FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    digest = hashlib.sha256()
+    ids, first, last = [], None, None
+    tmp = os.path.join(directory, f".audit-{os.getpid()}.tmp")
+
+    class _Hashing:
+        # hash the compressed bytes as they are written
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, data):
+            digest.update(data)
+            return self.f.write(data)
+
+        def flush(self):
+            self.f.flush()
+
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=_Hashing(raw), mode="wb", compresslevel=compresslevel, mtime=0) as out:
+            for row in rows:
+                out.write(_encode(row).encode("utf-8"))
+                out.write(b"\n")
+                ids.append(row["id"])
+                first = first or row["created_at"]
+                last = row["created_at"]
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not ids:
+        os.remove(tmp)
+        return None, []
+
+    name = f"audit_{day.isoformat()}_{min(ids)}.ndjson.gz"
+    os.replace(tmp, os.path.join(directory, name))
+    entry = {
+        "file": name,
+        "day": day.isoformat(),
+        "rows": len(ids),
+        "first": first.isoformat(),
+        "last": last.isoformat(),
+        "min_id": min(ids),
+        "max_id": max(ids),
+        "sha256": digest.hexdigest(),
+        "purged": False,
+    }
+    entry["signature"] = entry_signature(entry)
+    return entry, ids
+
+
+def compact_days(before_day, directory=None, chunk_size=5000, compresslevel=9, progress=None):
+    """
+    Move AuditLog rows of every local day before ``before_day`` into day
+    segments. Returns (days, rows) compacted.
+    """
+    directory = directory or audit_archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+
+    for entry in manifest["segments"]:
+        if not entry["purged"]:
+            rows = _load(directory, entry)[1]
+            _purge([row["id"] for row in rows])
+            entry["purged"] = True
+            _write_manifest(directory, manifest)
+
+    start, _ = _day_bounds(before_day)
+    days = sorted({
+        timezone.localtime(ts).date()
+        for ts in AuditLog.objects.filter(created_at__lt=start).datetimes("created_at", "day", tzinfo=timezone.get_current_timezone())
+    })
+
+    total = 0
+    for day in days:
+        entry, ids = _write_day(directory, day, chunk_size, compresslevel)
+        if entry is None:
+            continue
+        manifest["segments"].append(entry)
+        manifest["segments"].sort(key=lambda e: (e["first"], e["min_id"]))
+        _write_manifest(directory, manifest)
+        _purge(ids)
+        entry["purged"] = True
+        _write_manifest(directory, manifest)
+        total += len(ids)
+        if progress:
+            progress(day, len(ids))
+    return len(days), total
+
+
+def _load(directory, entry):
+    path = os.path.join(directory, entry["file"])
+    key = (path, entry["sha256"])
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None:
+            _CACHE.move_to_end(key)
+            return cached
+
+    if entry_signature(entry) != entry.get("signature"):
+        raise SegmentIntegrityError(f"{entry['file']}: manifest entry signature mismatch")
+    with open(path, "rb") as f:
+        blob = f.read()
+    if hashlib.sha256(blob).hexdigest() != entry["sha256"]:
+        raise SegmentIntegrityError(f"{entry['file']}: file does not match its SHA-256")
+
+    rows = []
+    for line in gzip.decompress(blob).splitlines():
+        row = json.loads(line)
+        row["created_at"] = parse_datetime(row["created_at"])
+        rows.append(row)
+    if len(rows) != entry["rows"]:
+        raise SegmentIntegrityError(f"{entry['file']}: expected {entry['rows']} rows, found {len(rows)}")
+    loaded = ([(row["created_at"], row["id"]) for row in rows], rows)
+
+    with _CACHE_LOCK:
+        _CACHE[key] = loaded
+        while len(_CACHE) > CACHE_SEGMENTS:
+            _CACHE.popitem(last=False)
+    return loaded
+
+
+def archived_page(limit, before=None, start=None, end=None, action=None, username=None, directory=None):
+    """
+    Up to ``limit`` archived AuditLog rows (dicts) newest first, with
+    (created_at, id) strictly below the ``before`` keyset and start <=
+    created_at < end. Raises SegmentIntegrityError for a tampered segment.
+    """
+    directory = directory or audit_archive_dir()
+    entries = [e for e in read_manifest(directory)["segments"] if e["purged"]]
+    entries.sort(key=lambda e: (e["last"], e["max_id"]), reverse=True)
+
+    found = []
+    for entry in entries:
+        first, last = parse_datetime(entry["first"]), parse_datetime(entry["last"])
+        if (start and last < start) or (end and first >= end) or (before and first > before[0]):
+            continue
+        # segments are visited newest first; stop once nothing here can make the page
+        if len(found) >= limit and (last, entry["max_id"]) < (found[limit - 1]["created_at"], found[limit - 1]["id"]):
+            break
+
+        keys, rows = _load(directory, entry)
+        hi = bisect_left(keys, before) if before else len(keys)
+        picked = 0
+        for i in range(hi - 1, -1, -1):
+            row = rows[i]
+            if start and row["created_at"] < start:
+                break
+            if end and row["created_at"] >= end:
+                continue
+            if action and row["action"] != action:
+                continue
+            if username and row["username"] != username:
+                continue
+            found.append(row)
+            picked += 1
+            if picked >= limit:
+                break
+        found.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        del found[limit:]
+    return found
+
+
+def rows_in_id_range(lo, hi, directory=None):
+    """Archived AuditLog rows with lo <= id <= hi, in no particular order."""
+    directory = directory or audit_archive_dir()
+    rows = []
+    for entry in read_manifest(directory)["segments"]:
+        if not entry["purged"] or entry["max_id"] < lo or entry["min_id"] > hi:
+            continue
+        rows.extend(row for row in _load(directory, entry)[1] if lo <= row["id"] <= hi)
+    return rows
+
+
+def rows_in_time_range(start=None, end=None, directory=None):
+    """Archived AuditLog rows with start <= created_at < end, oldest first."""
+    directory = directory or audit_archive_dir()
+    rows = []
+    for entry in read_manifest(directory)["segments"]:
+        if not entry["purged"]:
+            continue
+        if (start and parse_datetime(entry["last"]) < start) or (end and parse_datetime(entry["first"]) >= end):
+            continue
+        keys, segment_rows = _load(directory, entry)
+        lo = bisect_left(keys, (start,)) if start else 0
+        hi = bisect_left(keys, (end,)) if end else len(keys)
+        rows.extend(segment_rows[lo:hi])
+    return rows
+
+
+def archived_id_bounds(directory=None):
+    """(min id, max id) over purged segments, or (None, None) when there are none."""
+    entries = [e for e in read_manifest(directory or audit_archive_dir())["segments"] if e["purged"]]
+    if not entries:
+        return None, None
+    return min(e["min_id"] for e in entries), max(e["max_id"] for e in entries)
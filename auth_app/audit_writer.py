@@ -0,0 +1,373 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .db_writer import run_write
+from .models import AuditLog, AttendanceBackup
+
+
+logger = logging.getLogger(__name__)
+
+
+# Buffered writer for AuditLog and AttendanceBackup rows, journaled per process so a
+# dead process's records are replayed; event_id keeps a replay from inserting twice.
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+def _node():
+    try:
+        with open("/proc/sys/kernel/random/boot_id", encoding="ascii") as f:
+            boot = f.read().strip().replace("-", "")[:12]
+    except OSError:
+        boot = "0"
+    return f"{re.sub(r'[^A-Za-z0-9.]', '_', socket.gethostname())}~{boot}"
+
+
+NODE = _node()
+# (audit|replay)-<pid>[@<host>~<boot>]...; journals from before the node suffix have none
+_OWNER = re.compile(r"(audit|replay)-(\d+)(?:@([^-]+?))?(?:\.jsonl|-)")
+
+
+def _owner_dead(pid, node):
+    if node is None or node == NODE:
+        return not _pid_alive(pid)
+    host, _, _ = node.partition("~")
+    # the same host under an earlier boot; another host's journals are its own to replay
+    return host == NODE.partition("~")[0]
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        # a journal with our pid predates this process
+        return False
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_records(records):
+    logs, backups = [], []
+    for kind, fields in records:
+        if kind == "audit":
+            if isinstance(fields.get("created_at"), str):
+                fields = dict(fields, created_at=parse_datetime(fields["created_at"]))
+            log = AuditLog(**fields)
+            log.signature = log.compute_signature()
+            logs.append(log)
+        elif kind == "backup":
+            fields = dict(fields, timestamp=parse_datetime(fields["timestamp"]))
+            backups.append(AttendanceBackup(**fields))
+
+    def insert():
+        with transaction.atomic():
+            # rows already inserted by an earlier attempt share their event_id
+            if backups:
+                AttendanceBackup.objects.bulk_create(backups, ignore_conflicts=True)
+            if logs:
+                AuditLog.objects.bulk_create(logs, ignore_conflicts=True)
+
+    run_write(insert)
+
+
+def _read_journal(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # torn last line of a crashed process
+                continue
+            records.append((entry["kind"], entry["fields"]))
+    return records
+
+
+def _is_transient(exc):
+    return isinstance(exc, (OperationalError, InterfaceError))
+
+
+class AuditWriter:
+    def __init__(self, journal_dir, max_batch=200, flush_interval=1.0, fsync=False, max_queued=50000):
+        self.journal_dir = str(journal_dir)
+        self.max_batch = int(max_batch)
+        self.max_queued = int(max_queued)
+        self.flush_interval = float(flush_interval)
+        self.fsync = fsync
+        self.written = 0
+        self.failures = 0
+        self.quarantined = 0
+
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.owner = f"{os.getpid()}@{NODE}"
+        self.journal_path = os.path.join(self.journal_dir, f"audit-{self.owner}.jsonl")
+        self.quarantine_path = os.path.join(self.journal_dir, f"quarantine-{self.owner}.jsonl")
+        self._orphans = self._claim_orphans()
+
+        self._pending = []
+        self._spilled = False  # the open journal holds records not kept in _pending
+        self._held = 0  # records kept in memory across _segments
+        self._segments = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def _claim_orphans(self):
+        # journals, unflushed segments and unfinished replays of dead processes
+        claimed = []
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "*.jsonl*"))):
+            name = os.path.basename(path)
+            found = _OWNER.match(name)
+            if not found or not _owner_dead(int(found.group(2)), found.group(3)):
+                continue
+            target = os.path.join(self.journal_dir, f"replay-{self.owner}-{name}")
+            if name.startswith(f"replay-{self.owner}-"):
+                target = path
+            try:
+                # the rename is atomic, so only one starting worker claims a journal
+                os.replace(path, target)
+            except OSError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def submit(self, kind, fields):
+        line = json.dumps({"kind": kind, "fields": fields}, default=str)
+        with self._lock:
+            if self._closed:
+                _write_records([(kind, fields)])
+                return
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            if self._spilled or self._held + len(self._pending) >= self.max_queued:
+                # over the memory bound: the journal alone carries the rest
+                self._spilled = True
+                self._pending = []
+            else:
+                self._pending.append((kind, fields))
+            if self._spilled or len(self._pending) >= self.max_batch:
+                self._wake.set()
+
+    def _rotate(self):
+        # move queued records (and their journal) into a segment awaiting insert
+        with self._lock:
+            if not self._pending and not self._spilled:
+                return
+            self._seq += 1
+            segment = f"{self.journal_path}.{self._seq}"
+            self._journal.close()
+            os.replace(self.journal_path, segment)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if self._spilled:
+                self._segments.append((segment, None))
+            else:
+                self._segments.append((segment, self._pending))
+                self._held += len(self._pending)
+            self._pending = []
+            self._spilled = False
+
+    def _quarantine(self, records, exc):
+        with open(self.quarantine_path, "a", encoding="utf-8") as f:
+            for kind, fields in records:
+                f.write(json.dumps({"kind": kind, "fields": fields, "error": repr(exc)}, default=str) + "\n")
+        self.quarantined += len(records)
+        logger.error("Quarantined %d audit records in %s: %r", len(records), self.quarantine_path, exc)
+
+    def _write(self, records):
+        # one bulk insert; if the database rejects it, insert record by record
+        # and set aside the ones it rejects. Connection errors propagate so
+        # the segment is retried as a whole.
+        try:
+            _write_records(records)
+            return len(records)
+        except Exception as exc:
+            if _is_transient(exc):
+                raise
+        written = 0
+        for record in records:
+            try:
+                _write_records([record])
+                written += 1
+            except Exception as exc:
+                if _is_transient(exc):
+                    raise
+                self._quarantine([record], exc)
+        return written
+
+    def flush(self):
+        """Insert everything queued so far. Returns the number of rows written."""
+        with self._flush_lock:
+            self._rotate()
+            while self._orphans:
+                path = self._orphans[0]
+                records = _read_journal(path)
+                if records:
+                    self._write(records)
+                    logger.info("Replayed %d audit records from %s", len(records), path)
+                os.remove(path)
+                self._orphans.pop(0)
+
+            written = 0
+            while self._segments:
+                segment, records = self._segments[0]
+                held = records is not None
+                if not held:
+                    records = _read_journal(segment)
+                count = self._write(records)
+                os.remove(segment)
+                with self._lock:
+                    self._segments.pop(0)
+                    if held:
+                        self._held -= len(records)
+                written += count
+                self.written += count
+            return written
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # segments stay queued (and journaled) for the next attempt
+                self.failures += 1
+                logger.exception("Audit writer flush failed")
+            finally:
+                close_old_connections()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=max(self.flush_interval * 2, 1.0))
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Audit writer final flush failed; records kept in %s", self.journal_dir)
+        with self._lock:
+            self._journal.close()
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) == 0:
+            os.remove(self.journal_path)
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._pending) + self._held
+            spilled = self._spilled or any(r is None for _, r in self._segments)
+        return {"queued": queued, "spilled": spilled, "written": self.written, "failures": self.failures,
+                "quarantined": self.quarantined}
+
+
+def get_audit_writer():
+    global _WRITER
+
+    if not getattr(settings, "AUDIT_WRITER_ENABLED", True):
+        return None
+
+    if _WRITER is not None:
+        return _WRITER
+
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = AuditWriter(
+                getattr(settings, "AUDIT_JOURNAL_DIR", os.path.join(settings.BASE_DIR, "audit_journal")),
+                max_batch=int(getattr(settings, "AUDIT_WRITER_BATCH", 200)),
+                flush_interval=float(getattr(settings, "AUDIT_WRITER_FLUSH_SECONDS", 1.0)),
+                fsync=bool(getattr(settings, "AUDIT_JOURNAL_FSYNC", False)),
+                max_queued=int(getattr(settings, "AUDIT_WRITER_MAX_QUEUED", 50000)),
+            )
+            atexit.register(_WRITER.close)
+        return _WRITER
+
+
+def write_audit_log(action, username=None, ip_address=None, user_agent=None, data=None):
+    fields = {
+        "action": action,
+        "username": username,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "data": data,
+        "created_at": timezone.now(),
+        "event_id": uuid.uuid4(),
+    }
+    writer = get_audit_writer()
+    if writer is None:
+        run_write(AuditLog.objects.create, **fields)
+    else:
+        transaction.on_commit(lambda: writer.submit("audit", fields))
+
+
+def write_audit_logs(entries):
+    """write_audit_log() for a list of field dicts."""
+    now = timezone.now()
+    entries = [dict(fields, created_at=fields.get("created_at") or now, event_id=uuid.uuid4()) for fields in entries]
+    writer = get_audit_writer()
+    if writer is None:
+        _write_records([("audit", fields) for fields in entries])
+        return
+
+    def submit():
+        for fields in entries:
+            writer.submit("audit", fields)
+
+    transaction.on_commit(submit)
+
+
+def write_attendance_backups(attendances):
+    backups = [
+        {
+            "original_attendance_id": a.id,
+            "student_id": a.student.student_id,
+            "status": a.status,
+            "confidence": a.confidence,
+            "timestamp": a.timestamp.isoformat(),
+            "event_id": uuid.uuid4(),
+        }
+        for a in attendances
+    ]
+    writer = get_audit_writer()
+    if writer is None:
+        run_write(AttendanceBackup.objects.bulk_create, [
+            AttendanceBackup(**dict(b, timestamp=a.timestamp)) for a, b in zip(attendances, backups)
+        ])
+        return
+
+    def submit():
+        for fields in backups:
+            writer.submit("backup", fields)
+
+    transaction.on_commit(submit)
@@ -1,29 +1,117 @@
+import threading
+from datetime import datetime
 
-
+from django.conf import settings
 from django.utils import timezone
-from .models import RoomAccess
 
-def authorize_student(student, room):
- 
+from .models import Room, RoomAccess
+from .schedule import expected_session
+from .versioning import LocalVersion, current_version, bump_version
+
+
+# Rooms and RoomAccess served from process memory, reloaded on a version stamp bump.
+
+ROOMS_VERSION_KEY = "rooms"
+ROOM_ACCESS_VERSION_KEY = "room_access"
+
+_ROOMS = None
+_ROOMS_VERSION = None
+_ROOMS_LOCK = threading.Lock()
+
+# room pk -> {student pk: (allowed, allowed_from, allowed_to)}
+_ROOM_ACCESS = {}
+_ACCESS_VERSION = LocalVersion(ROOM_ACCESS_VERSION_KEY)
+
+
+def get_room(code):
+    """Room with the given code from the cached index, or None."""
+    global _ROOMS, _ROOMS_VERSION
+
+    version = current_version(ROOMS_VERSION_KEY)
+    rooms = _ROOMS
+    if rooms is None or version != _ROOMS_VERSION:
+        with _ROOMS_LOCK:
+            if _ROOMS is None or version != _ROOMS_VERSION:
+                _ROOMS = {room.code: room for room in Room.objects.all()}
+                _ROOMS_VERSION = version
+            rooms = _ROOMS
+    return rooms.get(code)
+
+
+def invalidate_rooms():
+    global _ROOMS, _ROOMS_VERSION
+
+    _ROOMS = None
+    _ROOMS_VERSION = None
+    bump_version(ROOMS_VERSION_KEY)
 
+
+def room_access(room_pk):
+    version = _ACCESS_VERSION.refresh(_ROOM_ACCESS.clear)
+
+    access = _ROOM_ACCESS.get(room_pk)
+    if access is None:
+        rows = RoomAccess.objects.filter(room_id=room_pk).values_list(
+            "student_id", "allowed", "allowed_from", "allowed_to"
+        )
+        access = {pk: (allowed, start, end) for pk, allowed, start, end in rows}
+        _ACCESS_VERSION.store(version, _ROOM_ACCESS, room_pk, access)
+    return access
+
+
+def invalidate_room_access(room_pks=None):
+    """Drop cached RoomAccess maps for the given rooms (all rooms if None)."""
+    def drop():
+        if room_pks is None:
+            _ROOM_ACCESS.clear()
+        else:
+            for pk in room_pks:
+                _ROOM_ACCESS.pop(pk, None)
+
+    # other workers drop everything; this one keeps its untouched rooms
+    _ACCESS_VERSION.publish(drop)
+
+
+def authorize_attendance(student, room, now=None):
+    """
+    (allowed, reason, session pk) for a recognized student in a room at the
+    local datetime ``now``. The row is tagged with the student's session
+    running in the room, if any. With SCHEDULE_AUTHORIZATION, that session
+    also authorizes unless RoomAccess explicitly denies; otherwise RoomAccess
+    and its time window decide.
+    """
     if not room:
-        return False, "NO_ROOM"
+        return False, "NO_ROOM", None
+
+    moment = now or timezone.localtime()
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(timezone.localdate(), moment)
+    now = moment.time()
+
+    session_pk = expected_session(student.pk, room.pk, moment)
 
-    now = timezone.localtime().time()
+    access = room_access(room.pk).get(student.pk)
 
-    access = RoomAccess.objects.filter(student=student, room=room).first()
+    if access and not access[0]:
+        return False, "ROOM_ACCESS_DENIED", session_pk
+
+    if session_pk is not None and getattr(settings, "SCHEDULE_AUTHORIZATION", False):
+        return True, "SCHEDULED_SESSION", session_pk
 
     if not access:
-        return False, "NO_ROOM_ACCESS_RECORD"
+        return False, "NO_ROOM_ACCESS_RECORD", session_pk
+
+    allowed, allowed_from, allowed_to = access
+
+    if allowed_from and now < allowed_from:
+        return False, "BEFORE_ALLOWED_TIME", session_pk
 
-    if not access.allowed:
-        return False, "ROOM_ACCESS_DENIED"
+    if allowed_to and now > allowed_to:
+        return False, "AFTER_ALLOWED_TIME", session_pk
 
-    
-    if access.allowed_from and now < access.allowed_from:
-        return False, "BEFORE_ALLOWED_TIME"
+    return True, "AUTHORIZED", session_pk
 
-    if access.allowed_to and now > access.allowed_to:
-        return False, "AFTER_ALLOWED_TIME"
 
-    return True, "AUTHORIZED"
+def authorize_student(student, room, now=None):
+    allowed, reason, _ = authorize_attendance(student, room, now)
+    return allowed, reason
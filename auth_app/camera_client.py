@@ -1,15 +1,18 @@
 import cv2
-import base64
 import requests
 import time
 
 
-API_URL = "http://127.0.0.1:8000/verify-face/"
+API_URL = "http://127.0.0.1:8000/auth/verify/"
 TOKEN = "PUT_YOUR_TOKEN_HERE"  
+DEVICE_KEY = ""
+DEVICE_ID = "camera-1"        # lets the server track faces per camera
 ROOM_CODE = "1234"            
 
 headers = {
-    "Authorization": f"Token {TOKEN}"
+    "Authorization": f"Token {TOKEN}",
+    "X-DEVICE-KEY": DEVICE_KEY,
+    "X-DEVICE-ID": DEVICE_ID,
 }
 
 def capture_and_send(cap):
@@ -18,8 +21,7 @@ def capture_and_send(cap):
         return None
     # encode jpg
     _, jpg = cv2.imencode('.jpg', frame)
-    b64 = base64.b64encode(jpg.tobytes()).decode('utf-8')
-    # send as form-data file:
+    # send as form-data file (the view also accepts a raw image/jpeg body):
     files = {'image': ('capture.jpg', jpg.tobytes(), 'image/jpeg')}
     data = {'room_code': ROOM_CODE}
     # If your API expects token in header, use headers, else pass data
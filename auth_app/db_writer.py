@@ -0,0 +1,184 @@
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+# SQLITE_CONCURRENCY_MODE: WAL connections, and run_write() funnels writes through one
+# writer thread per process that commits queued jobs together, each in its own savepoint.
+
+_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("temp_store", "MEMORY"),
+)
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+def concurrency_mode_enabled():
+    return bool(getattr(settings, "SQLITE_CONCURRENCY_MODE", False))
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not concurrency_mode_enabled():
+        return
+    pragmas = _PRAGMAS + (
+        ("busy_timeout", int(getattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 5000))),
+        ("mmap_size", int(getattr(settings, "SQLITE_MMAP_SIZE", 256 * 1024 * 1024))),
+        ("cache_size", -int(getattr(settings, "SQLITE_CACHE_KB", 64 * 1024))),
+    )
+    with connection.cursor() as cursor:
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+
+
+class DatabaseWriter:
+    def __init__(self, max_batch=64, timeout=30.0):
+        self.max_batch = int(max_batch)
+        self.timeout = float(timeout)
+        self.committed = 0
+        self.groups = 0
+        self.failures = 0
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Database writer is closed")
+            self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        if self._closed or threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # still queued: withdraw it so a retried request cannot write twice;
+            # already running: its outcome is coming, wait for it
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _take(self):
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # close() sentinel: finish this group, then stop
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, fn, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # the group commit itself failed: every job in it is lost
+            self.failures += 1
+            logger.exception("Database writer commit of %d jobs failed", len(batch))
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.groups += 1
+        self.committed += len(outcomes)
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                break
+            close_old_connections()
+            try:
+                self._commit(batch)
+            finally:
+                close_old_connections()
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+
+    def stats(self):
+        return {"committed": self.committed, "groups": self.groups, "failures": self.failures}
+
+
+def get_db_writer():
+    global _WRITER
+
+    if not concurrency_mode_enabled() or not getattr(settings, "SQLITE_SINGLE_WRITER", True):
+        return None
+    if connection.vendor != "sqlite":
+        return None
+
+    if _WRITER is not None:
+        return _WRITER
+
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = DatabaseWriter(
+                max_batch=int(getattr(settings, "SQLITE_WRITER_BATCH", 64)),
+                timeout=float(getattr(settings, "SQLITE_WRITER_TIMEOUT_SECONDS", 30.0)),
+            )
+            atexit.register(_WRITER.close)
+        return _WRITER
+
+
+def reset_db_writer():
+    """Stop the writer thread; the next run_write() starts a new one."""
+    global _WRITER
+
+    with _WRITER_LOCK:
+        writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.close()
+
+
+def run_write(fn, *args, **kwargs):
+    """Call ``fn`` on the writer thread when the single-writer mode is on, else inline."""
+    writer = get_db_writer()
+    if writer is None or connection.in_atomic_block:
+        return fn(*args, **kwargs)
+    return writer.call(fn, *args, **kwargs)
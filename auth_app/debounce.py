@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .db_writer import run_write
+from .models import Attendance, Student
+
+
+# Repeat recognitions within ATTENDANCE_DEBOUNCE_SECONDS reuse the earlier
+# Attendance row; a per-process LRU in front of the (student, room, timestamp) index.
+
+_DEBOUNCER = None
+_DEBOUNCER_LOCK = threading.Lock()
+
+
+class AttendanceDebouncer:
+    def __init__(self, window=60.0, max_entries=4096):
+        self.window = timedelta(seconds=float(window))
+        self.max_entries = int(max_entries)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        self.db_hits = 0
+        self.accepted = 0
+
+    def _cached(self, key, cutoff):
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        if entry[1] < cutoff:
+            del self._recent[key]
+            return None
+        self._recent.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        self._recent[key] = entry
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    def recent_many(self, room_pk, pairs, now=None):
+        """
+        {(student_pk, status): (attendance_pk, timestamp)} for the pairs that
+        already have a row in ``room_pk`` within the window.
+        """
+        found, from_db = self._find(room_pk, pairs, now)
+        with self._lock:
+            self.suppressed += len(found)
+            self.db_hits += from_db
+        return found
+
+    def seen(self, student_pk, room_pk, statuses=("IN", "FORBIDDEN"), now=None):
+        """Whether the student has a row with any of ``statuses`` in the room within the window."""
+        return bool(self._find(room_pk, [(student_pk, status) for status in statuses], now)[0])
+
+    def _find(self, room_pk, pairs, now=None):
+        now = now or timezone.now()
+        cutoff = now - self.window
+        found, missing = {}, []
+        with self._lock:
+            for student_pk, status in pairs:
+                entry = self._cached((student_pk, room_pk, status), cutoff)
+                if entry is None:
+                    missing.append((student_pk, status))
+                else:
+                    found[(student_pk, status)] = entry
+
+        if missing:
+            rows = (
+                Attendance.objects
+                .filter(
+                    room_id=room_pk,
+                    student_id__in={pk for pk, _ in missing},
+                    timestamp__gte=cutoff,
+                    status__in={status for _, status in missing},
+                )
+                .order_by("timestamp")
+                .values_list("id", "student_id", "status", "timestamp")
+            )
+            wanted = set(missing)
+            with self._lock:
+                for pk, student_pk, status, ts in rows:
+                    if (student_pk, status) in wanted:
+                        # ascending order: the newest row wins
+                        found[(student_pk, status)] = (pk, ts)
+                        self._store((student_pk, room_pk, status), (pk, ts))
+        return found, sum(1 for pair in missing if pair in found)
+
+    def recent(self, student_pk, room_pk, status, now=None):
+        return self.recent_many(room_pk, [(student_pk, status)], now=now).get((student_pk, status))
+
+    def remember(self, attendances):
+        with self._lock:
+            for att in attendances:
+                self._store((att.student_id, att.room_id, att.status), (att.pk, att.timestamp))
+                self.accepted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_seconds": self.window.total_seconds(),
+                "cached": len(self._recent),
+                "accepted": self.accepted,
+                "suppressed": self.suppressed,
+                "suppressed_from_db": self.db_hits,
+            }
+
+
+def lock_students(student_pks):
+    """
+    Lock the Student rows for the rest of the caller's transaction; call it
+    before the debounce check so concurrent check-and-inserts serialize.
+    """
+    students = Student.objects.filter(pk__in=student_pks)
+    if connection.vendor == "sqlite":
+        # select_for_update is a no-op here: a no-op write takes the database
+        # write lock before anything is read, so the check sees committed rows
+        students.update(id=F("id"))
+        return
+    list(students.select_for_update().order_by("pk").values_list("pk", flat=True))
+
+
+def record_once(fn, attempts=5):
+    """run_write(fn) for a check-and-insert, retried when SQLite refused it the write lock."""
+    for attempt in range(attempts):
+        try:
+            return run_write(fn)
+        except OperationalError as exc:
+            if "locked" not in str(exc) or connection.in_atomic_block or attempt == attempts - 1:
+                raise
+            time.sleep(0.01 * (attempt + 1))
+
+
+def get_debouncer():
+    global _DEBOUNCER
+
+    window = float(getattr(settings, "ATTENDANCE_DEBOUNCE_SECONDS", 60))
+    if window <= 0:
+        return None
+
+    if _DEBOUNCER is not None:
+        return _DEBOUNCER
+
+    with _DEBOUNCER_LOCK:
+        if _DEBOUNCER is None:
+            _DEBOUNCER = AttendanceDebouncer(
+                window=window,
+                max_entries=int(getattr(settings, "ATTENDANCE_DEBOUNCE_MAX_ENTRIES", 4096)),
+            )
+        return _DEBOUNCER
@@ -0,0 +1,53 @@
+import base64
+import json
+
+import cv2
+import numpy as np
+
+
+RAW_IMAGE_TYPES = ("image/jpeg", "image/jpg", "image/png", "image/webp", "application/octet-stream")
+
+
+def read_frame_request(request):
+    """
+    Pull the form fields and the encoded image out of a frame upload.
+
+    Three body formats are accepted:
+      * raw ``image/jpeg`` (or png/octet-stream) body, fields in the query string
+      * ``multipart/form-data`` with an ``image`` file, fields in the form
+      * JSON ``{"image": "data:image/jpeg;base64,...", ...}`` as sent by the templates
+
+    Returns (fields, image). ``image`` is a bytes-like buffer for the binary
+    paths and the data-URL string for JSON. Raises ValueError on bad JSON.
+    """
+    content_type = (request.content_type or "").lower()
+
+    if content_type in RAW_IMAGE_TYPES:
+        # request.body is the only copy; np.frombuffer wraps it without copying
+        return request.GET, request.body or None
+
+    if content_type.startswith("multipart/form-data"):
+        upload = request.FILES.get("image")
+        return request.POST, _upload_buffer(upload) if upload else None
+
+    data = json.loads(request.body.decode("utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("JSON body must be an object")
+    return data, data.get("image")
+
+
+def _upload_buffer(upload):
+    # small uploads live in a BytesIO: expose its buffer instead of read()
+    raw = getattr(upload, "file", None)
+    if hasattr(raw, "getbuffer"):
+        return raw.getbuffer()
+    upload.seek(0)
+    return upload.read()
+
+
+def decode_frame(image, flags=cv2.IMREAD_COLOR):
+    """BGR image from a buffer or data URL; None if OpenCV cannot decode it."""
+    if isinstance(image, str):
+        header, encoded = image.split(",", 1)
+        image = base64.b64decode(encoded)
+    return cv2.imdecode(np.frombuffer(image, np.uint8), flags)
@@ -0,0 +1,295 @@
+import hashlib
+import hmac
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import archive, audit_archive
+from .integrity_worker import UNSIGNED, check_rows
+from .models import Attendance, AuditLog, IntegrityBlock, HMAC_SECRET, hmac_signature
+
+
+# Bulk HMAC verification of Attendance and AuditLog rows (table and archives), plus a
+# signed SHA-256 chain of sealed blocks, each holding the Merkle root of its rows.
+
+GENESIS = "0" * 64
+
+TABLES = {
+    "attendance": (
+        Attendance,
+        ("id", "student_id", "room_id", "session_id", "timestamp", "status", "device", "confidence", "signature"),
+        "timestamp",
+    ),
+    "audit": (
+        AuditLog,
+        ("id", "action", "username", "ip_address", "user_agent", "data", "created_at", "signature"),
+        "created_at",
+    ),
+}
+
+
+def _ts_index(table):
+    model, fields, ts_field = TABLES[table]
+    return fields.index(ts_field)
+
+
+def _as_tuples(table, rows):
+    if table == "attendance":
+        return [
+            (r["id"], r["student_id"], r["room_id"], r["session_id"], r["timestamp"], r["status"], r["device"],
+             r["confidence"], r["signature"])
+            for r in rows
+        ]
+    return [
+        (r["id"], r["action"], r["username"], r["ip_address"], r["user_agent"], r["data"], r["created_at"],
+         r["signature"])
+        for r in rows
+    ]
+
+
+def _archived_rows(table, lo, hi):
+    tier = archive if table == "attendance" else audit_archive
+    return _as_tuples(table, tier.rows_in_id_range(lo, hi))
+
+
+def _rows_in_time_range(table, start, end, min_id, chunk_size):
+    """Chunks of row tuples with id >= min_id and start <= timestamp < end, both tiers."""
+    model, fields, ts_field = TABLES[table]
+    queryset = model.objects.filter(id__gte=min_id).order_by("id").values_list(*fields)
+    if start:
+        queryset = queryset.filter(**{f"{ts_field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{ts_field}__lt": end})
+    after = min_id - 1
+    while True:
+        rows = list(queryset.filter(id__gt=after)[:chunk_size])
+        if not rows:
+            break
+        yield rows
+        after = rows[-1][0]
+
+    tier = archive if table == "attendance" else audit_archive
+    archived = sorted(r for r in _as_tuples(table, tier.rows_in_time_range(start, end)) if r[0] >= min_id)
+    for i in range(0, len(archived), chunk_size):
+        yield archived[i:i + chunk_size]
+
+
+def fetch_rows(table, lo, hi):
+    """Row tuples (see integrity_worker) with lo <= id <= hi from both tiers, in id order."""
+    model, fields, _ = TABLES[table]
+    rows = list(model.objects.filter(id__gte=lo, id__lte=hi).order_by("id").values_list(*fields))
+    archived = _archived_rows(table, lo, hi)
+    if archived:
+        rows.extend(archived)
+        rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def _archived_bounds(table):
+    if table == "attendance":
+        return archive.archived_id_bounds()
+    return audit_archive.archived_id_bounds()
+
+
+def id_bounds(table):
+    model = TABLES[table][0]
+    live = model.objects.aggregate(lo=Min("id"), hi=Max("id"))
+    cold = _archived_bounds(table)
+    lows = [v for v in (live["lo"], cold[0]) if v is not None]
+    highs = [v for v in (live["hi"], cold[1]) if v is not None]
+    return (min(lows), max(highs)) if lows else (None, None)
+
+
+def chain_hash(prev, table, seq, first_id, last_id, rows, root):
+    return hashlib.sha256(f"{prev}|{table}|{seq}|{first_id}|{last_id}|{rows}|{root}".encode()).hexdigest()
+
+
+class _Inline:
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _executor(workers=None):
+    if workers is None:
+        workers = int(getattr(settings, "INTEGRITY_WORKERS", 0)) or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else _Inline()
+
+
+def _pipeline(executor, tasks, depth):
+    """(context, rows, result) per (context, table, rows) task, in order, at most ``depth`` in flight."""
+    pending = deque()
+    for context, table, rows in tasks:
+        pending.append((context, rows, executor.submit(check_rows, table, HMAC_SECRET, rows)))
+        if len(pending) >= depth:
+            context, rows, future = pending.popleft()
+            yield context, rows, future.result()
+    while pending:
+        context, rows, future = pending.popleft()
+        yield context, rows, future.result()
+
+
+def _windows(table, lo, hi, size):
+    while lo <= hi:
+        top = min(lo + size - 1, hi)
+        yield lo, top, fetch_rows(table, lo, top)
+        lo = top + 1
+
+
+def seal_blocks(table, block_rows=None, workers=None, lag_seconds=None, progress=None):
+    """
+    Seal full blocks of rows after the last sealed block. Rows newer than
+    the lag may still have uncommitted neighbours and are left for a later
+    run. Returns (blocks sealed, [(id, reason)] rows failing their HMAC).
+    """
+    block_rows = block_rows or int(getattr(settings, "INTEGRITY_BLOCK_ROWS", 4096))
+    if lag_seconds is None:
+        lag_seconds = float(getattr(settings, "INTEGRITY_SEAL_LAG_SECONDS", 300))
+    model, _, ts_field = TABLES[table]
+    ts_index = _ts_index(table)
+
+    last = IntegrityBlock.objects.filter(table=table).order_by("-seq").first()
+    after = last.last_id if last else 0
+    seq = last.seq + 1 if last else 0
+    prev = last.chain if last else GENESIS
+
+    settled = model.objects.filter(**{f"{ts_field}__lt": timezone.now() - timedelta(seconds=lag_seconds)})
+    top = max(settled.aggregate(hi=Max("id"))["hi"] or 0, _archived_bounds(table)[1] or 0)
+
+    def blocks(first):
+        buffer = []
+        for _, _, rows in _windows(table, first, top, block_rows):
+            buffer.extend(rows)
+            while len(buffer) >= block_rows:
+                yield None, table, buffer[:block_rows]
+                buffer = buffer[block_rows:]
+
+    executor = _executor(workers)
+    sealed, bad = 0, []
+    try:
+        for _, rows, (failed, root) in _pipeline(executor, blocks(after + 1), depth=4):
+            first_id, last_id = after + 1, rows[-1][0]
+            chain = chain_hash(prev, table, seq, first_id, last_id, len(rows), root)
+            stamps = [r[ts_index] for r in rows]
+            IntegrityBlock.objects.create(
+                table=table, seq=seq, first_id=first_id, last_id=last_id, rows=len(rows),
+                first_ts=min(stamps), last_ts=max(stamps), root=root, prev=prev, chain=chain,
+                signature=hmac_signature(chain),
+            )
+            bad.extend(failed)
+            after, prev, seq = last_id, chain, seq + 1
+            sealed += 1
+            if progress:
+                progress(sealed, last_id)
+    finally:
+        executor.shutdown()
+    return sealed, bad
+
+
+def verify_chain(table):
+    """(True, None), or (False, seq of the first block whose link or signature is wrong)."""
+    prev, expected_seq, after = GENESIS, 0, 0
+    blocks = IntegrityBlock.objects.filter(table=table).order_by("seq").values_list(
+        "seq", "first_id", "last_id", "rows", "root", "prev", "chain", "signature"
+    )
+    for seq, first_id, last_id, rows, root, stored_prev, chain, signature in blocks.iterator():
+        ok = (
+            seq == expected_seq
+            and first_id == after + 1
+            and stored_prev == prev
+            and chain == chain_hash(prev, table, seq, first_id, last_id, rows, root)
+            and hmac.compare_digest(hmac_signature(chain), signature)
+        )
+        if not ok:
+            return False, seq
+        prev, expected_seq, after = chain, seq + 1, last_id
+    return True, None
+
+
+def verify(table, start=None, end=None, workers=None, chunk_size=None, max_report=1000, progress=None):
+    """
+    Check HMACs and sealed block roots for ``table``, optionally only blocks
+    and rows with a timestamp in [start, end). Returns a report dict.
+    """
+    started = time.perf_counter()
+    chunk_size = chunk_size or int(getattr(settings, "INTEGRITY_BLOCK_ROWS", 4096))
+    chain_ok, broken_at = verify_chain(table)
+
+    blocks = IntegrityBlock.objects.filter(table=table)
+    last = blocks.order_by("-seq").first()
+    if start:
+        blocks = blocks.filter(last_ts__gte=start)
+    if end:
+        blocks = blocks.filter(first_ts__lt=end)
+    lo, hi = id_bounds(table)
+    tail_from = last.last_id + 1 if last else (lo or 1)
+
+    def tasks():
+        for block in blocks.order_by("seq").iterator():
+            yield block, table, fetch_rows(table, block.first_id, block.last_id)
+        if hi is None:
+            return
+        if start or end:
+            # unsealed rows in range only, through the timestamp indexes
+            for rows in _rows_in_time_range(table, start, end, tail_from, chunk_size):
+                yield None, table, rows
+        else:
+            for _, _, rows in _windows(table, tail_from, hi, chunk_size):
+                if rows:
+                    yield None, table, rows
+
+    report = {
+        "table": table,
+        "from": start,
+        "to": end,
+        "rows_checked": 0,
+        "blocks_checked": 0,
+        "blocks_failed": [],
+        "unsigned": 0,
+        "unsigned_ids": [],
+        "tampered": 0,
+        "tampered_ids": [],
+        "chain_ok": chain_ok,
+        "chain_broken_at": broken_at,
+        "unsealed_from_id": tail_from,
+    }
+    executor = _executor(workers)
+    try:
+        for block, rows, (failed, root) in _pipeline(executor, tasks(), depth=8):
+            report["rows_checked"] += len(rows)
+            for pk, reason in failed:
+                key = "unsigned" if reason == UNSIGNED else "tampered"
+                report[key] += 1
+                if len(report[f"{key}_ids"]) < max_report:
+                    report[f"{key}_ids"].append(pk)
+            if block is not None:
+                report["blocks_checked"] += 1
+                if root != block.root or len(rows) != block.rows:
+                    report["blocks_failed"].append({
+                        "seq": block.seq,
+                        "first_id": block.first_id,
+                        "last_id": block.last_id,
+                        "rows": len(rows),
+                        "sealed_rows": block.rows,
+                    })
+            if progress:
+                progress(report)
+    finally:
+        executor.shutdown()
+
+    report["ok"] = chain_ok and not report["blocks_failed"] and not report["tampered"]
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
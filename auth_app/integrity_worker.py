@@ -0,0 +1,66 @@
+import hashlib
+import hmac
+import json
+
+
+# Row checks run in worker processes; no Django imports, so spawned workers need no settings.
+# Rows arrive in id order:
+#   attendance: (id, student, room, session, timestamp, status, device, confidence, signature)
+#   audit:      (id, action, username, ip_address, user_agent, data, created_at, signature)
+
+UNSIGNED = "UNSIGNED"
+SIGNATURE_MISMATCH = "SIGNATURE_MISMATCH"
+
+
+def _hmac(key, payload):
+    return hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def _signed(key, signature, *payloads):
+    return any(hmac.compare_digest(_hmac(key, p), signature) for p in payloads)
+
+
+def attendance_leaf(row):
+    pk, student, room, session, timestamp, status, device, confidence, signature = row
+    signed = f"{student}|{'NONE' if room is None else room}|{timestamp.isoformat()}|{status}|{confidence}"
+    canonical = f"{pk}|{session}|{device}|{signed}|{signature}"
+    return signed, canonical
+
+
+def audit_leaf(row):
+    pk, action, username, ip_address, user_agent, data, created_at, signature = row
+    # AuditLog.save() signs before created_at is set; rows saved again are
+    # signed with it
+    signed = (f"{action}|{username}|{ip_address}|None", f"{action}|{username}|{ip_address}|{created_at}")
+    data = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    canonical = f"{pk}|{action}|{username}|{ip_address}|{user_agent}|{data}|{created_at.isoformat()}|{signature}"
+    return signed, canonical
+
+
+LEAVES = {"attendance": attendance_leaf, "audit": audit_leaf}
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    level = leaves
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        level = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def check_rows(table, key, rows):
+    """([(id, reason)] for rows failing their HMAC, Merkle root of the rows)."""
+    leaf = LEAVES[table]
+    bad, leaves = [], []
+    for row in rows:
+        signed, canonical = leaf(row)
+        signature = row[-1]
+        if not signature:
+            bad.append((row[0], UNSIGNED))
+        elif not _signed(key, signature, *(signed if isinstance(signed, tuple) else (signed,))):
+            bad.append((row[0], SIGNATURE_MISMATCH))
+        leaves.append(hashlib.sha256(b"\x00" + canonical.encode()).digest())
+    return bad, merkle_root(leaves)
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from auth_app.archive import archive_before, archive_dir, read_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Move Attendance rows older than a cutoff into memory-mapped columnar segments "
+        "(ATTENDANCE_ARCHIVE_DIR). The attendance API and term reports read both tiers. "
+        "Take a backup first; archived rows leave the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Archive rows before this local date (YYYY-MM-DD)")
+        parser.add_argument("--older-than-days", type=int, default=None,
+                            help="Archive rows older than this many days (default ATTENDANCE_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--segment-rows", type=int, default=1_000_000)
+        parser.add_argument("--chunk-size", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            day = parse_date(options["before"])
+            if day is None:
+                raise CommandError("--before must be a date (YYYY-MM-DD)")
+            cutoff = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        else:
+            days = options["older_than_days"]
+            if days is None:
+                days = int(getattr(settings, "ATTENDANCE_ARCHIVE_AFTER_DAYS", 365))
+            cutoff = timezone.now() - timedelta(days=days)
+
+        directory = archive_dir()
+        self.stdout.write(f"archiving attendance before {cutoff.isoformat()} into {directory}")
+        archived = archive_before(
+            cutoff,
+            directory=directory,
+            segment_rows=options["segment_rows"],
+            chunk_size=options["chunk_size"],
+            progress=lambda n: self.stdout.write(f"  {n} rows archived"),
+        )
+        manifest = read_manifest(directory)
+        total = sum(s["rows"] for s in manifest["segments"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} rows; archive holds {total} rows in {len(manifest['segments'])} segments"
+        ))
@@ -1,25 +1,56 @@
 from django.core.management.base import BaseCommand
 from django.core import serializers
+from auth_app.backups import export_incremental
 from auth_app.models import Attendance
 from django.utils import timezone
 import os
 
 class Command(BaseCommand):
-    help = "Create automatic backup for Attendance table"
+    help = (
+        "Create automatic backup for Attendance table. With --incremental, only rows "
+        "added since the last incremental run are exported, as gzip NDJSON segments "
+        "(restore them with restore_attendance)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default="backups", help="Backup directory")
+        parser.add_argument("--incremental", action="store_true",
+                            help="Export rows above the watermark into <dir>/attendance/ segments")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--segment-rows", type=int, default=500000, help="Rows per incremental segment")
+        parser.add_argument("--lag-seconds", type=float, default=None,
+                            help="Leave rows newer than this for the next run (default BACKUP_LAG_SECONDS)")
+
+    def handle(self, *args, **options):
+        backup_dir = options["dir"]
+
+        if options["incremental"]:
+            directory = os.path.join(backup_dir, "attendance")
+            watermark = export_incremental(
+                directory,
+                chunk_size=options["chunk_size"],
+                segment_rows=options["segment_rows"],
+                lag_seconds=options["lag_seconds"],
+                progress=lambda w: self.stdout.write(f"  segment up to id {w['last_id']}"),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Incremental attendance backup in {directory}: watermark id {watermark['last_id']}, "
+                f"{watermark['rows']} rows in {len(watermark['segments'])} segments"
+            ))
+            return
 
-    def handle(self, *args, **kwargs):
         timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = "backups"
 
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir)
 
         file_path = f"{backup_dir}/attendance_backup_{timestamp}.json"
 
-        data = serializers.serialize("json", Attendance.objects.all())
-
+        # streamed to the file rather than built as one string
         with open(file_path, "w", encoding="utf-8") as f:
-            f.write(data)
+            serializers.serialize(
+                "json", Attendance.objects.order_by("id").iterator(chunk_size=options["chunk_size"]), stream=f
+            )
 
         self.stdout.write(
             self.style.SUCCESS(f"Attendance backup created successfully: {file_path}")
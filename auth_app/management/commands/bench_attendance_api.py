@@ -0,0 +1,121 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.test import RequestFactory
+from django.utils import timezone
+
+from auth_app.models import Attendance, Room, Student
+from auth_app.views import attendance_api, attendance_keyset_page, decode_cursor
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic Attendance rows and report query plans and latency of "
+        "/auth/attendance/ (keyset pages versus the old OFFSET slice). "
+        "Seeded rows are unsigned bench data; use a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Attendance rows to seed (0 = use existing rows)")
+        parser.add_argument("--students", type=int, default=2000)
+        parser.add_argument("--rooms", type=int, default=20)
+        parser.add_argument("--batch", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--depth", type=int, default=50, help="Pages to walk for the deep-page timing")
+
+    def seed(self, rows, n_students, n_rooms, batch):
+        students = Student.objects.bulk_create(
+            [Student(student_id=f"BENCH-{i:06d}", full_name=f"Bench Student {i}") for i in range(n_students)]
+        )
+        rooms = Room.objects.bulk_create(
+            [Room(code=f"BENCH-{i:03d}", name=f"Bench Room {i}") for i in range(n_rooms)]
+        )
+        rng = np.random.default_rng(0)
+        start = timezone.now() - timedelta(days=365)
+        statuses = ["IN", "IN", "IN", "OUT", "FORBIDDEN"]
+
+        done = 0
+        started = time.perf_counter()
+        while done < rows:
+            n = min(batch, rows - done)
+            offsets = np.sort(rng.integers(0, 365 * 86400, n))
+            who = rng.integers(0, n_students, n)
+            where = rng.integers(0, n_rooms, n)
+            status = rng.integers(0, len(statuses), n)
+            Attendance.objects.bulk_create([
+                Attendance(
+                    student=students[who[i]],
+                    room=rooms[where[i]],
+                    timestamp=start + timedelta(seconds=int(offsets[i])),
+                    status=statuses[status[i]],
+                    confidence=0.5,
+                )
+                for i in range(n)
+            ])
+            done += n
+            self.stdout.write(f"\rseeded {done}/{rows}", ending="")
+        self.stdout.write(f"\nseeding took {time.perf_counter() - started:.1f}s")
+
+    def time_call(self, fn, repeat):
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            runs.append((time.perf_counter() - started) * 1000.0)
+        return float(np.median(runs)), result
+
+    def handle(self, *args, **options):
+        if options["rows"] > 0:
+            self.seed(options["rows"], options["students"], options["rooms"], options["batch"])
+
+        total = Attendance.objects.count()
+        self.stdout.write(f"attendance rows: {total}")
+        factory = RequestFactory()
+        repeat = options["repeat"]
+
+        def api(params):
+            return attendance_api(factory.get("/auth/attendance/", params))
+
+        # walk the keyset pages to find a deep cursor
+        cursor, depth = None, 0
+        for depth in range(options["depth"]):
+            _, next_cursor = attendance_keyset_page(Attendance.objects.all(), cursor)
+            if not next_cursor:
+                break
+            cursor = next_cursor
+        offset = (depth + 1) * 200 if cursor else 0
+
+        cases = [
+            ("first page", {}),
+            ("status=FORBIDDEN", {"status": "FORBIDDEN"}),
+        ]
+        if cursor:
+            cases.append((f"keyset page {depth + 2}", {"cursor": cursor}))
+
+        for label, params in cases:
+            ms, response = self.time_call(lambda: api(params), repeat)
+            self.stdout.write(f"{label:22s} {ms:8.2f} ms  status={response.status_code}  bytes={len(response.content)}")
+
+        def legacy(start):
+            logs = Attendance.objects.all().select_related("student", "room").order_by("-timestamp")
+            return [(log.timestamp, log.student.full_name, log.room.code if log.room else None)
+                    for log in logs[start:start + 200]]
+
+        for label, start in (("legacy slice", 0), (f"legacy OFFSET {offset}", offset)):
+            ms, _ = self.time_call(lambda: legacy(start), repeat)
+            self.stdout.write(f"{label:22s} {ms:8.2f} ms")
+
+        self.stdout.write("\nquery plans:")
+        plans = [
+            ("first page", Attendance.objects.all()),
+            ("status=FORBIDDEN", Attendance.objects.filter(status="FORBIDDEN")),
+        ]
+        if cursor:
+            ts, pk = decode_cursor(cursor)
+            plans.append(("keyset page", Attendance.objects.filter(Q(timestamp__lte=ts), Q(timestamp__lt=ts) | Q(id__lt=pk))))
+        for label, qs in plans:
+            qs = qs.order_by("-timestamp", "-id").values("id", "timestamp", "student__full_name", "room__code")[:201]
+            self.stdout.write(f"-- {label}\n{qs.explain()}")
@@ -0,0 +1,58 @@
+import time
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_service.engine_onnx import (
+    detect_single_face_bbox_rgb,
+    crop_and_preprocess_for_arcface,
+    MIN_FACE,
+    detection_scale,
+    rescue_scale,
+)
+
+
+class Command(BaseCommand):
+    help = "Per-stage timings of full-resolution versus downscaled face detection on one image"
+
+    def add_arguments(self, parser):
+        parser.add_argument("image", help="Path to a captured frame (e.g. 1920x1080 JPEG)")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--min-size", type=int, default=MIN_FACE)
+        parser.add_argument("--max-side", type=int, default=None)
+
+    def handle(self, *args, **options):
+        bgr = cv2.imread(options["image"], cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise CommandError("Cannot read image.")
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+        max_side = options["max_side"]
+        if max_side is None:
+            max_side = int(getattr(settings, "FACE_DETECT_MAX_SIDE", 640))
+        min_size = options["min_size"]
+
+        self.stdout.write(
+            f"frame {rgb.shape[1]}x{rgb.shape[0]}, detection scale "
+            f"{detection_scale(rgb.shape, max_side):.3f} (retried at {rescue_scale(min_size):.3f} on a miss)"
+        )
+
+        for label, side in (("full-res", 0), (f"max-side {max_side}", max_side)):
+            runs = []
+            for _ in range(options["repeat"]):
+                timings = {}
+                bbox = detect_single_face_bbox_rgb(rgb, min_size=min_size, max_side=side, timings=timings)
+                started = time.perf_counter()
+                crop_and_preprocess_for_arcface(rgb, bbox)
+                timings["crop"] = (time.perf_counter() - started) * 1000.0
+                runs.append(timings)
+
+            stages = {k: np.median([r.get(k, 0.0) for r in runs]) for k in ("downscale", "detect", "crop")}
+            total = sum(stages.values())
+            self.stdout.write(
+                f"{label:16s} bbox={bbox}  "
+                + "  ".join(f"{k} {v:6.2f}ms" for k, v in stages.items())
+                + f"  total {total:6.2f}ms"
+            )
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from face_service.gallery import FaceGallery, STORAGE_DTYPES
+from auth_app.matching import load_gallery, new_gallery
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the enrolled encodings into each in-memory gallery storage mode and report memory saved, "
+        "accuracy lost and search time. Nothing is converted on disk: encodings stay float32 in the "
+        "database and FACE_GALLERY_STORAGE picks the mode the workers use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--noise", type=float, default=1.0, help="Probe noise norm (1.0 ~ cosine 0.7 to the enrolled vector)")
+        parser.add_argument("--threshold", type=float, default=None)
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        threshold = options["threshold"]
+        if threshold is None:
+            threshold = float(getattr(settings, "FACE_MATCH_THRESHOLD", 0.35))
+
+        reference = FaceGallery()
+        load_gallery(reference)
+        if len(reference) == 0:
+            raise CommandError("No enrolled face encodings.")
+
+        rng = np.random.default_rng(0)
+        base = reference.sample_vectors(options["queries"], rng)
+        noise = rng.normal(size=base.shape).astype(np.float32) * (options["noise"] / np.sqrt(base.shape[1]))
+        probes = base + noise
+        probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+        expected = reference.search_batch(probes, k=1)
+
+        self.stdout.write(f"{len(reference)} embeddings, {len(probes)} probes, threshold {threshold}")
+        for storage in STORAGE_DTYPES:
+            for rerank in (False, True):
+                if storage == "float32" and rerank:
+                    continue
+
+                gallery = new_gallery(storage)
+                if not rerank:
+                    gallery.rerank = 0
+                started = time.perf_counter()
+                load_gallery(gallery)
+                converted = time.perf_counter() - started
+
+                started = time.perf_counter()
+                got = gallery.search_batch(probes, k=1)
+                searched = time.perf_counter() - started
+
+                agree = np.mean([a[0][0] == b[0][0] for a, b in zip(expected, got)])
+                errors = np.abs([a[0][1] - b[0][1] for a, b in zip(expected, got)])
+                flips = np.sum([(a[0][1] >= threshold) != (b[0][1] >= threshold) for a, b in zip(expected, got)])
+
+                label = storage + (f"+rerank{gallery.rerank}" if rerank else "")
+                self.stdout.write(
+                    f"{label:16s} {gallery.nbytes / 1e6:8.2f} MB ({gallery.nbytes / reference.nbytes:5.1%})  "
+                    f"top1 agreement {agree:6.2%}  max |dscore| {errors.max():.5f}  "
+                    f"threshold flips {flips}  load {converted:.2f}s  search {searched * 1000:.1f} ms"
+                )
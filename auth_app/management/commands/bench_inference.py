@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_service.engine_onnx import ArcFaceONNX
+from face_service.batching import InferenceScheduler
+
+
+class Command(BaseCommand):
+    help = "Compare direct ArcFace inference with the micro-batching scheduler under concurrent load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--max-batch", type=int, default=None)
+        parser.add_argument("--max-wait-ms", type=float, default=None)
+
+    def handle(self, *args, **options):
+        model_path = getattr(settings, "ARCFACE_MODEL_PATH", "")
+        try:
+            arc = ArcFaceONNX(model_path)
+        except Exception as e:
+            raise CommandError(f"ArcFace load failed: {e!r}")
+
+        rng = np.random.default_rng(0)
+        crops = rng.uniform(-1, 1, size=(64, 1, 3, 112, 112)).astype(np.float32)
+        total = options["requests"]
+
+        def direct(i):
+            started = time.perf_counter()
+            arc.embed_batch(crops[i % len(crops)])
+            return time.perf_counter() - started
+
+        scheduler = InferenceScheduler(
+            arc,
+            max_batch=options["max_batch"] or int(getattr(settings, "FACE_BATCH_MAX_SIZE", 16)),
+            max_wait_ms=options["max_wait_ms"] if options["max_wait_ms"] is not None
+            else float(getattr(settings, "FACE_BATCH_MAX_WAIT_MS", 5.0)),
+        )
+
+        def batched(i):
+            started = time.perf_counter()
+            scheduler.embed(crops[i % len(crops)])
+            return time.perf_counter() - started
+
+        for name, fn in (("direct", direct), ("batched", batched)):
+            fn(0)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                latencies = np.array(list(pool.map(fn, range(total))))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{name:8s} {total / elapsed:8.1f} req/s  "
+                f"p50={np.percentile(latencies, 50) * 1000:.1f}ms  "
+                f"p95={np.percentile(latencies, 95) * 1000:.1f}ms"
+            )
+
+        self.stdout.write(f"scheduler stats: {scheduler.stats()}")
+        scheduler.close()
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from auth_app.audit_writer import get_audit_writer, write_audit_log
+from auth_app.db_writer import get_db_writer, reset_db_writer, run_write
+from auth_app.models import Attendance, Room, Student
+
+
+MODES = ("default", "concurrent")
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer SQLite with concurrent verify-style writes (Student lookup, Attendance insert, "
+        "audit record) from many threads, once with the stock configuration and once with "
+        "SQLITE_CONCURRENCY_MODE, and report throughput, latency and 'database is locked' errors. "
+        "Writes unsigned bench rows and changes the journal mode; use a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+        parser.add_argument("--students", type=int, default=200)
+        parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+
+    def seed(self, n_students):
+        students = list(Student.objects.filter(student_id__startswith="BENCH-").values_list("pk", flat=True)[:n_students])
+        if len(students) < n_students:
+            created = Student.objects.bulk_create(
+                [Student(student_id=f"BENCH-W{i:06d}", full_name=f"Bench Student {i}") for i in range(len(students), n_students)]
+            )
+            students += [s.pk for s in created]
+        room, _ = Room.objects.get_or_create(code="BENCH-W", defaults={"name": "Bench writes"})
+        return students, room
+
+    def set_journal_mode(self, mode):
+        connections.close_all()
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={mode}")
+            return cursor.fetchone()[0]
+
+    def run(self, mode, threads, seconds, students, room):
+        options = connection.settings_dict.setdefault("OPTIONS", {})
+        options.pop("transaction_mode", None)
+        concurrent = mode == "concurrent"
+        if concurrent and django.VERSION >= (5, 1):
+            options["transaction_mode"] = "IMMEDIATE"
+
+        with override_settings(SQLITE_CONCURRENCY_MODE=concurrent):
+            reset_db_writer()
+            journal = self.set_journal_mode("WAL" if concurrent else "DELETE")
+            connections.close_all()
+
+            latencies, errors, lock = [], [], threading.Lock()
+            deadline = time.perf_counter() + seconds
+            start = threading.Barrier(threads)
+
+            def worker(seed):
+                rng = np.random.default_rng(seed)
+                mine, failed = [], []
+                start.wait()
+                try:
+                    while time.perf_counter() < deadline:
+                        pk = students[int(rng.integers(len(students)))]
+                        started = time.perf_counter()
+                        try:
+                            student = Student.objects.filter(pk=pk).only("id", "student_id").first()
+                            run_write(Attendance.objects.create, student=student, room=room, status="IN",
+                                      confidence=float(rng.random()), device="bench")
+                            write_audit_log("BENCH_WRITE", username=student.student_id, ip_address="127.0.0.1",
+                                            user_agent="bench_sqlite_writes", data={"room": room.code})
+                        except OperationalError as exc:
+                            failed.append(str(exc))
+                            continue
+                        mine.append(time.perf_counter() - started)
+                finally:
+                    connection.close()
+                with lock:
+                    latencies.extend(mine)
+                    errors.extend(failed)
+
+            pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            started = time.perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            audit = get_audit_writer()
+            flush_started = time.perf_counter()
+            if audit is not None:
+                audit.flush()
+            flush_ms = (time.perf_counter() - flush_started) * 1000.0
+            writer = get_db_writer()
+            groups = writer.stats() if writer else None
+            reset_db_writer()
+            connections.close_all()
+
+        ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+        self.stdout.write(
+            f"{mode:10s} journal={journal:6s} threads={threads} "
+            f"verifies/s={len(latencies) / elapsed:8.1f}  "
+            f"p50={np.percentile(ms, 50):7.2f}ms p99={np.percentile(ms, 99):8.2f}ms max={ms.max():8.2f}ms  "
+            f"locked errors={len(errors)}  audit flush={flush_ms:.0f}ms"
+        )
+        if groups:
+            self.stdout.write(f"{'':10s} writer: {groups['committed']} jobs in {groups['groups']} commits "
+                              f"({groups['committed'] / max(groups['groups'], 1):.1f} per commit)")
+        if errors:
+            self.stdout.write(f"{'':10s} first error: {errors[0]}")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_sqlite_writes needs a SQLite database")
+        if options["threads"] < 1:
+            raise CommandError("--threads must be at least 1")
+
+        students, room = self.seed(options["students"])
+        before = Attendance.objects.filter(device="bench").count()
+        modes = MODES if options["mode"] == "both" else (options["mode"],)
+        try:
+            for mode in modes:
+                self.run(mode, options["threads"], options["seconds"], students, room)
+        finally:
+            # leave the file in the journal mode the settings expect
+            options_dict = connection.settings_dict.setdefault("OPTIONS", {})
+            options_dict.pop("transaction_mode", None)
+            if getattr(settings, "SQLITE_CONCURRENCY_MODE", False) and django.VERSION >= (5, 1):
+                options_dict["transaction_mode"] = "IMMEDIATE"
+            self.set_journal_mode("WAL" if getattr(settings, "SQLITE_CONCURRENCY_MODE", False) else "DELETE")
+        self.stdout.write(f"bench attendance rows written: {Attendance.objects.filter(device='bench').count() - before}")
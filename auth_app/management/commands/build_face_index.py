@@ -0,0 +1,55 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_service.ann import IVFIndex, calibrate_nprobe
+from face_service.gallery import FaceGallery
+from auth_app.matching import GALLERY_VERSION_KEY, load_gallery, ann_index_path
+from auth_app.versioning import bump_version
+
+
+class Command(BaseCommand):
+    help = "Build the IVF approximate nearest-neighbour index from Student face encodings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nlist", type=int, default=0, help="Number of k-means cells (default: 4 * sqrt(N))")
+        parser.add_argument("--recall", type=float, default=None, help="Top-1 recall target used to pick nprobe")
+        parser.add_argument("--iters", type=int, default=12)
+        parser.add_argument("--output", default=None)
+
+    def handle(self, *args, **options):
+        path = options["output"] or ann_index_path()
+        if not path:
+            raise CommandError("FACE_ANN_INDEX_PATH is not set and --output was not given.")
+
+        target = options["recall"]
+        if target is None:
+            target = float(getattr(settings, "FACE_ANN_RECALL_TARGET", 0.99))
+
+        gallery = FaceGallery()
+        load_gallery(gallery)
+        keys, vectors = gallery.vectors()
+        if len(keys) == 0:
+            raise CommandError("No enrolled face encodings.")
+
+        nlist = options["nlist"] or int(getattr(settings, "FACE_ANN_NLIST", 0)) or int(4 * math.sqrt(len(keys)))
+
+        started = time.perf_counter()
+        index = IVFIndex.train(vectors, nlist, iters=options["iters"])
+        gallery.attach_index(index)
+        trained = time.perf_counter() - started
+
+        nprobe, recall = calibrate_nprobe(gallery, target_recall=target)
+        index.nprobe = nprobe
+        index.save(path)
+        # running workers reload the gallery, and with it the new index
+        bump_version(GALLERY_VERSION_KEY)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"ANN index written to {path}: {len(keys)} embeddings, nlist={index.nlist}, "
+                f"nprobe={nprobe} (recall@1={recall:.3f}, target {target}), trained in {trained:.1f}s"
+            )
+        )
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auth_app.audit_archive import audit_archive_dir, compact_days, read_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll AuditLog rows older than the retention window into signed, gzip-compressed "
+        "day segments (AUDIT_ARCHIVE_DIR) and delete them from the table. "
+        "/auth/audit/ serves both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=None,
+                            help="Local days kept in the table, today included (default AUDIT_RETENTION_DAYS)")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        keep = options["keep_days"]
+        if keep is None:
+            keep = int(getattr(settings, "AUDIT_RETENTION_DAYS", 90))
+        before = timezone.localdate() - timedelta(days=max(keep - 1, 0))
+        directory = audit_archive_dir()
+
+        self.stdout.write(f"compacting audit days before {before} into {directory}")
+        days, rows = compact_days(
+            before,
+            directory=directory,
+            chunk_size=options["chunk_size"],
+            progress=lambda day, n: self.stdout.write(f"  {day}: {n} rows"),
+        )
+        segments = read_manifest(directory)["segments"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {rows} rows from {days} days; archive holds {sum(s['rows'] for s in segments)} rows "
+            f"in {len(segments)} segments"
+        ))
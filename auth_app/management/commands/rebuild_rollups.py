@@ -0,0 +1,105 @@
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from auth_app import archive
+from auth_app.models import Attendance, AttendanceHourly, RoomOccupancy, RoomPresence
+from auth_app.rollups import hour_bucket, occupancy_cutoff
+
+
+# every UTC offset in use is a multiple of 15 minutes, so quarter-hour
+# buckets map onto exactly one local hour
+QUARTER_US = 15 * 60 * 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute AttendanceHourly, RoomOccupancy and RoomPresence from the Attendance history, "
+        "including rows moved to the cold archive. Rows are streamed in chunks; run it "
+        "while no verifier is writing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=20000)
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rollup rows per bulk insert")
+
+    def count_archived(self, hourly):
+        seen = 0
+        for seg in archive.segments():
+            room = np.asarray(seg.columns["room"])
+            keep = room >= 0
+            keys = np.stack([
+                room[keep],
+                np.asarray(seg.columns["status"])[keep].astype(np.int64),
+                np.asarray(seg.columns["ts"])[keep] // QUARTER_US,
+            ], axis=1)
+            if not len(keys):
+                continue
+            buckets, counts = np.unique(keys, axis=0, return_counts=True)
+            for (room_pk, code, quarter), count in zip(buckets.tolist(), counts.tolist()):
+                hour = hour_bucket(archive.from_micros(quarter * QUARTER_US))
+                hourly[(room_pk, hour, seg.strings["status"][code])] += count
+            seen += len(keys)
+        return seen
+
+    def handle(self, *args, **options):
+        hourly = Counter()
+        archived = self.count_archived(hourly)
+        if archived:
+            self.stdout.write(f"counted {archived} archived rows")
+        seen = 0
+        latest = {}
+        rows = (
+            Attendance.objects
+            .exclude(room__isnull=True)
+            .order_by()
+            .values_list("student_id", "room_id", "timestamp", "status")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+        for student_pk, room_pk, timestamp, status in rows:
+            hourly[(room_pk, hour_bucket(timestamp), status)] += 1
+            if status == "IN" and (student_pk not in latest or timestamp > latest[student_pk][0]):
+                latest[student_pk] = (timestamp, room_pk)
+            seen += 1
+            if seen % options["chunk_size"] == 0:
+                self.stdout.write(f"\rscanned {seen} rows", ending="")
+        self.stdout.write(f"\rscanned {seen} rows")
+
+        today = timezone.localdate()
+        occupancy = {}
+        for (room_pk, hour, status), count in hourly.items():
+            if status in ("IN", "OUT") and hour.date() == today:
+                counts = occupancy.setdefault(room_pk, Counter())
+                counts["ins" if status == "IN" else "outs"] += count
+        cutoff = occupancy_cutoff()
+        presences = [
+            RoomPresence(student_id=student_pk, room_id=room_pk, last_in=last_in, counted=last_in >= cutoff)
+            for student_pk, (last_in, room_pk) in latest.items()
+        ]
+        for presence in presences:
+            if presence.counted:
+                occupancy.setdefault(presence.room_id, Counter())["present"] += 1
+
+        with transaction.atomic():
+            AttendanceHourly.objects.all().delete()
+            RoomOccupancy.objects.all().delete()
+            RoomPresence.objects.all().delete()
+            AttendanceHourly.objects.bulk_create(
+                (
+                    AttendanceHourly(room_id=room_pk, hour=hour, status=status, count=count)
+                    for (room_pk, hour, status), count in hourly.items()
+                ),
+                batch_size=options["batch_size"],
+            )
+            RoomOccupancy.objects.bulk_create(
+                [RoomOccupancy(room_id=room_pk, day=today, **counts) for room_pk, counts in occupancy.items()],
+                batch_size=options["batch_size"],
+            )
+            RoomPresence.objects.bulk_create(presences, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(hourly)} hourly rollups and {len(occupancy)} room occupancies"
+        ))
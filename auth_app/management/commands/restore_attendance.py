@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_app.backups import restore_segments, segment_paths
+from auth_app.signals import publish_attendance_change
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore Attendance rows from incremental backup segments (files or backup "
+        "directories), streaming them into bulk inserts. Rows whose id already exists, "
+        "in the table or the archive, are skipped. Run rebuild_rollups afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Segment files or directories such as backups/attendance")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        paths = segment_paths(options["paths"])
+        if not paths:
+            raise CommandError("No backup segments found.")
+
+        self.stdout.write(f"restoring {len(paths)} segments")
+        read, archived = restore_segments(
+            paths,
+            batch_size=options["batch_size"],
+            progress=lambda n: self.stdout.write(f"\rread {n} rows", ending=""),
+        )
+        publish_attendance_change()
+        self.stdout.write(self.style.SUCCESS(
+            f"\nRead {read} backed-up rows; {archived} held by the archive and ids already present were skipped"
+        ))
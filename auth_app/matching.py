@@ -0,0 +1,277 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from face_service.ann import IVFIndex
+from face_service.gallery import FaceGallery
+
+from .models import Student, RoomAccess, Enrollment
+from .versioning import LocalVersion, current_version
+
+logger = logging.getLogger(__name__)
+
+
+GALLERY_VERSION_KEY = "gallery"
+CANDIDATES_VERSION_KEY = "room_candidates"
+
+_GALLERY = None
+_GALLERY_LOCK = threading.RLock()
+_GALLERY_VERSION = LocalVersion(GALLERY_VERSION_KEY, _GALLERY_LOCK)
+_ANN_INDEX = None
+_ANN_STAMP = None
+# student pk -> float32 embedding, most recently re-ranked last
+_EXACT = OrderedDict()
+_EXACT_LOCK = threading.Lock()
+_EXACT_EPOCH = 0  # bumped on every invalidation, so a read racing one is not cached
+
+# room pk -> frozenset of student pks expected there
+_ROOM_STUDENTS = {}
+# room pk -> (gallery.version, row indices into the gallery matrix)
+_ROOM_ROWS = {}
+_CANDIDATES_VERSION = LocalVersion(CANDIDATES_VERSION_KEY)
+
+
+def ann_index_path():
+    return str(getattr(settings, "FACE_ANN_INDEX_PATH", "") or "")
+
+
+def exact_embeddings(keys):
+    """float32 embeddings for re-ranking, from a small LRU in front of Student.face_encoding."""
+    size = int(getattr(settings, "FACE_GALLERY_RERANK_CACHE", 4096))
+    found, missing = {}, []
+    with _EXACT_LOCK:
+        epoch = _EXACT_EPOCH
+        for pk in keys:
+            vec = _EXACT.get(pk)
+            if vec is None:
+                missing.append(pk)
+            else:
+                _EXACT.move_to_end(pk)
+                found[pk] = vec
+
+    if missing:
+        rows = Student.objects.filter(pk__in=missing).values_list("id", "face_encoding")
+        loaded = {pk: np.frombuffer(bytes(enc), dtype=np.float32) for pk, enc in rows if enc is not None}
+        found.update(loaded)
+        with _EXACT_LOCK:
+            if epoch == _EXACT_EPOCH:
+                _EXACT.update(loaded)
+            while len(_EXACT) > size:
+                _EXACT.popitem(last=False)
+    return found
+
+
+def _forget_exact(keys=None):
+    global _EXACT_EPOCH
+
+    with _EXACT_LOCK:
+        _EXACT_EPOCH += 1
+        if keys is None:
+            _EXACT.clear()
+        for pk in keys or ():
+            _EXACT.pop(pk, None)
+
+
+def new_gallery(storage=None):
+    storage = storage or getattr(settings, "FACE_GALLERY_STORAGE", "float32")
+    return FaceGallery(
+        storage=storage,
+        rerank=int(getattr(settings, "FACE_GALLERY_RERANK", 8)),
+        rerank_source=exact_embeddings,
+    )
+
+
+def _maybe_attach_index(gallery):
+    global _ANN_INDEX, _ANN_STAMP
+
+    min_size = int(getattr(settings, "FACE_ANN_MIN_GALLERY", 50000))
+    path = ann_index_path()
+    if len(gallery) < min_size or not path:
+        gallery.detach_index()
+        return
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        logger.warning("Gallery has %d embeddings but no ANN index at %s; using exact search.", len(gallery), path)
+        gallery.detach_index()
+        return
+
+    # build_face_index replaces the file and bumps the gallery version, which brings every worker here
+    stamp = (path, stat.st_mtime_ns, stat.st_size)
+    if _ANN_INDEX is None or stamp != _ANN_STAMP:
+        _ANN_INDEX = IVFIndex.load(path)
+        _ANN_STAMP = stamp
+        nprobe = int(getattr(settings, "FACE_ANN_NPROBE", 0))
+        if nprobe > 0:
+            _ANN_INDEX.nprobe = nprobe
+        logger.info("ANN index loaded from %s (nlist=%d, nprobe=%d)", path, _ANN_INDEX.nlist, _ANN_INDEX.nprobe)
+
+    if gallery.index is not _ANN_INDEX:
+        gallery.attach_index(_ANN_INDEX)
+
+
+def load_gallery(gallery):
+    rows = (
+        Student.objects
+        .exclude(face_encoding__isnull=True)
+        .values_list("id", "face_encoding")
+        .iterator(chunk_size=2000)
+    )
+    gallery.load((pk, bytes(enc)) for pk, enc in rows)
+
+
+def get_gallery():
+    """
+    Process-wide face gallery built from Student.face_encoding.
+    Reloaded when another worker bumps the shared gallery version.
+    """
+    global _GALLERY
+
+    version = current_version(GALLERY_VERSION_KEY)
+    if _GALLERY is not None and version == _GALLERY_VERSION.value:
+        return _GALLERY
+
+    with _GALLERY_LOCK:
+        version = current_version(GALLERY_VERSION_KEY)
+        if _GALLERY is not None and version == _GALLERY_VERSION.value:
+            return _GALLERY
+
+        gallery = _GALLERY or new_gallery()
+        _forget_exact()
+        load_gallery(gallery)
+        _maybe_attach_index(gallery)
+        _GALLERY = gallery
+        _GALLERY_VERSION.value = version
+        logger.info("Face gallery loaded: %d embeddings (version %s)", len(gallery), version)
+        return _GALLERY
+
+
+def _room_students(room_pk):
+    students = set(
+        RoomAccess.objects.filter(room_id=room_pk).values_list("student_id", flat=True)
+    )
+    students.update(
+        Enrollment.objects
+        .filter(course__coursesession__room_id=room_pk)
+        .values_list("student_id", flat=True)
+    )
+    return frozenset(students)
+
+
+def room_candidate_rows(room_pk, gallery):
+    """Gallery rows of students with RoomAccess or a scheduled Enrollment in the room."""
+    def reset():
+        _ROOM_STUDENTS.clear()
+        _ROOM_ROWS.clear()
+
+    version = _CANDIDATES_VERSION.refresh(reset)
+
+    students = _ROOM_STUDENTS.get(room_pk)
+    if students is None:
+        students = _CANDIDATES_VERSION.store(version, _ROOM_STUDENTS, room_pk, _room_students(room_pk))
+
+    cached = _ROOM_ROWS.get(room_pk)
+    if cached is None or cached[0] != gallery.version:
+        rows = (gallery.version, gallery.rows_for(students))
+        cached = _CANDIDATES_VERSION.store(version, _ROOM_ROWS, room_pk, rows)
+    return cached[1]
+
+
+def invalidate_room_candidates(room_pks=None):
+    """Drop cached candidates for the given rooms (all rooms if None)."""
+    def drop():
+        if room_pks is None:
+            _ROOM_STUDENTS.clear()
+            _ROOM_ROWS.clear()
+        else:
+            for pk in room_pks:
+                _ROOM_STUDENTS.pop(pk, None)
+                _ROOM_ROWS.pop(pk, None)
+
+    # other workers drop everything; this one keeps its untouched rooms
+    _CANDIDATES_VERSION.publish(drop)
+
+
+def match_probe(probe, threshold, room=None):
+    """
+    Best (student pk, score) for a probe embedding, or (None, -1.0).
+
+    With a room, the room's candidate shortlist is searched first and the
+    global gallery only when nothing there clears ``threshold``. With an
+    ANN index, a shortlist miss below ``threshold`` is retried exactly so
+    the index never hides a genuine match.
+    """
+    gallery = get_gallery()
+
+    if room is not None:
+        rows = room_candidate_rows(room.pk, gallery)
+        if rows.size:
+            matches = gallery.search(probe, k=1, rows=rows)
+            if matches and matches[0][1] >= threshold:
+                return matches[0]
+
+    matches = gallery.search(probe, k=1)
+
+    if gallery.index is not None and (not matches or matches[0][1] < threshold):
+        if getattr(settings, "FACE_ANN_EXACT_FALLBACK", True):
+            matches = gallery.search(probe, k=1, exact=True)
+
+    if not matches:
+        return None, -1.0
+    return matches[0]
+
+
+def match_probes(probes, threshold, room=None):
+    """match_probe() for an (M, D) block of probes, one result per row."""
+    gallery = get_gallery()
+    results = [(None, -1.0)] * len(probes)
+    pending = list(range(len(probes)))
+
+    if room is not None and pending:
+        rows = room_candidate_rows(room.pk, gallery)
+        if rows.size:
+            for i, matches in zip(pending, gallery.search_batch(probes, k=1, rows=rows)):
+                if matches and matches[0][1] >= threshold:
+                    results[i] = matches[0]
+            pending = [i for i in pending if results[i][0] is None]
+
+    if pending:
+        for i, matches in zip(pending, gallery.search_batch(probes[pending], k=1)):
+            if matches:
+                results[i] = matches[0]
+
+        if gallery.index is not None and getattr(settings, "FACE_ANN_EXACT_FALLBACK", True):
+            missed = [i for i in pending if results[i][1] < threshold]
+            if missed:
+                for i, matches in zip(missed, gallery.search_batch(probes[missed], k=1, exact=True)):
+                    if matches:
+                        results[i] = matches[0]
+
+    return results
+
+
+def gallery_upsert(student):
+    def patch():
+        if _GALLERY is not None:
+            if student.face_encoding is None:
+                _GALLERY.remove(student.pk)
+            else:
+                _GALLERY.upsert(student.pk, bytes(student.face_encoding))
+
+    _forget_exact([student.pk])
+    # only skips the reload if nobody else changed the gallery in between
+    _GALLERY_VERSION.publish(patch)
+
+
+def gallery_remove(student_pk):
+    def patch():
+        if _GALLERY is not None:
+            _GALLERY.remove(student_pk)
+
+    _forget_exact([student_pk])
+    _GALLERY_VERSION.publish(patch)
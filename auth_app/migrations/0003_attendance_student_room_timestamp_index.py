@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0002_alter_student_photo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'room', 'timestamp'], name='attendance_student_room_ts'),
+        ),
+    ]
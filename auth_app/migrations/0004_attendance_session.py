@@ -0,0 +1,17 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0003_attendance_student_room_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='auth_app.coursesession'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0004_attendance_session'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['timestamp'], name='attendance_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['status', 'timestamp'], name='attendance_status_ts'),
+        ),
+    ]
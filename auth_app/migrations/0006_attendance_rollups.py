@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0005_attendance_api_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='auth_app.room')),
+                ('day', models.DateField()),
+                ('ins', models.PositiveIntegerField(default=0)),
+                ('outs', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('status', models.CharField(max_length=12)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth_app.room')),
+            ],
+            options={
+                'unique_together': {('room', 'hour', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0006_attendance_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['status', 'timestamp', 'student', 'session', 'room'], name='attendance_report_cover'),
+        ),
+    ]
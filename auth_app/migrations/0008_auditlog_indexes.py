@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0007_attendance_report_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['created_at'], name='auditlog_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', 'created_at'], name='auditlog_action_created'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0008_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntegrityBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=20)),
+                ('seq', models.PositiveIntegerField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('rows', models.PositiveIntegerField()),
+                ('first_ts', models.DateTimeField()),
+                ('last_ts', models.DateTimeField()),
+                ('root', models.CharField(max_length=64)),
+                ('prev', models.CharField(max_length=64)),
+                ('chain', models.CharField(max_length=64)),
+                ('signature', models.CharField(max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table', 'last_ts'], name='integrityblock_table_ts')],
+                'unique_together': {('table', 'seq')},
+            },
+        ),
+    ]
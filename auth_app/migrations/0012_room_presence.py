@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0011_coursesession_weekday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='present',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RoomPresence',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='auth_app.student')),
+                ('last_in', models.DateTimeField()),
+                ('counted', models.BooleanField(default=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth_app.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['counted', 'last_in'], name='roompresence_counted_ts')],
+            },
+        ),
+    ]
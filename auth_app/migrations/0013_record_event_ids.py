@@ -0,0 +1,34 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0012_room_presence'),
+    ]
+
+    # existing rows keep a NULL event_id; the default applies to new rows only
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='event_id',
+            field=models.UUIDField(editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='event_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='attendancebackup',
+            name='event_id',
+            field=models.UUIDField(editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='attendancebackup',
+            name='event_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, null=True, unique=True),
+        ),
+    ]
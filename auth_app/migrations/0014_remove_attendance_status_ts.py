@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0013_record_event_ids'),
+    ]
+
+    operations = [
+        # a strict prefix of attendance_report_cover
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_status_ts',
+        ),
+    ]
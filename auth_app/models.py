@@ -3,7 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
-import hashlib, hmac, os
+import hashlib, hmac, os, uuid
 from cryptography.fernet import Fernet
 from django.shortcuts import redirect
 
@@ -128,16 +128,31 @@ class Attendance(models.Model):
 
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True)
+    session = models.ForeignKey("CourseSession", on_delete=models.SET_NULL, null=True, blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=12, choices=STATUS_CHOICES)
     device = models.CharField(max_length=150, default="laptop-camera")
     confidence = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
     signature = models.CharField(max_length=128, null=True, blank=True)
 
-    def save(self, *args, **kwargs):
+    class Meta:
+        indexes = [
+            # attendance debounce lookups (auth_app.debounce)
+            models.Index(fields=["student", "room", "timestamp"], name="attendance_student_room_ts"),
+            # attendance_api keyset pages, newest first
+            models.Index(fields=["timestamp"], name="attendance_ts"),
+            # term report range scans (auth_app.reports, covering) and
+            # attendance_api pages filtered by status (its prefix)
+            models.Index(fields=["status", "timestamp", "student", "session", "room"], name="attendance_report_cover"),
+        ]
+
+    def compute_signature(self):
         room_id = self.room.id if self.room else "NONE"
         payload = f"{self.student.id}|{room_id}|{self.timestamp.isoformat()}|{self.status}|{self.confidence}"
-        self.signature = hmac_signature(payload)
+        return hmac_signature(payload)
+
+    def save(self, *args, **kwargs):
+        self.signature = self.compute_signature()
         super().save(*args, **kwargs)
 
 
@@ -150,16 +165,88 @@ class AuditLog(models.Model):
     user_agent = models.TextField(null=True, blank=True)
     data = models.JSONField(null=True, blank=True)
     signature = models.CharField(max_length=128, null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # event time: the buffered writer inserts rows later and sets it explicitly
+    created_at = models.DateTimeField(default=timezone.now)
+    # set when the record is journaled, so a replayed journal cannot insert it twice
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, null=True, editable=False)
 
-    def save(self, *args, **kwargs):
+    class Meta:
+        indexes = [
+            # audit_api range queries and compact_audit_log day scans
+            models.Index(fields=["created_at"], name="auditlog_created"),
+            models.Index(fields=["action", "created_at"], name="auditlog_action_created"),
+        ]
+
+    def compute_signature(self):
         payload = f"{self.action}|{self.username}|{self.ip_address}|{self.created_at}"
-        self.signature = hmac_signature(payload)
+        return hmac_signature(payload)
+
+    def save(self, *args, **kwargs):
+        self.signature = self.compute_signature()
         super().save(*args, **kwargs)
 
 
 
 
+class IntegrityBlock(models.Model):
+    """A sealed run of rows in id order, hash-chained per table (auth_app.integrity)."""
+    table = models.CharField(max_length=20)
+    seq = models.PositiveIntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    rows = models.PositiveIntegerField()
+    first_ts = models.DateTimeField()
+    last_ts = models.DateTimeField()
+    root = models.CharField(max_length=64)
+    prev = models.CharField(max_length=64)
+    chain = models.CharField(max_length=64)
+    signature = models.CharField(max_length=128)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("table", "seq")
+        indexes = [
+            models.Index(fields=["table", "last_ts"], name="integrityblock_table_ts"),
+        ]
+
+    def __str__(self):
+        return f"{self.table} block {self.seq} ({self.first_id}-{self.last_id})"
+
+
+class AttendanceHourly(models.Model):
+    """Attendance rows per room, local hour and status (auth_app.rollups)."""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    status = models.CharField(max_length=12)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("room", "hour", "status")
+
+
+class RoomOccupancy(models.Model):
+    """Today's IN and OUT counts per room, and the students whose latest IN is here (RoomPresence)."""
+    room = models.OneToOneField(Room, on_delete=models.CASCADE, primary_key=True)
+    day = models.DateField()
+    ins = models.PositiveIntegerField(default=0)
+    outs = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class RoomPresence(models.Model):
+    """Each student's latest IN; ``counted`` while it is in RoomOccupancy.present."""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    last_in = models.DateTimeField()
+    counted = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["counted", "last_in"], name="roompresence_counted_ts"),
+        ]
+
+
 class AttendanceBackup(models.Model):
     original_attendance_id = models.IntegerField()
     student_id = models.CharField(max_length=50)
@@ -167,6 +254,7 @@ class AttendanceBackup(models.Model):
     confidence = models.FloatField()
     timestamp = models.DateTimeField()
     backup_time = models.DateTimeField(auto_now_add=True)
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, null=True, editable=False)
 
     def __str__(self):
         return f"Backup Attendance {self.original_attendance_id}"
@@ -186,8 +274,15 @@ class Course(models.Model):
 
 
 class CourseSession(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, "Monday"), (1, "Tuesday"), (2, "Wednesday"), (3, "Thursday"),
+        (4, "Friday"), (5, "Saturday"), (6, "Sunday"),
+    ]
+
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     room = models.ForeignKey("Room", on_delete=models.CASCADE)
+    # day the session starts on; blank for a slot that meets every day
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)
     start_time = models.TimeField()
     end_time = models.TimeField()
 
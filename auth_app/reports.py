@@ -0,0 +1,299 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField, Func
+from django.utils import timezone
+
+from .archive import cold_range
+from .models import Attendance, Course, CourseSession, Enrollment, Student
+from .schedule import DAY_SECONDS as DAY, WEEK_SECONDS as WEEK, early_seconds, week_pieces
+
+
+# A course's occurrences are (day, session) pairs: a session meets on its
+# weekday, or on every REPORT_WEEKDAYS day when it has none. IN rows are
+# scattered into a (students x occurrences) matrix of first-arrival minutes.
+
+WORKDAYS = (0, 1, 2, 3, 4)
+
+
+class CourseReport:
+    def __init__(self, course, sessions, days, students, first_arrival, late_minutes):
+        self.course = course
+        self.sessions = sessions          # [(session pk, start_time, end_time)] by start
+        self.days = days                  # [date] with at least one occurrence, in column order
+        self.students = students          # int64 pks, sorted
+        self.first_arrival = first_arrival  # (students, occurrences) minutes after start, inf = absent
+        self.late_minutes = late_minutes
+
+        self.present = np.isfinite(first_arrival)
+        self.late = self.present & (first_arrival > late_minutes)
+        absent = ~self.present
+        self.present_count = self.present.sum(axis=1)
+        self.late_count = self.late.sum(axis=1)
+        self.absent_count = absent.sum(axis=1)
+        occurrences = first_arrival.shape[1]
+        self.rate = self.present_count / occurrences if occurrences else np.zeros(len(students))
+        self.longest_streak, self.current_streak = _absence_streaks(absent)
+
+    def sheet(self, i):
+        """Per-occurrence codes for student row ``i``: P present, L late, A absent."""
+        codes = np.where(self.late[i], "L", np.where(self.present[i], "P", "A"))
+        return "".join(codes.tolist())
+
+    def rows(self, names, detail=False):
+        for i, pk in enumerate(self.students.tolist()):
+            student_id, full_name = names.get(pk, (None, None))
+            row = {
+                "course": self.course.code,
+                "student_id": student_id,
+                "full_name": full_name,
+                "occurrences": int(self.first_arrival.shape[1]),
+                "present": int(self.present_count[i]),
+                "late": int(self.late_count[i]),
+                "absent": int(self.absent_count[i]),
+                "rate": round(float(self.rate[i]), 4),
+                "longest_absence_streak": int(self.longest_streak[i]),
+                "current_absence_streak": int(self.current_streak[i]),
+            }
+            if detail:
+                row["sheet"] = self.sheet(i)
+            yield row
+
+
+def _absence_streaks(absent):
+    """(longest, trailing) run of consecutive True per row."""
+    if absent.shape[1] == 0:
+        zeros = np.zeros(absent.shape[0], dtype=np.int64)
+        return zeros, zeros
+    counts = np.cumsum(absent, axis=1)
+    # cumulative count at the last present occurrence, carried forward
+    resets = np.maximum.accumulate(np.where(absent, 0, counts), axis=1)
+    runs = counts - resets
+    return runs.max(axis=1), runs[:, -1]
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _local_epoch(epoch):
+    # UTC offsets change on hour boundaries: resolve one per distinct hour
+    hours, inverse = np.unique(np.floor(epoch / 3600).astype(np.int64), return_inverse=True)
+    tz = timezone.get_current_timezone()
+    offsets = np.array(
+        [datetime.fromtimestamp(int(h) * 3600, tz).utcoffset().total_seconds() for h in hours],
+        dtype=np.float64,
+    )
+    return epoch + offsets[inverse]
+
+
+class EpochSeconds(Func):
+    """Unix time of a datetime column, computed by the database (no per-row datetime objects)."""
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra):
+        # julianday() keeps fractional seconds, unlike strftime('%s')
+        return self.as_sql(compiler, connection, template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)", **extra)
+
+    def as_mysql(self, compiler, connection, **extra):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra)
+
+    def get_db_converters(self, connection):
+        # rows go straight into a float array
+        return []
+
+
+def stream_arrivals(start, end, chunk_size=50000):
+    """
+    IN rows in [start, end) as arrays (student, session or -1, room or -1,
+    epoch seconds), from the table and the cold archive.
+    """
+    rows = (
+        Attendance.objects
+        .filter(status="IN", timestamp__gte=start, timestamp__lt=end)
+        .order_by()
+        .values_list("student_id", "session_id", "room_id", EpochSeconds("timestamp"))
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        chunks.append(np.array(chunk, dtype=np.float64))
+    table = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.float64)
+    # NULL session/room arrive as NaN
+    ids = np.nan_to_num(table[:, :3], nan=-1).astype(np.int64)
+
+    cold = cold_range(start, end, status="IN")
+    return (
+        np.concatenate([ids[:, 0], cold["student"]]),
+        np.concatenate([ids[:, 1], cold["session"]]),
+        np.concatenate([ids[:, 2], cold["room"]]),
+        np.concatenate([table[:, 3], cold["ts"] / 1e6]),
+    )
+
+
+def build_reports(date_from, date_to, course_codes=None, weekdays=None, late_minutes=10, chunk_size=50000):
+    """
+    CourseReport per course over the local dates [date_from, date_to].
+    ``weekdays`` limits occurrences to those days and also stands in for
+    REPORT_WEEKDAYS as the days that sessions without a weekday meet.
+    """
+    courses = Course.objects.order_by("code")
+    if course_codes:
+        courses = courses.filter(code__in=course_codes)
+    courses = {c.pk: c for c in courses}
+
+    sessions = list(
+        CourseSession.objects.filter(course_id__in=courses)
+        .order_by("start_time", "id")
+        .values_list("id", "course_id", "room_id", "start_time", "end_time", "weekday")
+    )
+    enrolled = {}
+    for course_pk, student_pk in Enrollment.objects.filter(course_id__in=courses).values_list("course_id", "student_id"):
+        enrolled.setdefault(course_pk, []).append(student_pk)
+    enrolled = {pk: np.unique(np.asarray(pks, dtype=np.int64)) for pk, pks in enrolled.items()}
+
+    daily = tuple(weekdays or getattr(settings, "REPORT_WEEKDAYS", WORKDAYS))
+    days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+
+    def meets(session, day):
+        weekday = day.weekday()
+        if weekdays and weekday not in weekdays:
+            return False
+        return weekday in daily if session[5] is None else weekday == session[5]
+
+    # one-day margin after the range for sessions running past midnight
+    start = timezone.make_aware(datetime.combine(date_from, time.min))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=2), time.min))
+    student, session, room, epoch = stream_arrivals(start, end, chunk_size)
+
+    # julianday() on SQLite is only exact to ~50 us: without rounding, a row
+    # stamped at a session's start can land just before it
+    local = np.round(_local_epoch(epoch), 3)
+    day_number = np.floor(local / DAY).astype(np.int64)
+    secs = local - day_number * DAY
+
+    # session attributes, indexed by position in the sorted pk array
+    session_pks = np.asarray([s[0] for s in sessions], dtype=np.int64)
+    order = np.argsort(session_pks)
+    session_pks = session_pks[order]
+    course_of = np.asarray([s[1] for s in sessions], dtype=np.int64)[order]
+    starts = np.asarray([_seconds(s[3]) for s in sessions], dtype=np.float64)[order]
+    early = early_seconds()
+
+    # 1970-01-01 was a Thursday
+    week_secs = np.mod(day_number + 3, 7) * DAY + secs
+    session = _attribute_untagged(session, student, room, week_secs, sessions, enrolled, early)
+
+    pos = np.searchsorted(session_pks, session)
+    known = (session >= 0) & (pos < session_pks.size)
+    known[known] = session_pks[pos[known]] == session[known]
+    student, pos, day_number, secs = student[known], pos[known], day_number[known], secs[known]
+
+    # offset from the nearest occurrence start, in [-early, DAY - early): early
+    # arrivals are negative, and after-midnight arrivals of a wrapping session
+    # (or early ones before a just-after-midnight start) move to its day
+    offset = np.mod(secs - starts[pos] + early, DAY) - early
+    occ_day = day_number + np.rint((secs - offset - starts[pos]) / DAY).astype(np.int64)
+    minutes = offset / 60.0
+
+    epoch_day = datetime(1970, 1, 1).date()
+    rel_day = occ_day - (date_from - epoch_day).days
+    in_range = (rel_day >= 0) & (rel_day < len(days))
+    student, pos, minutes, rel_day = student[in_range], pos[in_range], minutes[in_range], rel_day[in_range]
+
+    # group rows by course once instead of masking the full arrays per course
+    by_course = np.argsort(course_of[pos], kind="stable")
+    student, pos, minutes, rel_day = student[by_course], pos[by_course], minutes[by_course], rel_day[by_course]
+    row_course = course_of[pos]
+
+    reports = []
+    for course_pk, course in courses.items():
+        course_sessions = [s for s in sessions if s[1] == course_pk]
+        students = enrolled.get(course_pk, np.empty(0, np.int64))
+
+        # column of each (day, session) occurrence, -1 where the session does not meet
+        columns = np.full((len(days), len(course_sessions)), -1, dtype=np.int64)
+        course_days, n_columns = [], 0
+        for n, day in enumerate(days):
+            for k, s in enumerate(course_sessions):
+                if meets(s, day):
+                    columns[n, k] = n_columns
+                    n_columns += 1
+            if columns[n].max(initial=-1) >= 0:
+                course_days.append(day)
+        first = np.full((students.size, n_columns), np.inf, dtype=np.float32)
+
+        if first.shape[1] and students.size:
+            slot = np.full(session_pks.size, -1, dtype=np.int64)
+            for k, s in enumerate(course_sessions):
+                slot[np.searchsorted(session_pks, s[0])] = k
+
+            lo, hi = np.searchsorted(row_course, [course_pk, course_pk + 1])
+            row = np.searchsorted(students, student[lo:hi])
+            cols = columns[rel_day[lo:hi], slot[pos[lo:hi]]]
+            ok = (row < students.size) & (cols >= 0)
+            ok[ok] = students[row[ok]] == student[lo:hi][ok]
+            np.minimum.at(first, (row[ok], cols[ok]), minutes[lo:hi][ok])
+
+        reports.append(CourseReport(
+            course,
+            [(s[0], s[3], s[4]) for s in course_sessions],
+            course_days,
+            students,
+            first,
+            late_minutes,
+        ))
+    return reports
+
+
+def _attribute_untagged(session, student, room, week_secs, sessions, enrolled, early=0):
+    """
+    Session pk for untagged rows whose room had a session of one of the
+    student's courses running (or opening within ``early`` seconds); the
+    lowest session pk wins, as in the live timetable.
+    """
+    untagged = np.flatnonzero((session < 0) & (room >= 0))
+    if not untagged.size:
+        return session
+
+    # untagged rows sorted by (room, second of week): each session window is
+    # one searchsorted range
+    key = room[untagged] * (2.0 * WEEK) + week_secs[untagged]
+    by_key = np.argsort(key, kind="stable")
+    key, rows = key[by_key], untagged[by_key]
+
+    session = session.copy()
+    for pk, course_pk, room_pk, start_t, end_t, weekday in sorted(sessions):
+        students = enrolled.get(course_pk)
+        if room_pk is None or students is None:
+            continue
+        for a, b in week_pieces(weekday, start_t, end_t, early):
+            lo, hi = np.searchsorted(key, [room_pk * 2.0 * WEEK + a, room_pk * 2.0 * WEEK + b])
+            if lo == hi:
+                continue
+            hit = rows[lo:hi]
+            hit = hit[session[hit] < 0]
+            at = np.searchsorted(students, student[hit])
+            member = at < students.size
+            member[member] = students[at[member]] == student[hit][member]
+            session[hit[member]] = pk
+    return session
+
+
+def student_names(reports):
+    pks = set()
+    for report in reports:
+        pks.update(report.students.tolist())
+    names = {}
+    pks = list(pks)
+    # chunked to stay under SQLite's bound-parameter limit
+    for start in range(0, len(pks), 900):
+        rows = Student.objects.filter(pk__in=pks[start:start + 900]).values_list("id", "student_id", "full_name")
+        names.update({pk: (sid, name) for pk, sid, name in rows})
+    return names
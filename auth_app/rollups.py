@@ -0,0 +1,152 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import AttendanceHourly, RoomOccupancy, RoomPresence
+
+
+# Hourly counts, today's IN/OUT and room occupancy, updated in the Attendance write's
+# own transaction so a retried write never counts twice.
+
+
+def hour_bucket(timestamp):
+    return timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0)
+
+
+def occupancy_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(minutes=float(getattr(settings, "OCCUPANCY_WINDOW_MINUTES", 60)))
+
+
+def attendance_deltas(attendances):
+    """{(room pk, hour, status): count} for new Attendance rows."""
+    deltas = Counter()
+    for att in attendances:
+        if att.room_id is not None:
+            deltas[(att.room_id, hour_bucket(att.timestamp), att.status)] += 1
+    return deltas
+
+
+def expire_presence(cutoff):
+    """Uncount presences older than ``cutoff``; {room pk: -students}."""
+    deltas = Counter()
+    stale = RoomPresence.objects.filter(counted=True, last_in__lt=cutoff)
+    for room_pk in set(stale.values_list("room_id", flat=True)):
+        deltas[room_pk] -= stale.filter(room_id=room_pk).update(counted=False)
+    return deltas
+
+
+def presence_deltas(attendances, cutoff):
+    """Move each student's RoomPresence to their latest new IN; {room pk: change in present}."""
+    latest = {}
+    for att in attendances:
+        if att.status == "IN" and att.room_id is not None:
+            if att.student_id not in latest or att.timestamp > latest[att.student_id].timestamp:
+                latest[att.student_id] = att
+    deltas = Counter()
+    if not latest:
+        return deltas
+
+    known = RoomPresence.objects.in_bulk(list(latest))
+    created, changed = [], []
+    for student_pk, att in latest.items():
+        row = known.get(student_pk)
+        if row is None:
+            row = RoomPresence(student_id=student_pk)
+            created.append(row)
+        elif row.last_in >= att.timestamp:
+            continue
+        else:
+            changed.append(row)
+            if row.counted:
+                deltas[row.room_id] -= 1
+        row.room_id, row.last_in, row.counted = att.room_id, att.timestamp, att.timestamp >= cutoff
+        if row.counted:
+            deltas[row.room_id] += 1
+
+    RoomPresence.objects.bulk_create(created)
+    RoomPresence.objects.bulk_update(changed, ["room", "last_in", "counted"])
+    return deltas
+
+
+def uncount_presence(room_pk):
+    # no-op when the room (and its RoomOccupancy row) is itself being deleted
+    RoomOccupancy.objects.filter(room_id=room_pk, present__gt=0).update(present=F("present") - 1)
+
+
+def record_attendance(attendances):
+    """Count new Attendance rows; call it in the transaction that inserts them."""
+    cutoff = occupancy_cutoff()
+    with transaction.atomic():
+        present = expire_presence(cutoff)
+        present.update(presence_deltas(attendances, cutoff))
+        apply_deltas(attendance_deltas(attendances), present)
+
+
+def _increment(model, lookup, **counts):
+    updated = model.objects.filter(**lookup).update(**{k: F(k) + v for k, v in counts.items()})
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **counts)
+    except IntegrityError:
+        # created concurrently by another writer
+        model.objects.filter(**lookup).update(**{k: F(k) + v for k, v in counts.items()})
+
+
+def apply_deltas(deltas, present=()):
+    """Add ``deltas`` (see attendance_deltas) and {room pk: change in present} to the rollups."""
+    today = timezone.localdate()
+    rooms = {}
+    with transaction.atomic():
+        for (room_pk, hour, status), count in deltas.items():
+            _increment(AttendanceHourly, {"room_id": room_pk, "hour": hour, "status": status}, count=count)
+            if status in ("IN", "OUT") and timezone.localtime(hour).date() == today:
+                rooms.setdefault(room_pk, Counter())["ins" if status == "IN" else "outs"] += count
+        for room_pk, count in dict(present).items():
+            if count:
+                rooms.setdefault(room_pk, Counter())["present"] += count
+
+        for room_pk, counts in rooms.items():
+            # a row left over from an earlier day starts counting arrivals again from zero
+            RoomOccupancy.objects.filter(room_id=room_pk).exclude(day=today).update(day=today, ins=0, outs=0)
+            _increment(RoomOccupancy, {"room_id": room_pk, "day": today}, **counts)
+
+
+def room_occupancy(room_pks=None):
+    """{room pk: RoomOccupancy} for today; rooms without activity today are absent."""
+    rows = RoomOccupancy.objects.filter(day=timezone.localdate())
+    if room_pks is not None:
+        rows = rows.filter(room_id__in=room_pks)
+    return {row.room_id: row for row in rows}
+
+
+def current_occupancy(room_pks=None, now=None):
+    """{room pk: students whose latest IN within the occupancy window was there}."""
+    counts = RoomOccupancy.objects.filter(present__gt=0)
+    # presences that aged out since the last write are still in the counter
+    stale = RoomPresence.objects.filter(counted=True, last_in__lt=occupancy_cutoff(now))
+    if room_pks is not None:
+        counts = counts.filter(room_id__in=room_pks)
+        stale = stale.filter(room_id__in=room_pks)
+    occupancy = Counter(dict(counts.values_list("room_id", "present")))
+    occupancy.subtract(dict(stale.values("room_id").annotate(n=Count("pk")).values_list("room_id", "n")))
+    return {pk: n for pk, n in occupancy.items() if n > 0}
+
+
+def hourly_counts(room_pk, day=None):
+    """{hour: {status: count}} for one room and local day."""
+    day = day or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    rows = AttendanceHourly.objects.filter(room_id=room_pk, hour__gte=start, hour__lt=end).values_list(
+        "hour", "status", "count"
+    )
+    hours = {}
+    for hour, status, count in rows:
+        hours.setdefault(timezone.localtime(hour), {})[status] = count
+    return hours
@@ -0,0 +1,156 @@
+import threading
+from bisect import bisect_right
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CourseSession, Enrollment
+from .versioning import LocalVersion
+
+
+# Timetable index for schedule-aware authorization: per room, the week is
+# cut at every session start/end (opened SCHEDULE_EARLY_MINUTES early) and
+# "which sessions are on now" is a bisect over the cut points.
+
+SCHEDULE_VERSION_KEY = "schedule"
+
+DAY_SECONDS = 24 * 3600
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+_LOCK = threading.RLock()
+_VERSION = LocalVersion(SCHEDULE_VERSION_KEY, _LOCK)
+# room pk -> (bounds, active) with active[i] the sessions in [bounds[i], bounds[i + 1])
+_ROOMS = {}
+# session pk -> room pk, for the sessions of loaded rooms
+_SESSION_ROOMS = {}
+# course pk -> set of enrolled student pks
+_COURSES = {}
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def early_seconds():
+    """How long before its start_time a session accepts arrivals."""
+    return int(float(getattr(settings, "SCHEDULE_EARLY_MINUTES", 15)) * 60)
+
+
+def _pieces(offset, length, period):
+    end = offset + length
+    return [(offset, end)] if end <= period else [(offset, period), (0, end - period)]
+
+
+def _length(start, end, early):
+    return (end - start) % DAY_SECONDS + min(early, DAY_SECONDS - (end - start) % DAY_SECONDS)
+
+
+def session_pieces(start, end, early=0):
+    """[(a, b)] second-of-day ranges a session covers, opening ``early`` seconds before ``start``."""
+    start, end = _seconds(start), _seconds(end)
+    if start == end:
+        return []
+    return _pieces((start - early) % DAY_SECONDS, _length(start, end, early), DAY_SECONDS)
+
+
+def week_pieces(weekday, start, end, early=0):
+    """[(a, b)] second-of-week ranges (0 = Monday midnight) of a session; weekday None meets daily."""
+    start, end = _seconds(start), _seconds(end)
+    if start == end:
+        return []
+    pieces = []
+    for day in range(7) if weekday is None else (weekday,):
+        offset = (day * DAY_SECONDS + start - early) % WEEK_SECONDS
+        pieces.extend(_pieces(offset, _length(start, end, early), WEEK_SECONDS))
+    return pieces
+
+
+def week_seconds(moment):
+    return moment.weekday() * DAY_SECONDS + _seconds(moment)
+
+
+def build_intervals(sessions, early=0):
+    """(bounds, active) second-of-week index for an iterable of (session pk, course pk, weekday, start, end)."""
+    events = {}
+    for pk, course_pk, weekday, start, end in sessions:
+        for a, b in week_pieces(weekday, start, end, early):
+            events.setdefault(a, ([], []))[0].append((pk, course_pk))
+            events.setdefault(b, ([], []))[1].append((pk, course_pk))
+
+    bounds, active, current = [], [], set()
+    for t in sorted(events):
+        starting, ending = events[t]
+        current.difference_update(ending)
+        current.update(starting)
+        bounds.append(t)
+        active.append(tuple(sorted(current)))
+    return bounds, active
+
+
+def _reset():
+    _ROOMS.clear()
+    _SESSION_ROOMS.clear()
+    _COURSES.clear()
+
+
+def _room_index(room_pk):
+    index = _ROOMS.get(room_pk)
+    if index is None:
+        sessions = list(
+            CourseSession.objects.filter(room_id=room_pk)
+            .values_list("id", "course_id", "weekday", "start_time", "end_time")
+        )
+        for pk, *_ in sessions:
+            _SESSION_ROOMS[pk] = room_pk
+        index = _ROOMS[room_pk] = build_intervals(sessions, early_seconds())
+    return index
+
+
+def _enrolled(course_pk):
+    students = _COURSES.get(course_pk)
+    if students is None:
+        students = _COURSES[course_pk] = set(
+            Enrollment.objects.filter(course_id=course_pk).values_list("student_id", flat=True)
+        )
+    return students
+
+
+def sessions_at(room_pk, now=None):
+    """(session pk, course pk) pairs running in the room at local datetime ``now``."""
+    now = now or timezone.localtime()
+    with _LOCK:
+        _VERSION.refresh(_reset)
+        bounds, active = _room_index(room_pk)
+    i = bisect_right(bounds, week_seconds(now)) - 1
+    return active[i] if i >= 0 else ()
+
+
+def expected_session(student_pk, room_pk, now=None):
+    """Pk of the session the student is enrolled in and running in the room now, or None."""
+    for session_pk, course_pk in sessions_at(room_pk, now):
+        with _LOCK:
+            if student_pk in _enrolled(course_pk):
+                return session_pk
+    return None
+
+
+def session_changed(session):
+    """Rebuild the old and new room of a saved or deleted session."""
+    with _LOCK:
+        for room_pk in {_SESSION_ROOMS.pop(session.pk, None), session.room_id}:
+            _ROOMS.pop(room_pk, None)
+        # other workers drop everything; this one keeps what it already patched
+        _VERSION.publish()
+
+
+def enrollment_changed(enrollment, created=False, deleted=False):
+    with _LOCK:
+        students = _COURSES.get(enrollment.course_id)
+        if created and students is not None:
+            students.add(enrollment.student_id)
+        elif deleted and students is not None:
+            students.discard(enrollment.student_id)
+        elif not created and not deleted:
+            # an edited row may have moved; its old course is unknown here
+            _COURSES.clear()
+        _VERSION.publish()
@@ -0,0 +1,197 @@
+import logging
+import re
+import threading
+import unicodedata
+
+import numpy as np
+from django.db import connection
+from django.utils.text import smart_split, unescape_string_literal
+
+from .models import Student
+from .versioning import LocalVersion, current_version
+
+
+# In-process trigram index over normalized Student.full_name and student_id.
+# Students saved since the last build live in a small overlay scanned directly.
+
+logger = logging.getLogger(__name__)
+
+SEARCH_VERSION_KEY = "student_search"
+
+# dirty students scanned linearly before the index is rebuilt
+REBUILD_AFTER = 5000
+
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")  # harakat, Quranic marks, tatweel
+_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",  # alef forms
+    "ى": "ي",  # alef maksura -> yeh
+    "ة": "ه",  # teh marbuta -> heh
+    "ؤ": "و",  # waw with hamza
+    "ئ": "ي",  # yeh with hamza
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + i): str(i) for i in range(10)},  # Persian digits
+})
+_SPACES = re.compile(r"\s+")
+
+_LOCK = threading.RLock()
+_VERSION = LocalVersion(SEARCH_VERSION_KEY, _LOCK)
+# _DOCS and _POSTINGS are never mutated once installed; _PATCHED is replaced,
+# not mutated, so searches scan a snapshot outside the lock
+_DOCS = None       # pk -> normalized "name\nstudent_id"
+_POSTINGS = {}     # trigram -> sorted int32 array of pks
+_PATCHED = {}      # pk -> document (None: deleted) saved since the build
+_BUILDING = None   # background rebuild thread
+_TOUCHED = set()   # pks patched while it runs
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _ARABIC_MARKS.sub("", text).translate(_FOLD)
+    return _SPACES.sub(" ", text).strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _document(full_name, student_id):
+    return f"{normalize(full_name)}\n{normalize(student_id)}"
+
+
+def _build():
+    docs, postings = {}, {}
+    rows = Student.objects.order_by("id").values_list("id", "full_name", "student_id").iterator(chunk_size=5000)
+    for pk, full_name, student_id in rows:
+        doc = docs[pk] = _document(full_name, student_id)
+        for gram in trigrams(doc):
+            postings.setdefault(gram, []).append(pk)
+    return docs, {gram: np.asarray(pks, dtype=np.int32) for gram, pks in postings.items()}
+
+
+def _install(version, docs, postings):
+    global _DOCS, _POSTINGS, _PATCHED
+
+    with _LOCK:
+        # students patched while the build ran stay in the overlay
+        _DOCS, _POSTINGS = docs, postings
+        _PATCHED = {pk: _PATCHED[pk] for pk in _TOUCHED if pk in _PATCHED}
+        _TOUCHED.clear()
+        # a local patch may have published a newer stamp while this build ran
+        if _VERSION.value is None or version > _VERSION.value:
+            _VERSION.value = version
+
+
+def _rebuild(version):
+    global _BUILDING
+
+    try:
+        _install(version, *_build())
+    except Exception:
+        logger.exception("Student search index rebuild failed")
+    finally:
+        connection.close()
+        with _LOCK:
+            _BUILDING = None
+            _TOUCHED.clear()
+
+
+def _ensure_index():
+    global _BUILDING
+
+    version = current_version(SEARCH_VERSION_KEY)
+    if _DOCS is None:
+        _install(version, *_build())
+    elif (version != _VERSION.value or len(_PATCHED) > REBUILD_AFTER) and _BUILDING is None:
+        _BUILDING = threading.Thread(target=_rebuild, args=(version,), name="search-rebuild", daemon=True)
+        _BUILDING.start()
+
+
+def query_terms(query):
+    """Normalized terms of an admin-style query: whitespace-split, quotes kept together."""
+    terms = []
+    for bit in smart_split(query or ""):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        term = normalize(bit)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def search_students(query, limit=None, split_terms=False):
+    """
+    Pks of students whose name or student id contains ``query`` after
+    normalization, in ascending order. With ``split_terms``, every
+    whitespace-separated term must be contained instead. None for an empty
+    query. With ``limit``, at most that many pks are returned.
+    """
+    if split_terms:
+        terms = query_terms(query)
+    else:
+        terms = [normalize(query)] if normalize(query) else []
+    if not terms:
+        return None
+
+    with _LOCK:
+        _ensure_index()
+        docs, postings, patched = _DOCS, _POSTINGS, _PATCHED
+
+    grams = set().union(*(trigrams(term) for term in terms))
+    if not grams:
+        # too short for a trigram: scan the normalized text
+        candidates = docs.keys()
+    else:
+        arrays = []
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                arrays = []
+                break
+            arrays.append(posting)
+        arrays.sort(key=len)
+        candidates = arrays[0] if arrays else np.empty(0, np.int32)
+        for posting in arrays[1:]:
+            if not candidates.size:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        candidates = candidates.tolist()
+
+    hits = set()
+    for pk in candidates:
+        if pk in patched:
+            continue
+        doc = docs[pk]
+        if all(term in doc for term in terms):
+            hits.add(pk)
+            if limit is not None and len(hits) >= limit:
+                break
+
+    for pk, doc in patched.items():
+        if doc is not None and all(term in doc for term in terms):
+            hits.add(pk)
+
+    hits = sorted(hits)
+    return hits[:limit] if limit is not None else hits
+
+
+def search_upsert(student):
+    global _PATCHED
+
+    with _LOCK:
+        if _DOCS is not None:
+            _PATCHED = {**_PATCHED, student.pk: _document(student.full_name, student.student_id)}
+        if _BUILDING is not None:
+            _TOUCHED.add(student.pk)
+        # other workers rebuild; this one already patched its index
+        _VERSION.publish()
+
+
+def search_remove(student_pk):
+    global _PATCHED
+
+    with _LOCK:
+        if _DOCS is not None:
+            _PATCHED = {**_PATCHED, student_pk: None}
+        if _BUILDING is not None:
+            _TOUCHED.add(student_pk)
+        _VERSION.publish()
@@ -1,32 +1,112 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import Attendance, AttendanceBackup, AuditLog
+from .models import Attendance, Student, Room, RoomAccess, RoomPresence, Enrollment, CourseSession
+from .audit_writer import write_attendance_backups, write_audit_logs
+from .matching import gallery_upsert, gallery_remove, invalidate_room_candidates
+from .authorization import invalidate_rooms, invalidate_room_access
+from .schedule import session_changed, enrollment_changed
+from .search import search_upsert, search_remove
+from .rollups import record_attendance, uncount_presence
+from .versioning import bump_version
+
+
+# bumped on every Attendance write; drives the API ETag and the dashboard stream
+ATTENDANCE_VERSION_KEY = "attendance"
+
+
+def publish_attendance_change():
+    transaction.on_commit(lambda: bump_version(ATTENDANCE_VERSION_KEY))
 
 
 @receiver(post_save, sender=Attendance)
 def backup_and_audit_attendance(sender, instance, created, **kwargs):
     if not created:
+        publish_attendance_change()
         return
 
-  
-    AttendanceBackup.objects.create(
-        original_attendance_id=instance.id,
-        student_id=instance.student.student_id,
-        status=instance.status,
-        confidence=instance.confidence,
-        timestamp=instance.timestamp
-    )
-
-   
-    AuditLog.objects.create(
-        action="ATTENDANCE_BACKUP_CREATED",
-        username=instance.student.student_id,
-        ip_address="127.0.0.1",
-        user_agent="FACE_SYSTEM",
-        data={
-            "attendance_id": instance.id,
-            "backup_time": timezone.now().isoformat()
+    backup_and_audit_attendance_bulk([instance])
+
+
+@receiver(post_delete, sender=Attendance)
+def publish_attendance_delete(sender, instance, **kwargs):
+    publish_attendance_change()
+
+
+def backup_and_audit_attendance_bulk(attendances):
+    # bulk_create skips post_save, so bulk writers call this explicitly, in
+    # the inserting transaction; backups and audit rows go through the
+    # buffered audit writer when it is enabled
+    attendances = [a for a in attendances if a.pk is not None]
+    if not attendances:
+        return
+
+    publish_attendance_change()
+    record_attendance(attendances)
+    write_attendance_backups(attendances)
+
+    backup_time = timezone.now().isoformat()
+    write_audit_logs([
+        {
+            "action": "ATTENDANCE_BACKUP_CREATED",
+            "username": a.student.student_id,
+            "ip_address": "127.0.0.1",
+            "user_agent": "FACE_SYSTEM",
+            "data": {
+                "attendance_id": a.id,
+                "backup_time": backup_time
+            },
         }
-    )
+        for a in attendances
+    ])
+
+
+@receiver(post_delete, sender=RoomPresence)
+def uncount_deleted_presence(sender, instance, **kwargs):
+    if instance.counted:
+        uncount_presence(instance.room_id)
+
+
+@receiver(post_save, sender=Student)
+def sync_gallery_on_save(sender, instance, **kwargs):
+    # after commit, so other workers cannot reload the old rows under the new stamp
+    transaction.on_commit(lambda: (gallery_upsert(instance), search_upsert(instance)))
+
+
+@receiver(post_delete, sender=Student)
+def sync_gallery_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: (gallery_remove(pk), search_remove(pk)))
+
+
+@receiver(post_save, sender=RoomAccess)
+@receiver(post_delete, sender=RoomAccess)
+def refresh_room_candidates_on_access(sender, instance, **kwargs):
+    room_id = instance.room_id
+    # after commit, so other workers cannot reload the old rows under the new stamp
+    transaction.on_commit(lambda: (invalidate_room_candidates([room_id]), invalidate_room_access([room_id])))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def refresh_room_index(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_rooms)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def refresh_room_candidates_on_enrollment(sender, instance, **kwargs):
+    rooms = set(CourseSession.objects.filter(course_id=instance.course_id).values_list("room_id", flat=True))
+    transaction.on_commit(lambda: invalidate_room_candidates(rooms))
+    created, deleted = kwargs.get("created", False), kwargs["signal"] is post_delete
+    transaction.on_commit(lambda: enrollment_changed(instance, created=created, deleted=deleted))
+
+
+@receiver(post_save, sender=CourseSession)
+@receiver(post_delete, sender=CourseSession)
+def refresh_room_candidates_on_session(sender, instance, **kwargs):
+    # a session may have moved rooms; the old room is not known here
+    transaction.on_commit(invalidate_room_candidates)
+    transaction.on_commit(lambda: session_changed(instance))
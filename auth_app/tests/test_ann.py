@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from auth_app import matching
+from auth_app.models import Student
+from auth_app.versioning import bump_version
+from face_service.ann import IVFIndex
+from face_service.gallery import FaceGallery
+
+
+def unit(rng, n, dim=32):
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class IVFGalleryTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "ivf.npz")
+        self.vecs = unit(np.random.default_rng(0), 400)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_shortlist_finds_enrolled_rows(self):
+        gallery = FaceGallery()
+        gallery.load(enumerate(self.vecs))
+        gallery.attach_index(IVFIndex.train(self.vecs, 16))
+        for key in range(0, 400, 40):
+            self.assertEqual(gallery.search(self.vecs[key], nprobe=1)[0][0], key)
+
+    def test_stored_assignments_of_re_enrolled_rows_are_recomputed(self):
+        built = FaceGallery()
+        built.load(enumerate(self.vecs))
+        built.attach_index(IVFIndex.train(self.vecs, 16))
+        built.index.save(self.path)
+
+        # student 0 re-enrolled with a face from another cell after the build
+        moved = self.vecs.copy()
+        moved[0] = -self.vecs[0]
+        gallery = FaceGallery()
+        gallery.load(enumerate(moved))
+        gallery.attach_index(IVFIndex.load(self.path))
+
+        self.assertEqual(gallery.search(moved[0], nprobe=1)[0][0], 0)
+
+
+class IndexReloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        matching._GALLERY = None
+        matching._ANN_INDEX = None
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "ivf.npz")
+        for i, vec in enumerate(unit(np.random.default_rng(1), 60)):
+            Student.objects.create(student_id=f"S{i}", full_name=f"S{i}", face_encoding=vec.tobytes())
+
+    def tearDown(self):
+        matching._GALLERY = None
+        matching._ANN_INDEX = None
+        shutil.rmtree(self.dir)
+
+    def build(self, nlist):
+        gallery = FaceGallery()
+        matching.load_gallery(gallery)
+        IVFIndex.train(gallery.vectors()[1], nlist).save(self.path)
+        os.utime(self.path, ns=(nlist * 10**9, nlist * 10**9))
+        bump_version(matching.GALLERY_VERSION_KEY)
+
+    def test_rebuilt_index_is_picked_up_without_a_restart(self):
+        with override_settings(FACE_ANN_INDEX_PATH=self.path, FACE_ANN_MIN_GALLERY=1):
+            self.build(4)
+            self.assertEqual(matching.get_gallery().index.nlist, 4)
+            self.build(8)
+            self.assertEqual(matching.get_gallery().index.nlist, 8)
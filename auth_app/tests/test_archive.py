@@ -0,0 +1,43 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app import archive, audit_archive
+from auth_app.models import Attendance, AuditLog, Room, Student
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False)
+class ArchiveCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ATTENDANCE_ARCHIVE_DIR=self.tmp.name + "/attendance",
+                                     AUDIT_ARCHIVE_DIR=self.tmp.name + "/audit")
+        override.enable()
+        self.addCleanup(override.disable)
+        archive._STATE = None
+
+    def test_archived_attendance_is_served_from_the_cold_tier(self):
+        room = Room.objects.create(name="Lab", code="R1")
+        student = Student.objects.create(student_id="S1", full_name="One")
+        now = timezone.now()
+        old = Attendance.objects.create(student=student, room=room, status="IN", timestamp=now - timedelta(days=40))
+        Attendance.objects.create(student=student, room=room, status="IN", timestamp=now)
+
+        call_command("archive_attendance", "--older-than-days", "30", stdout=StringIO())
+
+        self.assertEqual(Attendance.objects.count(), 1)
+        self.assertEqual([r["id"] for r in archive.cold_page(10)], [old.pk])
+
+    def test_compacted_audit_rows_are_served_from_the_archive(self):
+        old = AuditLog.objects.create(action="LOGIN", username="a", created_at=timezone.now() - timedelta(days=10))
+        AuditLog.objects.create(action="LOGIN", username="b")
+
+        call_command("compact_audit_log", "--keep-days", "2", stdout=StringIO())
+
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertEqual([r["id"] for r in audit_archive.archived_page(10)], [old.pk])
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from auth_app.audit_writer import NODE, AuditWriter
+from auth_app.integrity import TABLES
+from auth_app.integrity_worker import SIGNATURE_MISMATCH, check_rows
+from auth_app.models import HMAC_SECRET, AuditLog, hmac_signature
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", ""])
+    proc.wait()
+    return proc.pid
+
+
+class JournalReplayTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close()
+        shutil.rmtree(self.dir)
+
+    def writer(self):
+        writer = AuditWriter(self.dir, flush_interval=3600)
+        self.writers.append(writer)
+        return writer
+
+    def fields(self):
+        return {"action": "LOGIN", "username": "u", "ip_address": "1.2.3.4", "user_agent": "t", "data": {},
+                "created_at": timezone.now(), "event_id": uuid.uuid4()}
+
+    def leave_journal(self, name, records):
+        with open(os.path.join(self.dir, name), "w", encoding="utf-8") as f:
+            for fields in records:
+                f.write(json.dumps({"kind": "audit", "fields": fields}, default=str) + "\n")
+
+    def test_segment_replayed_after_its_commit_inserts_nothing_twice(self):
+        fields = self.fields()
+        writer = self.writer()
+        writer.submit("audit", fields)
+        writer.flush()
+        # a process that crashed after the commit but before removing the segment
+        self.leave_journal(f"audit-{dead_pid()}@{NODE}.jsonl.1", [fields, self.fields()])
+
+        self.writer().flush()
+
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertEqual(AuditLog.objects.filter(event_id=fields["event_id"]).count(), 1)
+
+    def test_only_dead_journals_of_this_host_are_claimed(self):
+        host = NODE.partition("~")[0]
+        self.leave_journal(f"audit-1@{host}~earlierboot.jsonl", [])
+        self.leave_journal(f"audit-1@{host}x~{NODE.partition('~')[2]}.jsonl", [])
+        self.leave_journal(f"audit-{os.getppid()}@{NODE}.jsonl", [])
+
+        claimed = [os.path.basename(path) for path in self.writer()._orphans]
+
+        self.assertEqual(claimed, [f"replay-{os.getpid()}@{NODE}-audit-1@{host}~earlierboot.jsonl"])
+
+
+class AuditSignatureFormatTests(TestCase):
+    def test_rows_signed_before_and_after_event_time_both_verify(self):
+        created_at = timezone.now().replace(microsecond=0)
+        # before migration 0010 save() signed with created_at still unset
+        AuditLog.objects.bulk_create([
+            AuditLog(action="OLD", username="u", ip_address="1.2.3.4", created_at=created_at,
+                     signature=hmac_signature("OLD|u|1.2.3.4|None")),
+            AuditLog(action="NEW", username="u", ip_address="1.2.3.4", created_at=created_at,
+                     signature=hmac_signature(f"NEW|u|1.2.3.4|{created_at}")),
+            AuditLog(action="BAD", username="u", ip_address="1.2.3.4", created_at=created_at,
+                     signature=hmac_signature(f"BAD|u|1.2.3.4|{created_at + timedelta(seconds=1)}")),
+        ])
+        AuditLog.objects.create(action="SAVED", username="u", ip_address="1.2.3.4")
+
+        rows = list(AuditLog.objects.order_by("id").values_list(*TABLES["audit"][1]))
+        bad, _ = check_rows("audit", HMAC_SECRET, rows)
+
+        self.assertEqual(bad, [(AuditLog.objects.get(action="BAD").pk, SIGNATURE_MISMATCH)])
@@ -0,0 +1,49 @@
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from face_service.batching import InferenceScheduler
+
+
+class FakeModel:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def embed_batch(self, batch):
+        self.calls.append(batch.shape[0])
+        if self.fail:
+            raise RuntimeError("boom")
+        return batch.reshape(batch.shape[0], -1)[:, :4].copy()
+
+
+def crop(value, n=1):
+    return np.full((n, 3, 112, 112), value, np.float32)
+
+
+class InferenceSchedulerTests(SimpleTestCase):
+    def test_concurrent_requests_share_one_run(self):
+        model = FakeModel()
+        scheduler = InferenceScheduler(model, max_batch=3, max_wait_ms=2000)
+        self.addCleanup(scheduler.close)
+        futures = [scheduler.submit(crop(1.0)), scheduler.submit(crop(2.0, n=2))]
+
+        self.assertEqual(futures[0].result(timeout=5).tolist(), [[1.0] * 4])
+        self.assertEqual(futures[1].result(timeout=5).tolist(), [[2.0] * 4] * 2)
+        self.assertEqual(model.calls, [3])
+        self.assertEqual(scheduler.stats()["batches"], 1)
+
+    def test_model_error_reaches_every_caller(self):
+        scheduler = InferenceScheduler(FakeModel(fail=True), max_batch=2, max_wait_ms=2000)
+        self.addCleanup(scheduler.close)
+        futures = [scheduler.submit(crop(1.0)) for _ in range(2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+    def test_closed_scheduler_refuses_work(self):
+        scheduler = InferenceScheduler(FakeModel())
+        scheduler.close()
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(crop(1.0))
@@ -0,0 +1,49 @@
+import threading
+
+from django.db import IntegrityError, transaction
+from django.test import TransactionTestCase, override_settings
+
+from auth_app import db_writer
+from auth_app.db_writer import DatabaseWriter, get_db_writer, run_write
+from auth_app.models import Room
+
+
+@override_settings(SQLITE_CONCURRENCY_MODE=True, SQLITE_SINGLE_WRITER=True, AUDIT_WRITER_ENABLED=False)
+class SingleWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(db_writer.reset_db_writer)
+
+    def test_writes_run_on_the_writer_thread(self):
+        threads = []
+
+        def create():
+            threads.append(threading.current_thread().name)
+            return Room.objects.create(name="Lab", code="R1").pk
+
+        pk = run_write(create)
+        self.assertEqual(threads, ["db-writer"])
+        self.assertTrue(Room.objects.filter(pk=pk).exists())
+        self.assertEqual(get_db_writer().stats()["committed"], 1)
+
+    def test_writes_inside_a_transaction_run_inline(self):
+        threads = []
+        with transaction.atomic():
+            run_write(lambda: threads.append(threading.current_thread().name))
+        self.assertEqual(threads, [threading.current_thread().name])
+
+    def test_a_failing_job_does_not_roll_back_its_group(self):
+        writer = DatabaseWriter(max_batch=8, timeout=5)
+        self.addCleanup(writer.close)
+        release = threading.Event()
+        blocker = writer.submit(release.wait, 5)
+        good = writer.submit(Room.objects.create, name="Lab", code="R1")
+        bad = writer.submit(Room.objects.create, name="Dup", code="R1")
+        release.set()
+
+        blocker.result(timeout=5)
+        self.assertEqual(good.result(timeout=5).code, "R1")
+        with self.assertRaises(IntegrityError):
+            bad.result(timeout=5)
+        self.assertEqual(Room.objects.count(), 1)
+        self.assertEqual(writer.stats()["committed"], 3)
+        self.assertEqual(writer.stats()["failures"], 0)
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from auth_app import debounce
+from auth_app.debounce import AttendanceDebouncer, get_debouncer, lock_students, record_once
+from auth_app.models import Attendance, Room, Student
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False)
+class DebounceTests(TestCase):
+    def setUp(self):
+        debounce._DEBOUNCER = None
+        self.room = Room.objects.create(name="Lab", code="R1")
+        self.student = Student.objects.create(student_id="S1", full_name="One")
+
+    def arrive(self, ago=0, status="IN"):
+        return Attendance.objects.create(student=self.student, room=self.room, status=status,
+                                         timestamp=timezone.now() - timedelta(seconds=ago))
+
+    def test_row_from_another_worker_is_found_in_the_index(self):
+        att = self.arrive(ago=10)
+        debouncer = AttendanceDebouncer(window=60)
+        self.assertEqual(debouncer.recent(self.student.pk, self.room.pk, "IN"), (att.pk, att.timestamp))
+        self.assertIsNone(debouncer.recent(self.student.pk, self.room.pk, "FORBIDDEN"))
+        self.assertEqual(debouncer.stats()["suppressed_from_db"], 1)
+
+    def test_rows_outside_the_window_are_ignored(self):
+        debouncer = AttendanceDebouncer(window=60)
+        debouncer.remember([self.arrive(ago=120)])
+        self.assertIsNone(debouncer.recent(self.student.pk, self.room.pk, "IN"))
+        self.assertEqual(debouncer.stats()["cached"], 0)
+
+    def test_sqlite_lock_is_a_write(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            lock_students([self.student.pk])
+        self.assertTrue(any(q["sql"].startswith("UPDATE") for q in queries.captured_queries))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.student_id, "S1")
+
+    def test_record_once_retries_a_locked_database(self):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "ok"
+
+        with mock.patch.object(debounce.connection, "in_atomic_block", False), \
+                mock.patch.object(debounce.time, "sleep"):
+            self.assertEqual(record_once(write), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_get_debouncer_is_shared_and_can_be_disabled(self):
+        self.assertIs(get_debouncer(), get_debouncer())
+        with override_settings(ATTENDANCE_DEBOUNCE_SECONDS=0):
+            self.assertIsNone(get_debouncer())
@@ -0,0 +1,37 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from face_service import engine_onnx
+from face_service.engine_onnx import detect_faces_rgb, detection_scale
+
+
+FRAME = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+
+class DetectionScaleTests(SimpleTestCase):
+    def test_scale_targets_the_detector_input_size(self):
+        self.assertAlmostEqual(detection_scale(FRAME.shape, 640), 1 / 3)
+        self.assertEqual(detection_scale((480, 640, 3), 640), 1.0)
+        self.assertEqual(detection_scale(FRAME.shape, 0), 1.0)
+
+    def test_haar_runs_when_mediapipe_only_finds_small_faces(self):
+        seen = []
+        mediapipe = mock.Mock(side_effect=lambda small: seen.append(small.shape) or [((0, 0, 10, 10), 0.9)])
+        haar = mock.Mock(return_value=[(100, 100, 200, 200)])
+        with mock.patch.object(engine_onnx, "_mp_detect_all", mediapipe), \
+                mock.patch.object(engine_onnx, "_detect_faces_haar", haar):
+            faces = detect_faces_rgb(FRAME, min_size=40, max_side=640)
+
+        self.assertEqual(seen, [(360, 640, 3)])
+        self.assertEqual(faces, [((300, 300, 600, 600), None)])
+
+    def test_a_miss_is_retried_where_min_size_faces_are_detectable(self):
+        seen = []
+        mediapipe = mock.Mock(side_effect=lambda small: seen.append(small.shape) or [])
+        with mock.patch.object(engine_onnx, "_mp_detect_all", mediapipe), \
+                mock.patch.object(engine_onnx, "_detect_faces_haar", return_value=[]):
+            self.assertEqual(detect_faces_rgb(FRAME, min_size=40, max_side=640), [])
+
+        self.assertEqual(seen, [(360, 640, 3), (648, 1152, 3)])
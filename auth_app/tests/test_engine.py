@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+import onnx
+from django.test import SimpleTestCase
+from onnx import TensorProto, helper
+
+from face_service.engine_onnx import ArcFaceONNX, optimized_model_path
+
+
+def write_model(path):
+    x = helper.make_tensor_value_info("x", TensorProto.FLOAT, ["n", 3, 112, 112])
+    y = helper.make_tensor_value_info("y", TensorProto.FLOAT, ["n", 3, 112, 112])
+    graph = helper.make_graph([helper.make_node("Identity", ["x"], ["y"])], "g", [x], [y])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+class OptimizedModelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.model = os.path.join(self.dir, "arcface.onnx")
+        write_model(self.model)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cache_is_renamed_into_place_and_reused(self):
+        first = ArcFaceONNX(self.model, cache_optimized=True)
+        self.assertFalse(first.loaded_from_cache)
+        self.assertTrue(os.path.exists(optimized_model_path(self.model)))
+        self.assertEqual([f for f in os.listdir(self.dir) if f.endswith(".tmp")], [])
+
+        self.assertTrue(ArcFaceONNX(self.model, cache_optimized=True).loaded_from_cache)
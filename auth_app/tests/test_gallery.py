@@ -0,0 +1,67 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from auth_app import matching
+from auth_app.models import Student
+from face_service.gallery import FaceGallery
+
+
+def unit(rng, n, dim=64):
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class FaceGalleryTests(SimpleTestCase):
+    def test_compact_storage_ranks_like_float32(self):
+        rng = np.random.default_rng(0)
+        vecs = unit(rng, 200)
+        exact = {i: v for i, v in enumerate(vecs)}
+        probes = unit(rng, 20) * 0.3 + vecs[:20]
+        reference = FaceGallery()
+        reference.load(exact.items())
+        for storage in ("float16", "int8"):
+            gallery = FaceGallery(storage=storage, rerank=8, rerank_source=lambda keys: {k: exact[k] for k in keys})
+            gallery.load(exact.items())
+            for probe in probes:
+                (want, want_score), = reference.search(probe)
+                (got, got_score), = gallery.search(probe)
+                self.assertEqual(got, want)
+                self.assertAlmostEqual(got_score, want_score, places=5)
+
+    def test_removed_rows_are_reused(self):
+        vecs = unit(np.random.default_rng(1), 3)
+        gallery = FaceGallery()
+        gallery.load(enumerate(vecs[:2]))
+        row = gallery.remove(0)
+        self.assertEqual(gallery.upsert(5, vecs[2]), row)
+        self.assertEqual(gallery.search(vecs[2])[0][0], 5)
+        self.assertNotIn(0, gallery)
+
+
+@override_settings(FACE_GALLERY_RERANK_CACHE=2)
+class ExactEmbeddingCacheTests(TestCase):
+    def setUp(self):
+        matching._forget_exact()
+        rng = np.random.default_rng(2)
+        self.students = [
+            Student.objects.create(student_id=f"S{i}", full_name=f"S{i}", face_encoding=v.tobytes())
+            for i, v in enumerate(unit(rng, 3))
+        ]
+
+    def test_repeat_candidates_are_served_from_memory(self):
+        keys = [s.pk for s in self.students[:2]]
+        first = matching.exact_embeddings(keys)
+        with self.assertNumQueries(0):
+            again = matching.exact_embeddings(keys)
+        self.assertEqual(sorted(again), sorted(keys))
+        np.testing.assert_array_equal(again[keys[0]], first[keys[0]])
+
+    def test_cache_is_bounded_and_follows_enrollment(self):
+        matching.exact_embeddings([s.pk for s in self.students])
+        self.assertEqual(len(matching._EXACT), 2)
+
+        student = self.students[2]
+        student.face_encoding = np.ones(64, dtype=np.float32).tobytes()
+        student.save()
+        matching.gallery_upsert(student)
+        self.assertEqual(float(matching.exact_embeddings([student.pk])[student.pk][0]), 1.0)
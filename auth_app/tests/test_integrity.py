@@ -0,0 +1,55 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app import archive
+from auth_app.integrity import seal_blocks, verify, verify_chain
+from auth_app.models import Attendance, IntegrityBlock, Room, Student
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False, INTEGRITY_WORKERS=1)
+class IntegrityTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ATTENDANCE_ARCHIVE_DIR=os.path.join(self.tmp.name, "archive"))
+        override.enable()
+        self.addCleanup(override.disable)
+        archive._STATE = None
+        room = Room.objects.create(name="Lab", code="R1")
+        student = Student.objects.create(student_id="S1", full_name="One")
+        self.rows = [
+            Attendance.objects.create(student=student, room=room, status="IN",
+                                      timestamp=timezone.now() - timedelta(hours=5 - i))
+            for i in range(5)
+        ]
+
+    def test_sealed_blocks_verify(self):
+        sealed, bad = seal_blocks("attendance", block_rows=2, lag_seconds=0)
+        self.assertEqual((sealed, bad), (2, []))
+        report = verify("attendance")
+        self.assertTrue(report["ok"])
+        self.assertEqual((report["rows_checked"], report["blocks_checked"]), (5, 2))
+        self.assertEqual(report["unsealed_from_id"], self.rows[4].pk)
+
+    def test_edited_row_fails_its_hmac_and_block(self):
+        seal_blocks("attendance", block_rows=2, lag_seconds=0)
+        Attendance.objects.filter(pk=self.rows[1].pk).update(status="FORBIDDEN")
+        report = verify("attendance")
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["tampered_ids"], [self.rows[1].pk])
+        self.assertEqual([b["seq"] for b in report["blocks_failed"]], [0])
+
+    def test_deleted_row_fails_its_block(self):
+        seal_blocks("attendance", block_rows=2, lag_seconds=0)
+        Attendance.objects.filter(pk=self.rows[2].pk).delete()
+        report = verify("attendance")
+        self.assertEqual([b["seq"] for b in report["blocks_failed"]], [1])
+
+    def test_rewritten_block_breaks_the_chain(self):
+        seal_blocks("attendance", block_rows=2, lag_seconds=0)
+        IntegrityBlock.objects.filter(table="attendance", seq=0).update(root="0" * 64)
+        self.assertEqual(verify_chain("attendance"), (False, 0))
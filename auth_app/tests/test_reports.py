@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from datetime import date, datetime, time
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app.models import Attendance, Course, CourseSession, Enrollment, Room, Student
+from auth_app.reports import build_reports
+
+
+MONDAY = date(2026, 10, 12)
+SUNDAY = date(2026, 10, 18)
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False, SCHEDULE_EARLY_MINUTES=15, REPORT_WEEKDAYS=[0, 1, 2, 3, 4])
+class ReportTests(TestCase):
+    def setUp(self):
+        self.archive = tempfile.mkdtemp()
+        self.override = override_settings(ATTENDANCE_ARCHIVE_DIR=self.archive)
+        self.override.enable()
+        self.room = Room.objects.create(name="Lab", code="R1")
+        self.student = Student.objects.create(student_id="S1", full_name="One")
+        self.course = Course.objects.create(code="C1", name="Course")
+        Enrollment.objects.create(student=self.student, course=self.course)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.archive)
+
+    def session(self, weekday):
+        return CourseSession.objects.create(course=self.course, room=self.room, weekday=weekday,
+                                            start_time=time(9), end_time=time(11))
+
+    def arrive(self, when, session=None):
+        Attendance.objects.create(student=self.student, room=self.room, session=session, status="IN", timestamp=when)
+
+    def report(self, **kwargs):
+        report, = build_reports(MONDAY, SUNDAY, **kwargs)
+        return next(report.rows({}, detail=True))
+
+    def test_weekday_session_meets_once_a_week(self):
+        monday = self.session(0)
+        self.arrive(at(MONDAY, 9, 20), monday)
+        row = self.report()
+        self.assertEqual((row["occurrences"], row["present"], row["late"], row["sheet"]), (1, 1, 1, "L"))
+
+    def test_daily_session_skips_the_weekend_by_default(self):
+        self.session(None)
+        self.arrive(at(MONDAY, 8, 50))
+        row = self.report()
+        self.assertEqual((row["occurrences"], row["sheet"]), (5, "PAAAA"))
+        self.assertEqual(self.report(weekdays=(5, 6))["occurrences"], 2)
+
+    def test_untagged_arrival_only_counts_on_the_sessions_day(self):
+        self.session(1)
+        self.arrive(at(MONDAY, 9, 5))
+        row = self.report()
+        self.assertEqual((row["occurrences"], row["present"]), (1, 0))
+        self.arrive(at(date(2026, 10, 13), 9, 5))
+        self.assertEqual(self.report()["sheet"], "P")
@@ -0,0 +1,74 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app.models import Attendance, AttendanceHourly, Room, RoomOccupancy, RoomPresence, Student
+from auth_app.rollups import current_occupancy, room_occupancy
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False, OCCUPANCY_WINDOW_MINUTES=60)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.lab = Room.objects.create(name="Lab", code="R1")
+        self.hall = Room.objects.create(name="Hall", code="R2")
+        self.one = Student.objects.create(student_id="S1", full_name="One")
+        self.two = Student.objects.create(student_id="S2", full_name="Two")
+
+    def arrive(self, student, room, status="IN", ago=0):
+        return Attendance.objects.create(
+            student=student, room=room, status=status, timestamp=timezone.now() - timedelta(minutes=ago)
+        )
+
+    def test_counters_follow_each_write(self):
+        self.arrive(self.one, self.lab)
+        self.arrive(self.two, self.lab)
+        self.arrive(self.two, self.lab, status="FORBIDDEN")
+        self.assertEqual(current_occupancy(), {self.lab.pk: 2})
+        self.assertEqual(room_occupancy()[self.lab.pk].ins, 2)
+        self.assertEqual(
+            sum(AttendanceHourly.objects.filter(room=self.lab, status="FORBIDDEN").values_list("count", flat=True)),
+            1,
+        )
+
+    def test_arrival_elsewhere_moves_the_student(self):
+        self.arrive(self.one, self.lab, ago=5)
+        self.arrive(self.one, self.hall)
+        self.assertEqual(current_occupancy(), {self.hall.pk: 1})
+
+    def test_older_arrival_does_not_move_the_student(self):
+        self.arrive(self.one, self.hall)
+        self.arrive(self.one, self.lab, ago=5)
+        self.assertEqual(current_occupancy(), {self.hall.pk: 1})
+        self.assertEqual(RoomPresence.objects.get(student=self.one).room_id, self.hall.pk)
+
+    def test_arrivals_age_out_of_the_window(self):
+        self.arrive(self.one, self.lab, ago=90)
+        self.arrive(self.two, self.lab, ago=30)
+        self.assertEqual(current_occupancy(), {self.lab.pk: 1})
+        self.assertEqual(current_occupancy(now=timezone.now() + timedelta(minutes=45)), {})
+        # the next write folds the aged-out presence into the counter
+        self.arrive(self.one, self.hall)
+        self.assertEqual(RoomOccupancy.objects.get(room=self.lab).present, 1)
+
+    def test_deleting_a_student_uncounts_them(self):
+        self.arrive(self.one, self.lab)
+        self.one.delete()
+        self.assertEqual(current_occupancy(), {})
+
+    def test_rebuild_matches_the_live_counters(self):
+        self.arrive(self.one, self.lab, ago=10)
+        self.arrive(self.one, self.hall)
+        self.arrive(self.two, self.lab, ago=90)
+        self.arrive(self.two, self.lab, status="OUT")
+        live = (current_occupancy(), {pk: (r.ins, r.outs) for pk, r in room_occupancy().items()})
+        hourly = set(AttendanceHourly.objects.values_list("room_id", "hour", "status", "count"))
+
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(ATTENDANCE_ARCHIVE_DIR=archive_dir):
+            call_command("rebuild_rollups", stdout=StringIO())
+
+        self.assertEqual(live, (current_occupancy(), {pk: (r.ins, r.outs) for pk, r in room_occupancy().items()}))
+        self.assertEqual(hourly, set(AttendanceHourly.objects.values_list("room_id", "hour", "status", "count")))
@@ -0,0 +1,62 @@
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from auth_app import schedule
+from auth_app.authorization import authorize_attendance
+from auth_app.models import Course, CourseSession, Enrollment, Room, RoomAccess, Student
+
+
+# 2026-10-12 is a Monday
+MONDAY_10 = datetime(2026, 10, 12, 10, 0)
+TUESDAY_10 = datetime(2026, 10, 13, 10, 0)
+
+
+class WeekIntervalTests(SimpleTestCase):
+    def test_weekday_session_covers_only_its_day(self):
+        pieces = schedule.week_pieces(1, time(9), time(11))
+        self.assertEqual(pieces, [(schedule.DAY_SECONDS + 9 * 3600, schedule.DAY_SECONDS + 11 * 3600)])
+
+    def test_sunday_overnight_session_wraps_into_monday(self):
+        pieces = schedule.week_pieces(6, time(23), time(1))
+        self.assertEqual(pieces, [(6 * schedule.DAY_SECONDS + 23 * 3600, schedule.WEEK_SECONDS), (0, 3600)])
+
+    def test_blank_weekday_meets_daily(self):
+        self.assertEqual(len(schedule.week_pieces(None, time(9), time(11))), 7)
+
+
+@override_settings(SCHEDULE_EARLY_MINUTES=0)
+class ScheduleAuthorizationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        schedule._reset()
+        self.room = Room.objects.create(name="Lab", code="R1")
+        self.student = Student.objects.create(student_id="S1", full_name="One")
+        course = Course.objects.create(code="C1", name="Course")
+        Enrollment.objects.create(student=self.student, course=course)
+        self.session = CourseSession.objects.create(
+            course=course, room=self.room, weekday=0, start_time=time(9), end_time=time(11)
+        )
+
+    def test_enrolled_without_room_access_is_denied_by_default(self):
+        allowed, reason, session_pk = authorize_attendance(self.student, self.room, MONDAY_10)
+        self.assertFalse(allowed)
+        self.assertEqual(reason, "NO_ROOM_ACCESS_RECORD")
+        self.assertEqual(session_pk, self.session.pk)
+
+    @override_settings(SCHEDULE_AUTHORIZATION=True)
+    def test_session_authorizes_on_its_weekday(self):
+        allowed, reason, session_pk = authorize_attendance(self.student, self.room, MONDAY_10)
+        self.assertEqual((allowed, reason, session_pk), (True, "SCHEDULED_SESSION", self.session.pk))
+
+    @override_settings(SCHEDULE_AUTHORIZATION=True)
+    def test_session_on_another_weekday_is_denied(self):
+        allowed, reason, session_pk = authorize_attendance(self.student, self.room, TUESDAY_10)
+        self.assertEqual((allowed, reason, session_pk), (False, "NO_ROOM_ACCESS_RECORD", None))
+
+    @override_settings(SCHEDULE_AUTHORIZATION=True)
+    def test_explicit_denial_beats_the_session(self):
+        RoomAccess.objects.create(student=self.student, room=self.room, allowed=False)
+        allowed, reason, _ = authorize_attendance(self.student, self.room, MONDAY_10)
+        self.assertEqual((allowed, reason), (False, "ROOM_ACCESS_DENIED"))
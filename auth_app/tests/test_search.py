@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from auth_app import search
+from auth_app.models import Student
+from auth_app.search import normalize, search_students
+
+
+@override_settings(AUDIT_WRITER_ENABLED=False)
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        search._DOCS = None
+        search._PATCHED = {}
+        search._VERSION.value = None
+        self.ahmed = Student.objects.create(student_id="2024001", full_name="أحمد علي")
+        self.sara = Student.objects.create(student_id="2024002", full_name="Sara Ali")
+
+    def test_normalized_substring_match(self):
+        self.assertEqual(normalize("أحمـــدُ"), "احمد")
+        self.assertEqual(search_students("احمد"), [self.ahmed.pk])
+        self.assertEqual(search_students("٢٠٢٤٠٠٢"), [self.sara.pk])
+        self.assertEqual(search_students("ALI"), [self.sara.pk])
+        self.assertEqual(search_students("24"), [self.ahmed.pk, self.sara.pk])
+
+    def test_split_terms_must_all_match(self):
+        self.assertEqual(search_students("sara ali", split_terms=True), [self.sara.pk])
+        self.assertEqual(search_students("sara احمد", split_terms=True), [])
+        self.assertEqual(search_students('"sara ali"', split_terms=True), [self.sara.pk])
+
+    def test_saved_and_deleted_students_are_seen_before_a_rebuild(self):
+        search_students("sara")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sara.full_name = "Sarah Omar"
+            self.sara.save()
+            omar = Student.objects.create(student_id="2024003", full_name="Omar Ali")
+        self.assertEqual(search_students("omar"), [self.sara.pk, omar.pk])
+        self.assertEqual(search_students("sara ali", split_terms=True), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            omar.delete()
+        self.assertEqual(search_students("omar"), [self.sara.pk])
+
+    def test_background_install_does_not_move_the_stamp_back(self):
+        search_students("sara")
+        stamp = search._VERSION.value
+        search._install(stamp - 1, *search._build())
+        self.assertEqual(search._VERSION.value, stamp)
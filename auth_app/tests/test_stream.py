@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from auth_app import views
+
+
+class AttendanceStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        views._STREAMS = 0
+
+    def open(self):
+        return views.attendance_stream(RequestFactory().get("/auth/attendance/stream/"))
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.open().status_code, 404)
+
+    @override_settings(ATTENDANCE_STREAM_ENABLED=True, ATTENDANCE_STREAM_MAX=1)
+    def test_streams_past_the_cap_are_refused_until_one_closes(self):
+        first = self.open()
+        self.assertEqual(first.status_code, 200)
+        refused = self.open()
+        self.assertEqual((refused.status_code, refused["Retry-After"]), (503, "30"))
+
+        first.close()
+        second = self.open()
+        self.assertEqual(second.status_code, 200)
+        second.close()
+        self.assertEqual(views._STREAMS, 0)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from auth_app import debounce, views
+from auth_app.models import Attendance, Room, RoomAccess, Student
+from face_service.tracker import FaceTracker
+
+
+BOX = (10, 10, 110, 110)
+
+
+class FakeEngine:
+    def detect_faces(self, rgb, min_size=40, timings=None):
+        return [(BOX, 0.9)]
+
+
+class FaceTrackerTests(SimpleTestCase):
+    def test_unidentified_track_is_not_reused(self):
+        tracker = FaceTracker()
+        tracker.update("cam", BOX, None, 0.2, now=0.0)
+        self.assertIsNone(tracker.lookup("cam", BOX, now=0.5))
+
+    def test_identified_track_is_reused_until_reembed(self):
+        tracker = FaceTracker(reembed_after=3.0)
+        tracker.update("cam", BOX, 7, 0.9, now=0.0)
+        self.assertEqual(tracker.lookup("cam", BOX, now=1.0).identity, 7)
+        self.assertIsNone(tracker.lookup("cam", BOX, now=3.5))
+
+
+@override_settings(FACE_QUALITY_GATE=False, FACE_TRACKING_ENABLED=True, FACE_MATCH_THRESHOLD=0.35,
+                   AUDIT_WRITER_ENABLED=False, DEVICE_KEY="", SCHEDULE_AUTHORIZATION=False)
+class VerifyTrackingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        views._TRACKER = None
+        debounce._DEBOUNCER = None
+        self.room = Room.objects.create(code="R1", name="Room 1")
+        self.alice = Student.objects.create(student_id="A1", full_name="Alice")
+        self.bob = Student.objects.create(student_id="B1", full_name="Bob")
+        for student in (self.alice, self.bob):
+            RoomAccess.objects.create(student=student, room=self.room, allowed=True)
+        self.frame = cv2.imencode(".jpg", np.zeros((120, 120, 3), np.uint8))[1].tobytes()
+
+    def verify(self, matches):
+        with mock.patch.object(views, "get_arcface", return_value=FakeEngine()), \
+                mock.patch.object(views, "embed_probe", return_value=np.ones(4, np.float32)) as embed, \
+                mock.patch.object(views, "match_probe", side_effect=matches):
+            responses = [
+                self.client.post("/auth/verify/?room_code=R1", self.frame, content_type="image/jpeg",
+                                 HTTP_X_DEVICE_ID="cam-1").json()
+                for _ in matches
+            ]
+        return responses, embed.call_count
+
+    def test_sub_threshold_face_is_embedded_again(self):
+        responses, embeds = self.verify([(self.alice.pk, 0.2), (self.alice.pk, 0.9)])
+        self.assertEqual(embeds, 2)
+        self.assertFalse(responses[0]["matched"])
+        self.assertTrue(responses[1]["matched"])
+        self.assertFalse(responses[1]["tracked"])
+        self.assertEqual(Attendance.objects.filter(student=self.alice, status="IN").count(), 1)
+
+    def test_tracked_face_only_repeats_an_existing_row(self):
+        responses, embeds = self.verify([(self.alice.pk, 0.9), (self.alice.pk, 0.9)])
+        self.assertEqual(embeds, 1)
+        self.assertTrue(responses[1]["tracked"])
+        self.assertTrue(responses[1]["duplicate"])
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_new_face_in_tracked_box_is_matched_before_writing(self):
+        self.verify([(self.alice.pk, 0.9)])
+        # Alice's row falls out of the debounce window; Bob steps into her box
+        Attendance.objects.all().delete()
+        debounce._DEBOUNCER = None
+        responses, embeds = self.verify([(self.bob.pk, 0.9)])
+        self.assertEqual(embeds, 1)
+        self.assertEqual(responses[0]["student_id"], "B1")
+        self.assertEqual(list(Attendance.objects.values_list("student_id", flat=True)), [self.bob.pk])
+
+    def test_missed_detection_is_not_repeated_by_the_probe(self):
+        engine = mock.Mock()
+        engine.detect_faces.return_value = []
+        with mock.patch.object(views, "get_arcface", return_value=engine), \
+                mock.patch.object(views, "embed_probe", return_value=np.ones(4, np.float32)) as embed, \
+                mock.patch.object(views, "match_probe", return_value=(self.alice.pk, 0.2)):
+            self.client.post("/auth/verify/?room_code=R1", self.frame, content_type="image/jpeg",
+                             HTTP_X_DEVICE_ID="cam-1")
+        self.assertEqual(engine.detect_faces.call_count, 1)
+        self.assertIsNone(embed.call_args.kwargs["bbox"])
+        self.assertFalse(embed.call_args.kwargs["detect"])
+
+
+class CentreCropTests(SimpleTestCase):
+    def test_undetected_probe_uses_the_centre_crop(self):
+        from face_service.engine_onnx import centre_crop_bbox
+        self.assertEqual(centre_crop_bbox((120, 120, 3)), (24, 24, 96, 96))
@@ -13,7 +13,14 @@ urlpatterns = [
 
     path("auth/enroll-face/", views.enroll_face, name="enroll_face"),   
     path("auth/verify/", views.verify, name="verify"),
+    path("auth/verify-multi/", views.verify_multi, name="verify_multi"),
     path("auth/attendance/", views.attendance_api, name="attendance_api"),
+    path("auth/attendance/stream/", views.attendance_stream, name="attendance_stream"),
+    path("auth/rollups/", views.rollups_api, name="rollups_api"),
+    path("auth/reports/attendance/", views.attendance_report, name="attendance_report"),
+    path("auth/audit/", views.audit_api, name="audit_api"),
+    path("auth/integrity/", views.integrity_api, name="integrity_api"),
+    path("auth/face-stats/", views.face_stats, name="face_stats"),
 
     path("api/register/", views.RegisterView.as_view(), name="register"),
     path("api/login/", views.LoginView.as_view(), name="login"),
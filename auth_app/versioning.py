@@ -0,0 +1,74 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+# Version stamps shared across worker processes through the Django cache
+# (a shared file cache by default; see AuthAppConfig.ready).
+
+
+def _key(name):
+    return f"auth_app:version:{name}"
+
+
+def current_version(name):
+    key = _key(name)
+    value = cache.get(key)
+    if value is None:
+        # seed with a clock value so an evicted stamp never repeats an old one
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump_version(name):
+    key = _key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.incr(key)
+
+
+class LocalVersion:
+    """
+    The stamp a process-local cache was loaded under. Everything that loads,
+    stores or patches the cache goes through ``lock``, so a load racing a
+    local change cannot store old rows under the new stamp.
+    """
+
+    def __init__(self, name, lock=None):
+        self.name = name
+        self.value = None
+        self.lock = lock or threading.RLock()
+
+    def refresh(self, reset):
+        """Call ``reset`` and adopt the shared stamp if it moved; returns the stamp."""
+        version = current_version(self.name)
+        with self.lock:
+            if version != self.value:
+                reset()
+                self.value = version
+        return version
+
+    def store(self, version, mapping, key, value):
+        """Compare-and-set: mapping[key] = value unless the stamp moved since ``version``."""
+        with self.lock:
+            if self.value == version:
+                mapping[key] = value
+        return value
+
+    def publish(self, patch=None):
+        """
+        Apply ``patch`` to the local cache and bump the shared stamp. The
+        patched cache keeps the new stamp only if nobody else bumped it in
+        between; otherwise the next refresh() reloads.
+        """
+        with self.lock:
+            if patch is not None:
+                patch()
+            previous = self.value
+            version = bump_version(self.name)
+            self.value = version if previous is not None and version == previous + 1 else None
+            return version
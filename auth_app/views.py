@@ -1,34 +1,60 @@
 import base64
+import csv
+import functools
+import hashlib
 import json
 import logging
+import threading
+import time
+from datetime import datetime, timedelta
 
 import cv2
-import numpy as np
 
 from django.conf import settings
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework.decorators import api_view, permission_classes
 
-from .models import Student, Room, Attendance
+from .models import Student, Room, Attendance, AttendanceHourly, AuditLog, RoomOccupancy
 from .serializers import RegisterSerializer, LoginSerializer
-from .authorization import authorize_student
+from .authorization import authorize_attendance, get_room
 from .accounting import log_attempt
+from .audit_writer import get_audit_writer
+from .db_writer import run_write
+from .debounce import get_debouncer, lock_students, record_once
+from .matching import get_gallery, match_probe, match_probes
+from .search import search_students
+from .archive import cold_page, segments as archive_segments
+from .audit_archive import SegmentIntegrityError, archived_page
+from .integrity import TABLES as INTEGRITY_TABLES, verify as verify_integrity
+from .rollups import current_occupancy, hourly_counts, room_occupancy
+from .reports import build_reports, student_names
+from .signals import backup_and_audit_attendance_bulk, ATTENDANCE_VERSION_KEY
+from .versioning import current_version
+from .frames import read_frame_request, decode_frame
 
 try:
-    from face_service.engine_onnx import ArcFaceONNX, cosine_similarity
+    from face_service.engine_onnx import ArcFaceONNX
+    from face_service.batching import InferenceScheduler
+    from face_service.quality import assess_face
+    from face_service.tracker import FaceTracker
 except Exception:
     ArcFaceONNX = None
-    cosine_similarity = None
+    InferenceScheduler = None
+    assess_face = None
+    FaceTracker = None
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -37,6 +63,7 @@ User = get_user_model()
 
 MODEL_PATH = getattr(settings, "ARCFACE_MODEL_PATH", "")
 _ARCFACE = None
+_ARCFACE_LOCK = threading.Lock()
 
 def get_arcface():
     global _ARCFACE
@@ -52,14 +79,169 @@ def get_arcface():
         logger.warning("ARCFACE_MODEL_PATH not set.")
         return None
 
-    try:
-        _ARCFACE = ArcFaceONNX(MODEL_PATH)
-        logger.info("ArcFace model loaded from %s", MODEL_PATH)
-        return _ARCFACE
-    except Exception as e:
-        logger.error("ArcFace load failed: %s", repr(e))
+    with _ARCFACE_LOCK:
+        if _ARCFACE is not None:
+            return _ARCFACE
+        try:
+            started = time.perf_counter()
+            _ARCFACE = ArcFaceONNX(
+                MODEL_PATH,
+                intra_op_threads=int(getattr(settings, "ORT_INTRA_OP_THREADS", 0)),
+                inter_op_threads=int(getattr(settings, "ORT_INTER_OP_THREADS", 0)),
+                cache_optimized=bool(getattr(settings, "ARCFACE_CACHE_OPTIMIZED", False)),
+                detect_max_side=int(getattr(settings, "FACE_DETECT_MAX_SIDE", 640)),
+            )
+            logger.info("ArcFace model loaded from %s in %.0f ms%s", MODEL_PATH,
+                        (time.perf_counter() - started) * 1000.0,
+                        " (cached optimized graph)" if _ARCFACE.loaded_from_cache else "")
+            return _ARCFACE
+        except Exception as e:
+            logger.error("ArcFace load failed: %s", repr(e))
+            return None
+
+
+def preload_face_engine(with_gallery=True):
+    """
+    Load the ArcFace session and detectors and run warm-up inferences so the
+    first request does not pay for it. Called from AuthAppConfig.ready()
+    under runserver (without the gallery, which needs the database); with
+    gunicorn, call it from a post_worker_init hook so each worker loads its
+    own copy after the app is set up, never in the master.
+    """
+    started = time.perf_counter()
+    arc = get_arcface()
+    if arc is None:
+        return None
+
+    warmup = arc.warmup(int(getattr(settings, "FACE_WARMUP_RUNS", 3)))
+    get_scheduler(arc)
+    if with_gallery:
+        get_gallery()
+    logger.info("Face engine ready in %.0f ms (warm-up %.0f ms)",
+                (time.perf_counter() - started) * 1000.0, warmup * 1000.0)
+    return arc
+
+
+_FIRST_REQUEST_LOGGED = set()
+
+def log_first_request_latency(view):
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if view.__name__ in _FIRST_REQUEST_LOGGED:
+            return view(request, *args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _FIRST_REQUEST_LOGGED.add(view.__name__)
+            logger.info("First %s request served in %.0f ms", view.__name__,
+                        (time.perf_counter() - started) * 1000.0)
+    return wrapper
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def get_scheduler(arc):
+    global _SCHEDULER
+
+    if not getattr(settings, "FACE_BATCHING_ENABLED", False) or InferenceScheduler is None:
+        return None
+
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = InferenceScheduler(
+                arc,
+                max_batch=int(getattr(settings, "FACE_BATCH_MAX_SIZE", 16)),
+                max_wait_ms=float(getattr(settings, "FACE_BATCH_MAX_WAIT_MS", 5.0)),
+            )
+            logger.info("ArcFace micro-batching enabled (max_batch=%d, max_wait_ms=%.1f)",
+                        _SCHEDULER.max_batch, _SCHEDULER.max_wait * 1000.0)
+        return _SCHEDULER
+
+
+_TRACKER = None
+_TRACKER_LOCK = threading.Lock()
+
+def get_tracker():
+    global _TRACKER
+
+    if not getattr(settings, "FACE_TRACKING_ENABLED", True) or FaceTracker is None:
         return None
 
+    with _TRACKER_LOCK:
+        if _TRACKER is None:
+            _TRACKER = FaceTracker(
+                ttl=float(getattr(settings, "FACE_TRACK_TTL", 1.5)),
+                iou_threshold=float(getattr(settings, "FACE_TRACK_IOU", 0.4)),
+                reembed_after=float(getattr(settings, "FACE_TRACK_REEMBED_SECONDS", 3.0)),
+            )
+        return _TRACKER
+
+
+def device_identity(request):
+    # explicit device id, else the shared device key plus the client address
+    device_id = (request.headers.get("X-DEVICE-ID") or "").strip()
+    if device_id:
+        return device_id
+    device_key = (request.headers.get("X-DEVICE-KEY") or "").strip()
+    return f"{device_key}@{request.META.get('REMOTE_ADDR', '')}"
+
+
+_QUALITY_REJECTS = {}
+_QUALITY_LOCK = threading.Lock()
+
+# open attendance streams in this process
+_STREAMS = 0
+_STREAMS_LOCK = threading.Lock()
+
+
+def quality_gate_enabled():
+    return assess_face is not None and getattr(settings, "FACE_QUALITY_GATE", True)
+
+
+def gate_probe_face(arc, rgb, timings=None):
+    """
+    Detect the main face and run the cheap quality checks on it.
+    Returns (bbox, reason, metrics); bbox is None when the frame is rejected.
+    """
+    # detected at the detector's own minimum, so a small face is reported as FACE_TOO_SMALL
+    faces = arc.detect_faces(rgb, timings=timings)
+    bbox, score = faces[0] if faces else (None, None)
+
+    started = time.perf_counter()
+    ok, reason, metrics = assess_face(
+        rgb, bbox, score,
+        min_face=int(getattr(settings, "FACE_QUALITY_MIN_FACE", 60)),
+        min_score=float(getattr(settings, "FACE_QUALITY_MIN_SCORE", 0.5)),
+        min_sharpness=float(getattr(settings, "FACE_QUALITY_MIN_SHARPNESS", 40.0)),
+        min_brightness=float(getattr(settings, "FACE_QUALITY_MIN_BRIGHTNESS", 40.0)),
+        max_brightness=float(getattr(settings, "FACE_QUALITY_MAX_BRIGHTNESS", 220.0)),
+    )
+    if timings is not None:
+        timings["quality"] = (time.perf_counter() - started) * 1000.0
+
+    if not ok:
+        with _QUALITY_LOCK:
+            _QUALITY_REJECTS[reason] = _QUALITY_REJECTS.get(reason, 0) + 1
+        return None, reason, metrics
+    return bbox, reason, metrics
+
+
+def embed_probe(arc, rgb, timings=None, bbox=None, detect=True):
+    # direct sess.run per request, or coalesced with concurrent requests
+    scheduler = get_scheduler(arc)
+    if scheduler is None:
+        return arc.embed_from_rgb(rgb, timings=timings, bbox=bbox, detect=detect)
+
+    x = arc.preprocess_rgb(rgb, timings=timings, bbox=bbox, detect=detect)
+    started = time.perf_counter()
+    emb = scheduler.embed(x)
+    if timings is not None:
+        timings["embed"] = (time.perf_counter() - started) * 1000.0
+    return emb
+
 
 
 def require_device_key(request, action_name="DEVICE_CHECK"):
@@ -110,6 +292,7 @@ class LoginView(APIView):
 
 
 @csrf_exempt
+@log_first_request_latency
 def enroll_face(request):
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "POST only"}, status=405)
@@ -122,8 +305,7 @@ def enroll_face(request):
         return JsonResponse({"success": False, "error": "ArcFace model not loaded"}, status=500)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
-        image_data = data.get("image")
+        data, image_data = read_frame_request(request)
         student_id = data.get("student_id")
         full_name = data.get("full_name")
     except Exception:
@@ -134,10 +316,7 @@ def enroll_face(request):
 
    
     try:
-        header, encoded = image_data.split(",", 1)
-        img_bytes = base64.b64decode(encoded)
-        np_img = np.frombuffer(img_bytes, np.uint8)
-        bgr = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+        bgr = decode_frame(image_data)
         if bgr is None:
             raise ValueError("Invalid image")
     except Exception:
@@ -146,14 +325,22 @@ def enroll_face(request):
    
     rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
 
-   
+    bbox = None
+    if quality_gate_enabled():
+        bbox, reason, metrics = gate_probe_face(arc, rgb)
+        if bbox is None:
+            log_attempt(request, "ENROLL_FAILED", {"reason": reason, "quality": metrics})
+            return JsonResponse({"success": False, "error": "Face image rejected", "reason": reason,
+                                 "quality": metrics}, status=200)
+
     try:
-        embedding = arc.embed_from_rgb(rgb)
+        embedding = embed_probe(arc, rgb, bbox=bbox)
     except Exception as e:
         log_attempt(request, "ENROLL_FAILED", {"reason": "NO_FACE", "error": repr(e)})
         return JsonResponse({"success": False, "error": "No face detected"}, status=200)
 
-    student, created = Student.objects.update_or_create(
+    student, created = run_write(
+        Student.objects.update_or_create,
         student_id=student_id,
         defaults={
             "full_name": full_name,
@@ -176,6 +363,7 @@ def enroll_face(request):
 
 
 @csrf_exempt
+@log_first_request_latency
 def verify(request):
     if request.method != "POST":
         return JsonResponse({"matched": False, "error": "POST only"}, status=405)
@@ -188,8 +376,7 @@ def verify(request):
         return JsonResponse({"matched": False, "error": "ArcFace model not loaded"}, status=500)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
-        image_data = data.get("image")
+        data, image_data = read_frame_request(request)
         room_code = (data.get("room_code") or "").strip()
     except Exception:
         return JsonResponse({"matched": False, "error": "Invalid JSON"}, status=400)
@@ -202,77 +389,91 @@ def verify(request):
         log_attempt(request, "VERIFY_FAILED", {"reason": "NO_ROOM_CODE"})
         return JsonResponse({"matched": False, "error": "room_code required"}, status=400)
 
-    room = Room.objects.filter(code=room_code).first()
+    room = get_room(room_code)
     if not room:
         log_attempt(request, "VERIFY_FAILED", {"reason": "INVALID_ROOM", "room_code": room_code})
         return JsonResponse({"matched": False, "error": "Invalid room"}, status=400)
 
+    # per-stage timings (ms), logged at DEBUG
+    timings = {}
+
     # decode image
+    started = time.perf_counter()
     try:
-        header, encoded = image_data.split(",", 1)
-        img_bytes = base64.b64decode(encoded)
-        np_img = np.frombuffer(img_bytes, np.uint8)
-        bgr = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+        bgr = decode_frame(image_data)
         if bgr is None:
             return JsonResponse({"matched": False, "error": "Invalid image"}, status=400)
     except Exception:
         return JsonResponse({"matched": False, "error": "Bad image format"}, status=400)
+    timings["decode"] = (time.perf_counter() - started) * 1000.0
 
-    # probe embedding
-    try:
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)   # مهم جداً
-        probe = arc.embed_from_rgb(rgb)              # الدالة الصحيحة داخل ArcFaceONNX
-    except Exception as e:
-       log_attempt(request, "VERIFY_EMBED_FAIL", {"error": repr(e)})
-       return JsonResponse({"matched": False, "error": f"Embedding failed: {repr(e)}"}, status=200)
-
-    if probe is None:
-        log_attempt(request, "AUTH_FAILED", {"reason": "NO_FACE"})
-        return JsonResponse({"matched": False, "error": "No face detected"}, status=200)
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)   # مهم جداً
 
+    # reject empty / unusable frames before any crop or inference;
+    # not audited, the camera loop produces these continuously
+    bbox = None
+    if quality_gate_enabled():
+        bbox, reason, metrics = gate_probe_face(arc, rgb, timings)
+        if bbox is None:
+            logger.debug("verify frame rejected: %s %s timings (ms): %s", reason, metrics,
+                         {k: round(v, 2) for k, v in timings.items()})
+            return JsonResponse({"matched": False, "error": "Frame rejected", "reason": reason,
+                                 "quality": metrics}, status=200)
 
     best_student = None
-    best_score = -1.0
-
-    for student in Student.objects.exclude(face_encoding__isnull=True):
-        known = np.frombuffer(student.face_encoding, dtype=np.float32)
-        if known.size == 0:
-            continue
-
-        if cosine_similarity:
-            score = float(cosine_similarity(probe, known))
-        else:
-            # fallback بسيط
-            score = float(np.dot(probe, known))
-
-        if score > best_score:
-            best_score = score
-            best_student = student
-
     threshold = float(getattr(settings, "FACE_MATCH_THRESHOLD", 0.35))
 
+    # same face as the previous frames of this camera: reuse its identity
+    tracker = get_tracker()
+    device = (device_identity(request), room.code)
+    detected = bbox is not None
+    if tracker is not None and bbox is None:
+        faces = arc.detect_faces(rgb, timings=timings)
+        bbox = faces[0][0] if faces else None
+        detected = True
+    track = tracker.lookup(device, bbox) if tracker is not None and bbox is not None else None
+    if track is not None:
+        # an inherited identity may only repeat a row already written; a new row needs a fresh match
+        debouncer = get_debouncer()
+        if debouncer is None or not debouncer.seen(track.identity, room.pk):
+            track = None
+
+    if track is not None:
+        best_pk, best_score = track.identity, track.score
+        timings["tracked"] = 1
+    else:
+        # probe embedding
+        try:
+            # a miss above is not detected again
+            probe = embed_probe(arc, rgb, timings, bbox=bbox, detect=not detected)
+        except Exception as e:
+           log_attempt(request, "VERIFY_EMBED_FAIL", {"error": repr(e)})
+           return JsonResponse({"matched": False, "error": f"Embedding failed: {repr(e)}"}, status=200)
+
+        if probe is None:
+            log_attempt(request, "AUTH_FAILED", {"reason": "NO_FACE"})
+            return JsonResponse({"matched": False, "error": "No face detected"}, status=200)
+
+        started = time.perf_counter()
+        best_pk, best_score = match_probe(probe, threshold, room=room)
+        timings["match"] = (time.perf_counter() - started) * 1000.0
+
+        if tracker is not None and bbox is not None:
+            # a face below the threshold stays unidentified and is embedded again next frame
+            identity = best_pk if best_score >= threshold else None
+            tracker.update(device, bbox, identity, best_score)
+
+    logger.debug("verify %dx%d timings (ms): %s", bgr.shape[1], bgr.shape[0],
+                 {k: round(v, 2) for k, v in timings.items()})
+
+    if best_pk is not None and best_score >= threshold:
+        best_student = Student.objects.filter(pk=best_pk).first()
+
     if best_student and best_score >= threshold:
-        is_allowed, reason = authorize_student(best_student, room)
+        is_allowed, reason, session_pk = authorize_attendance(best_student, room)
         status_att = "IN" if is_allowed else "FORBIDDEN"
 
-        Attendance.objects.create(
-            student=best_student,
-            room=room,
-            status=status_att,
-            confidence=float(best_score),
-        )
-
-        log_attempt(request, "FACE_VERIFICATION", {
-            "student_id": best_student.student_id,
-            "student_name": best_student.full_name,
-            "room": room.code,
-            "authorized": is_allowed,
-            "authorization_reason": reason,
-            "confidence": float(best_score),
-            "threshold": threshold,
-        })
-
-        return JsonResponse({
+        result = {
             "matched": True,
             "authorized": is_allowed,
             "student_id": best_student.student_id,
@@ -282,7 +483,53 @@ def verify(request):
             "confidence": round(float(best_score), 3),
             "status": status_att,
             "reason": reason,
-        })
+            "tracked": track is not None,
+        }
+
+        # same student, room and status recorded moments ago: no new row
+        debouncer = get_debouncer()
+
+        def record():
+            with transaction.atomic():
+                if debouncer:
+                    lock_students([best_student.pk])
+                    previous = debouncer.recent(best_student.pk, room.pk, status_att)
+                    if previous is not None:
+                        return previous, None
+                return None, Attendance.objects.create(
+                    student=best_student,
+                    room=room,
+                    session_id=session_pk,
+                    status=status_att,
+                    confidence=float(best_score),
+                )
+
+        previous, attendance = record_once(record)
+        audit = {
+            "student_id": best_student.student_id,
+            "student_name": best_student.full_name,
+            "room": room.code,
+            "authorized": is_allowed,
+            "authorization_reason": reason,
+            "confidence": float(best_score),
+            "threshold": threshold,
+        }
+
+        if previous is not None:
+            if not is_allowed:
+                # a refused attempt stays in the audit trail even without a new row
+                log_attempt(request, "FACE_VERIFICATION", {**audit, "duplicate": True, "attendance_id": previous[0]})
+            result.update(duplicate=True, attendance_id=previous[0],
+                          time=previous[1].strftime("%Y-%m-%d %H:%M:%S"))
+            return JsonResponse(result)
+
+        if debouncer:
+            debouncer.remember([attendance])
+
+        log_attempt(request, "FACE_VERIFICATION", audit)
+
+        result.update(duplicate=False, attendance_id=attendance.pk)
+        return JsonResponse(result)
 
     log_attempt(request, "AUTHENTICATION_FAILED", {
         "reason": "FACE_NOT_MATCHED",
@@ -293,36 +540,688 @@ def verify(request):
     return JsonResponse({"matched": False, "error": "Face not matched"}, status=200)
 
 
+@csrf_exempt
+@log_first_request_latency
+def verify_multi(request):
+    """Identify every face in one classroom frame and record attendance in bulk."""
+    if request.method != "POST":
+        return JsonResponse({"matched": False, "error": "POST only"}, status=405)
+
+    if not require_device_key(request, "VERIFY_MULTI"):
+        return JsonResponse({"matched": False, "error": "Unauthorized device"}, status=401)
+
+    arc = get_arcface()
+    if arc is None:
+        return JsonResponse({"matched": False, "error": "ArcFace model not loaded"}, status=500)
+
+    try:
+        data, image_data = read_frame_request(request)
+        room_code = (data.get("room_code") or "").strip()
+    except Exception:
+        return JsonResponse({"matched": False, "error": "Invalid JSON"}, status=400)
+
+    if not image_data:
+        log_attempt(request, "VERIFY_MULTI_FAILED", {"reason": "NO_IMAGE"})
+        return JsonResponse({"matched": False, "error": "No image"}, status=400)
+
+    if not room_code:
+        log_attempt(request, "VERIFY_MULTI_FAILED", {"reason": "NO_ROOM_CODE"})
+        return JsonResponse({"matched": False, "error": "room_code required"}, status=400)
+
+    room = get_room(room_code)
+    if not room:
+        log_attempt(request, "VERIFY_MULTI_FAILED", {"reason": "INVALID_ROOM", "room_code": room_code})
+        return JsonResponse({"matched": False, "error": "Invalid room"}, status=400)
+
+    try:
+        bgr = decode_frame(image_data)
+        if bgr is None:
+            return JsonResponse({"matched": False, "error": "Invalid image"}, status=400)
+    except Exception:
+        return JsonResponse({"matched": False, "error": "Bad image format"}, status=400)
+
+    try:
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        bboxes, probes = arc.embed_all_from_rgb(
+            rgb,
+            min_size=int(getattr(settings, "FACE_MULTI_MIN_SIZE", 32)),
+            max_faces=int(getattr(settings, "FACE_MULTI_MAX_FACES", 80)),
+        )
+    except Exception as e:
+        log_attempt(request, "VERIFY_MULTI_EMBED_FAIL", {"error": repr(e)})
+        return JsonResponse({"matched": False, "error": f"Embedding failed: {repr(e)}"}, status=200)
+
+    if not bboxes:
+        log_attempt(request, "VERIFY_MULTI_FAILED", {"reason": "NO_FACE", "room": room.code})
+        return JsonResponse({"matched": False, "faces": 0, "error": "No face detected"}, status=200)
+
+    threshold = float(getattr(settings, "FACE_MATCH_THRESHOLD", 0.35))
+
+    # one face per student: keep the best-scoring box
+    best = {}
+    for bbox, (pk, score) in zip(bboxes, match_probes(probes, threshold, room=room)):
+        if pk is None or score < threshold:
+            continue
+        if pk not in best or score > best[pk][0]:
+            best[pk] = (score, bbox)
+
+    students = Student.objects.in_bulk(list(best))
+    now = timezone.now()
+    records = []
+    for pk, (score, bbox) in best.items():
+        student = students.get(pk)
+        if student is None:
+            continue
+        is_allowed, reason, session_pk = authorize_attendance(student, room)
+        att = Attendance(
+            student=student,
+            room=room,
+            session_id=session_pk,
+            timestamp=now,
+            status="IN" if is_allowed else "FORBIDDEN",
+            confidence=float(score),
+        )
+        att.signature = att.compute_signature()
+        records.append((att, reason, bbox))
+
+    # students already recorded in this room within the debounce window
+    debouncer = get_debouncer()
+
+    def record():
+        with transaction.atomic():
+            previous = {}
+            if debouncer and records:
+                lock_students([att.student_id for att, _, _ in records])
+                previous = debouncer.recent_many(room.pk, [(att.student_id, att.status) for att, _, _ in records],
+                                                 now=now)
+            fresh = [att for att, _, _ in records if (att.student_id, att.status) not in previous]
+            created = Attendance.objects.bulk_create(fresh)
+            backup_and_audit_attendance_bulk(created)
+        return previous, created
+
+    previous, created = record_once(record)
+    if debouncer:
+        debouncer.remember(created)
+
+    recognized = [
+        {
+            "student_id": att.student.student_id,
+            "full_name": att.student.full_name,
+            "authorized": att.status == "IN",
+            "status": att.status,
+            "reason": reason,
+            "confidence": round(float(att.confidence), 3),
+            "bbox": list(bbox),
+            "duplicate": (att.student_id, att.status) in previous,
+        }
+        for att, reason, bbox in records
+    ]
+
+    log_attempt(request, "FACE_VERIFICATION_MULTI", {
+        "room": room.code,
+        "faces": len(bboxes),
+        "recognized": [r["student_id"] for r in recognized],
+        # refused again within the debounce window: no new row, only this record
+        "forbidden_repeats": [r["student_id"] for r in recognized if r["duplicate"] and not r["authorized"]],
+        "threshold": threshold,
+    })
+
+    return JsonResponse({
+        "matched": bool(recognized),
+        "room": room.code,
+        "time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "faces": len(bboxes),
+        "unknown": len(bboxes) - len(recognized),
+        "recognized": recognized,
+    })
+
+
+ATTENDANCE_PAGE_SIZE = 200
+ATTENDANCE_MAX_PAGE_SIZE = 1000
+
+# broader queries fall back to a join filter instead of a huge IN list
+SEARCH_MAX_STUDENTS = 2000
+
+ATTENDANCE_API_FIELDS = (
+    "id",
+    "timestamp",
+    "status",
+    "confidence",
+    "student__full_name",
+    "student__student_id",
+    "room__code",
+    "room__name",
+)
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    timestamp, pk = raw.rsplit("|", 1)
+    value = parse_datetime(timestamp)
+    if value is None:
+        raise ValueError("bad cursor timestamp")
+    return value, int(pk)
+
+
+def attendance_keyset_page(queryset, cursor=None, limit=ATTENDANCE_PAGE_SIZE, archived=None):
+    """
+    One page of attendance rows, newest first, as dicts plus the cursor of
+    the next page (None on the last page). Keyset pagination on
+    (timestamp, id), so deep pages cost the same as the first. With
+    ``archived`` (cold_page filters) archived rows are merged in.
+    """
+    before = None
+    if cursor:
+        ts, pk = decode_cursor(cursor)
+        before = (ts, pk)
+        # the plain range term keeps the (timestamp) index usable
+        queryset = queryset.filter(Q(timestamp__lte=ts), Q(timestamp__lt=ts) | Q(id__lt=pk))
+
+    rows = list(queryset.order_by("-timestamp", "-id").values(*ATTENDANCE_API_FIELDS)[:limit + 1])
+    if archived is not None:
+        cold = cold_page(limit + 1, before=before, **archived)
+        if cold:
+            rows.extend(cold)
+            rows.sort(key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+            rows = rows[:limit + 1]
+            attach_archived_names(rows)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def attach_archived_names(rows):
+    """Fill the joined API fields of archived rows (cold_page dicts) in place."""
+    cold = [row for row in rows if "student__full_name" not in row]
+    if not cold:
+        return
+    students = Student.objects.in_bulk({row["student_id"] for row in cold})
+    rooms = Room.objects.in_bulk({row["room_id"] for row in cold if row["room_id"] is not None})
+    for row in cold:
+        student = students.get(row["student_id"])
+        room = rooms.get(row["room_id"])
+        row["student__full_name"] = student.full_name if student else None
+        row["student__student_id"] = student.student_id if student else None
+        row["room__code"] = room.code if room else None
+        row["room__name"] = room.name if room else None
+
+
+def attendance_archive_filter(qname="", status_q="", start=None, end=None):
+    """cold_page() filters equivalent to filter_attendance(), or None when nothing is archived."""
+    if not archive_segments():
+        return None
+    students = None
+    if qname:
+        students = search_students(qname)
+        if students is None:
+            students = list(Student.objects.filter(
+                Q(full_name__icontains=qname) | Q(student_id__icontains=qname)
+            ).values_list("id", flat=True))
+    return {"start": start, "end": end, "students": students, "status": status_q or None}
+
+
+def parse_time_bound(value, end=False):
+    """
+    Aware datetime from an ISO datetime or date (local midnight); a date as
+    the ``end`` bound includes that whole day.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    # dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value) if len(value) == 10 else None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1 if end else 0), datetime.min.time())
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"bad time bound {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def attendance_rows_since(queryset, cursor, limit=ATTENDANCE_PAGE_SIZE):
+    """Rows strictly after ``cursor`` in (timestamp, id) order, oldest first."""
+    ts, pk = decode_cursor(cursor)
+    queryset = queryset.filter(Q(timestamp__gte=ts), Q(timestamp__gt=ts) | Q(id__gt=pk))
+    return list(queryset.order_by("timestamp", "id").values(*ATTENDANCE_API_FIELDS)[:limit])
+
+
+def filter_attendance(queryset, qname="", status_q=""):
+    if qname:
+        # resolve matching students through the search index first
+        student_ids = search_students(qname, limit=SEARCH_MAX_STUDENTS + 1)
+        if student_ids is not None and len(student_ids) <= SEARCH_MAX_STUDENTS:
+            queryset = queryset.filter(student_id__in=student_ids)
+        else:
+            queryset = queryset.filter(
+                Q(student__full_name__icontains=qname) |
+                Q(student__student_id__icontains=qname)
+            )
+
+    if status_q:
+        queryset = queryset.filter(status=status_q)
+    return queryset
+
+
+def serialize_attendance(rows):
+    return [
+        {
+            "timestamp": row["timestamp"],
+            "student_name": row["student__full_name"],
+            "student_id": row["student__student_id"],
+            "room_code": row["room__code"],
+            "room_name": row["room__name"],
+            "status": row["status"],
+            "confidence": float(row["confidence"]),
+        }
+        for row in rows
+    ]
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def attendance_api(request):
+    """
+    Newest attendance rows as a JSON list.
+
+    ``cursor`` pages backwards (next page in X-Next-Cursor); ``since`` returns
+    only rows newer than a cursor, oldest first. ``from``/``to`` (ISO
+    datetimes or dates) limit the time range; pages include archived rows,
+    ``since`` polls only the live table. X-Latest-Cursor always
+    carries the cursor to poll ``since`` with, and the ETag changes only
+    when attendance is written, so unchanged polls get a 304.
+    """
     qname = request.GET.get("q", "").strip()
     status_q = request.GET.get("status", "").strip()
+    since = request.GET.get("since", "").strip()
 
-    logs = Attendance.objects.all().select_related("student", "room")
+    try:
+        limit = min(int(request.GET.get("limit", ATTENDANCE_PAGE_SIZE)), ATTENDANCE_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = ATTENDANCE_PAGE_SIZE
+    limit = max(limit, 1)
 
-    if qname:
-        logs = logs.filter(
-            Q(student__full_name__icontains=qname) |
-            Q(student__student_id__icontains=qname)
-        )
+    try:
+        start = parse_time_bound(request.GET.get("from", ""))
+        end = parse_time_bound(request.GET.get("to", ""), end=True)
+    except ValueError:
+        return JsonResponse({"error": "Invalid from/to"}, status=400)
+
+    # read before the query, so a concurrent write can only make the tag older
+    version = current_version(ATTENDANCE_VERSION_KEY)
+    query = hashlib.sha1(request.META.get("QUERY_STRING", "").encode()).hexdigest()[:12]
+    etag = f'"att-{version}-{query}"'
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    logs = filter_attendance(Attendance.objects.all(), qname, status_q)
+    if start:
+        logs = logs.filter(timestamp__gte=start)
+    if end:
+        logs = logs.filter(timestamp__lt=end)
+
+    next_cursor = None
+    try:
+        if since:
+            rows = attendance_rows_since(logs, since, limit)
+            newest = rows[-1] if rows else None
+        else:
+            archived = attendance_archive_filter(qname, status_q, start, end)
+            rows, next_cursor = attendance_keyset_page(logs, request.GET.get("cursor", "").strip(), limit, archived)
+            newest = rows[0] if rows else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    response = JsonResponse(serialize_attendance(rows), safe=False)
+    response["ETag"] = etag
+    if next_cursor:
+        # the body stays a plain list for existing clients
+        response["X-Next-Cursor"] = next_cursor
+    latest = encode_cursor(newest["timestamp"], newest["id"]) if newest else since
+    if latest:
+        response["X-Latest-Cursor"] = latest
+    return response
+
+
+def attendance_stream(request):
+    """
+    Server-Sent Events feed of new attendance rows for the dashboard.
+
+    Each ``attendance`` event is a JSON list of rows with its cursor as the
+    event id, so a reconnect resumes from Last-Event-ID. Off unless
+    ATTENDANCE_STREAM_ENABLED; at most ATTENDANCE_STREAM_MAX per process.
+    """
+    global _STREAMS
+
+    if not getattr(settings, "ATTENDANCE_STREAM_ENABLED", False):
+        return JsonResponse({"error": "Attendance stream is disabled; poll /auth/attendance/?since="}, status=404)
 
-    if status_q:
-        logs = logs.filter(status=status_q)
+    qname = request.GET.get("q", "").strip()
+    status_q = request.GET.get("status", "").strip()
+    cursor = (request.headers.get("Last-Event-ID") or request.GET.get("since", "")).strip()
+    poll = float(getattr(settings, "ATTENDANCE_STREAM_POLL_SECONDS", 1.0))
+    duration = float(getattr(settings, "ATTENDANCE_STREAM_SECONDS", 300))
 
-    data = [
-        {
-            "timestamp": log.timestamp,
-            "student_name": log.student.full_name if log.student else None,
-            "student_id": log.student.student_id if log.student else None,
-            "room_code": log.room.code if log.room else None,
-            "room_name": log.room.name if log.room else None,
-            "status": log.status,
-            "confidence": float(log.confidence),
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    version = None
+    if not cursor:
+        # start from now
+        version = current_version(ATTENDANCE_VERSION_KEY)
+        newest = Attendance.objects.order_by("-timestamp", "-id").values("id", "timestamp").first()
+        cursor = encode_cursor(newest["timestamp"], newest["id"]) if newest else encode_cursor(timezone.now(), 0)
+
+    with _STREAMS_LOCK:
+        if _STREAMS >= int(getattr(settings, "ATTENDANCE_STREAM_MAX", 4)):
+            response = JsonResponse({"error": "Too many open streams; poll /auth/attendance/?since="}, status=503)
+            response["Retry-After"] = "30"
+            return response
+        _STREAMS += 1
+
+    def events():
+        global _STREAMS
+        nonlocal cursor, version
+        try:
+            yield ""
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + duration
+            last_sent = time.monotonic()
+            while time.monotonic() < deadline:
+                current = current_version(ATTENDANCE_VERSION_KEY)
+                if current != version:
+                    version = current
+                    logs = filter_attendance(Attendance.objects.all(), qname, status_q)
+                    while True:
+                        rows = attendance_rows_since(logs, cursor, ATTENDANCE_PAGE_SIZE)
+                        if not rows:
+                            break
+                        cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+                        payload = json.dumps(serialize_attendance(rows), cls=DjangoJSONEncoder)
+                        yield f"id: {cursor}\nevent: attendance\ndata: {payload}\n\n"
+                        last_sent = time.monotonic()
+                        if len(rows) < ATTENDANCE_PAGE_SIZE:
+                            break
+                elif time.monotonic() - last_sent >= 15:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                time.sleep(poll)
+        finally:
+            with _STREAMS_LOCK:
+                _STREAMS -= 1
+
+    stream = events()
+    # started here, so closing the response always releases the slot
+    next(stream)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def rollups_api(request):
+    """
+    Precomputed counters: today's IN/OUT counts and current occupancy per
+    room, and with ``room`` the per-hour status counts of one day (``date``,
+    default today). Everything comes from the rollup tables.
+    """
+    day = parse_date(request.GET.get("date", "").strip() or "") or timezone.localdate()
+    room_code = request.GET.get("room", "").strip()
+
+    if not room_code:
+        counters = {
+            row.room_id: row
+            for row in RoomOccupancy.objects.filter(day=timezone.localdate()).select_related("room")
         }
-        for log in logs.order_by("-timestamp")[:200]
-    ]
-    return JsonResponse(data, safe=False)
+        occupancy = current_occupancy()
+        rooms = Room.objects.in_bulk(set(occupancy) - set(counters))
+        rooms.update((pk, row.room) for pk, row in counters.items())
+        totals = dict(
+            AttendanceHourly.objects
+            .filter(hour__date=day)
+            .values_list("status")
+            .annotate(total=Sum("count"))
+            .values_list("status", "total")
+        )
+        return JsonResponse({
+            "date": day.isoformat(),
+            "rooms": [
+                {
+                    "room_code": room.code,
+                    "room_name": room.name,
+                    "occupancy": occupancy.get(pk, 0),
+                    "ins": counters[pk].ins if pk in counters else 0,
+                    "outs": counters[pk].outs if pk in counters else 0,
+                }
+                for pk, room in sorted(rooms.items())
+            ],
+            "totals": totals,
+        })
+
+    room = get_room(room_code)
+    if not room:
+        return JsonResponse({"error": "Invalid room"}, status=404)
+
+    hours = hourly_counts(room.pk, day)
+    totals = {}
+    for counts in hours.values():
+        for status_name, count in counts.items():
+            totals[status_name] = totals.get(status_name, 0) + count
+    counters = room_occupancy([room.pk]).get(room.pk)
+
+    return JsonResponse({
+        "date": day.isoformat(),
+        "room": room.code,
+        "occupancy": current_occupancy([room.pk]).get(room.pk, 0),
+        "ins": counters.ins if counters else 0,
+        "outs": counters.outs if counters else 0,
+        "hours": [
+            {"hour": hour.strftime("%H:00"), **counts}
+            for hour, counts in sorted(hours.items())
+        ],
+        "totals": totals,
+    })
+
+
+AUDIT_API_FIELDS = ("id", "action", "username", "ip_address", "user_agent", "data", "signature", "created_at")
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def audit_api(request):
+    """
+    AuditLog rows newest first, from the live table and the compacted
+    archive. Filters: ``action``, ``username``, ``from``/``to`` (ISO
+    datetimes or dates). ``cursor`` pages backwards; the next page's cursor
+    is in X-Next-Cursor.
+    """
+    action = request.GET.get("action", "").strip()
+    username = request.GET.get("username", "").strip()
+    try:
+        limit = min(int(request.GET.get("limit", ATTENDANCE_PAGE_SIZE)), ATTENDANCE_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = ATTENDANCE_PAGE_SIZE
+    limit = max(limit, 1)
+
+    try:
+        start = parse_time_bound(request.GET.get("from", ""))
+        end = parse_time_bound(request.GET.get("to", ""), end=True)
+        cursor = request.GET.get("cursor", "").strip()
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid from/to or cursor"}, status=400)
+
+    logs = AuditLog.objects.all()
+    if action:
+        logs = logs.filter(action=action)
+    if username:
+        logs = logs.filter(username=username)
+    if start:
+        logs = logs.filter(created_at__gte=start)
+    if end:
+        logs = logs.filter(created_at__lt=end)
+    if before:
+        logs = logs.filter(Q(created_at__lte=before[0]), Q(created_at__lt=before[0]) | Q(id__lt=before[1]))
+    rows = list(logs.order_by("-created_at", "-id").values(*AUDIT_API_FIELDS)[:limit + 1])
+    for row in rows:
+        row["archived"] = False
+
+    # archived rows older than a full live page cannot make it into the page
+    floor = start
+    if len(rows) > limit and (floor is None or rows[limit]["created_at"] > floor):
+        floor = rows[limit]["created_at"]
+    try:
+        archived = archived_page(limit + 1, before, floor, end, action or None, username or None)
+    except SegmentIntegrityError as exc:
+        logger.error("audit archive: %s", exc)
+        return JsonResponse({"error": "Archived audit segment failed verification", "detail": str(exc)}, status=500)
+    if archived:
+        for row in archived:
+            row["archived"] = True
+        rows.extend(archived)
+        rows.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+
+    response = JsonResponse(rows[:limit], safe=False)
+    if len(rows) > limit:
+        response["X-Next-Cursor"] = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"])
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def integrity_api(request):
+    """
+    Verify ``table`` (attendance or audit) for ``from``..``to``: HMACs of
+    the rows in range, Merkle roots of the sealed blocks overlapping it and
+    the block chain. Full-history runs belong to verify_integrity.
+    """
+    table = request.GET.get("table", "attendance").strip()
+    if table not in INTEGRITY_TABLES:
+        return JsonResponse({"error": f"table must be one of {', '.join(INTEGRITY_TABLES)}"}, status=400)
+    try:
+        start = parse_time_bound(request.GET.get("from", ""))
+        end = parse_time_bound(request.GET.get("to", ""), end=True)
+    except ValueError:
+        return JsonResponse({"error": "Invalid from/to"}, status=400)
+    if start is None or end is None:
+        return JsonResponse({"error": "from and to are required"}, status=400)
+
+    try:
+        report = verify_integrity(table, start, end, workers=int(getattr(settings, "INTEGRITY_API_WORKERS", 1)))
+    except SegmentIntegrityError as exc:
+        logger.error("integrity check: %s", exc)
+        return JsonResponse({"ok": False, "error": "Archived segment failed verification", "detail": str(exc)})
+    return JsonResponse(report)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+REPORT_CSV_FIELDS = [
+    "course", "student_id", "full_name", "occurrences", "present", "late", "absent",
+    "rate", "longest_absence_streak", "current_absence_streak",
+]
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def attendance_report(request):
+    """
+    Per course and enrolled student: presence, lateness, attendance rate and
+    absence streaks over ``from``..``to`` (local dates, default the last 30
+    days). ``course`` limits to course codes (comma separated), ``weekdays``
+    to Python weekday numbers, ``late_minutes`` overrides the lateness
+    threshold, ``detail=1`` adds a P/L/A sheet per student and
+    ``export=csv`` streams CSV instead of JSON.
+    """
+    today = timezone.localdate()
+    date_to = parse_date(request.GET.get("to", "").strip()) or today
+    date_from = parse_date(request.GET.get("from", "").strip()) or date_to - timedelta(days=29)
+    if date_from > date_to:
+        return JsonResponse({"error": "from must not be after to"}, status=400)
+
+    courses = [c.strip() for c in request.GET.get("course", "").split(",") if c.strip()]
+    try:
+        weekdays = tuple(int(d) for d in request.GET.get("weekdays", "").split(",") if d.strip())
+        late_minutes = float(request.GET.get("late_minutes") or getattr(settings, "REPORT_LATE_MINUTES", 10))
+    except ValueError:
+        return JsonResponse({"error": "Invalid weekdays or late_minutes"}, status=400)
+    detail = request.GET.get("detail") in ("1", "true")
+
+    started = time.perf_counter()
+    reports = build_reports(date_from, date_to, courses or None, weekdays or None, late_minutes)
+    names = student_names(reports)
+    logger.info("attendance report %s..%s: %d courses in %.2fs", date_from, date_to, len(reports),
+                time.perf_counter() - started)
+
+    if request.GET.get("export") == "csv":
+        fields = REPORT_CSV_FIELDS + (["sheet"] if detail else [])
+        writer = csv.writer(_Echo())
+
+        def lines():
+            yield writer.writerow(fields)
+            for report in reports:
+                for row in report.rows(names, detail):
+                    yield writer.writerow([row[f] for f in fields])
+
+        response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="attendance_{date_from}_{date_to}.csv"'
+        return response
+
+    return JsonResponse({
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "late_minutes": late_minutes,
+        "courses": [
+            {
+                "course": report.course.code,
+                "name": report.course.name,
+                "sessions": len(report.sessions),
+                "days": len(report.days),
+                "occurrences": int(report.first_arrival.shape[1]),
+                "average_rate": round(float(report.rate.mean()), 4) if report.students.size else None,
+                "students": list(report.rows(names, detail)),
+            }
+            for report in reports
+        ],
+    })
+
+
+def face_stats(request):
+    batching = _SCHEDULER.stats() if _SCHEDULER is not None else {"enabled": False}
+    with _QUALITY_LOCK:
+        quality = {"enabled": bool(quality_gate_enabled()), "rejected": dict(_QUALITY_REJECTS)}
+    tracking = _TRACKER.stats() if _TRACKER is not None else {"enabled": False}
+    writer = get_audit_writer()
+    audit = writer.stats() if writer is not None else {"enabled": False}
+    debouncer = get_debouncer()
+    debounce = debouncer.stats() if debouncer is not None else {"enabled": False}
+    return JsonResponse({
+        "batching": batching,
+        "quality": quality,
+        "tracking": tracking,
+        "audit_writer": audit,
+        "debounce": debounce,
+    })
 
 
 def face_page(request):
@@ -334,7 +1233,9 @@ def attendance_page(request):
 
 
 def dashboard_page(request):
-    return render(request, "auth_app/dashboard.html")
+    return render(request, "auth_app/dashboard.html", {
+        "ATTENDANCE_STREAM_ENABLED": bool(getattr(settings, "ATTENDANCE_STREAM_ENABLED", False)),
+    })
 
 
 def enroll_page(request):
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) coarse quantizer for large galleries.
+
+    Spherical k-means centroids split the gallery into ``nlist`` cells.
+    A query only scores the rows that live in its ``nprobe`` nearest
+    cells; FaceGallery re-ranks that shortlist exactly. ``nprobe`` is the
+    recall-versus-latency knob and can be calibrated against a recall
+    target with ``calibrate_nprobe``. ``assignments`` (key -> cell) belong
+    to the gallery the index is attached to and are recomputed on attach.
+    """
+
+    def __init__(self, centroids, nprobe=8, assignments=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nlist = self.centroids.shape[0]
+        self.dim = self.centroids.shape[1]
+        self.nprobe = int(nprobe)
+        self.assignments = assignments if assignments is not None else {}
+
+    @classmethod
+    def train(cls, vectors, nlist, iters=12, sample_size=None, seed=0):
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = vectors.shape[0]
+        nlist = max(1, min(int(nlist), n))
+
+        if sample_size is None:
+            sample_size = nlist * 64
+        if n > sample_size:
+            sample = vectors[rng.choice(n, sample_size, replace=False)]
+        else:
+            sample = vectors
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(iters):
+            labels = _nearest(sample, centroids)
+            counts = np.bincount(labels, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            filled = np.flatnonzero(counts)
+            order = np.argsort(labels, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+            centroids = _normalize(sums)
+
+        return cls(centroids)
+
+    def assign(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        return _nearest(vectors, self.centroids)
+
+    def probe_lists(self, probe, nprobe=None):
+        nprobe = min(int(nprobe or self.nprobe), self.nlist)
+        scores = self.centroids @ np.asarray(probe, dtype=np.float32).reshape(-1)
+        if nprobe >= self.nlist:
+            return np.arange(self.nlist)
+        return np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+    def save(self, path):
+        keys = np.fromiter(self.assignments.keys(), dtype=np.int64, count=len(self.assignments))
+        lists = np.fromiter(self.assignments.values(), dtype=np.int32, count=len(self.assignments))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, nprobe=np.int64(self.nprobe), keys=keys, lists=lists)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            assignments = dict(zip(data["keys"].tolist(), data["lists"].tolist()))
+            return cls(data["centroids"], nprobe=int(data["nprobe"]), assignments=assignments)
+
+
+def calibrate_nprobe(gallery, target_recall=0.99, queries=200, noise=1.0, seed=0):
+    """
+    Smallest nprobe whose top-1 agrees with exact search for at least
+    ``target_recall`` of synthetic probes (gallery rows plus noise).
+    Returns (nprobe, measured_recall).
+    """
+    index = gallery.index
+    if index is None or len(gallery) == 0:
+        return None, None
+
+    rng = np.random.default_rng(seed)
+    base = gallery.sample_vectors(queries, rng)
+    probes = _normalize(base + rng.normal(scale=noise / np.sqrt(base.shape[1]), size=base.shape).astype(np.float32))
+    expected = [gallery.search(p, k=1, exact=True)[0][0] for p in probes]
+
+    nprobe, recall = 1, 0.0
+    while True:
+        hits = sum(
+            1 for p, want in zip(probes, expected)
+            if (gallery.search(p, k=1, nprobe=nprobe) or [(None, 0.0)])[0][0] == want
+        )
+        recall = hits / len(probes)
+        if recall >= target_recall or nprobe >= index.nlist:
+            return nprobe, recall
+        nprobe = min(nprobe * 2, index.nlist)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / (norms + 1e-8)).astype(np.float32)
+
+
+def _nearest(vectors, centroids, chunk=8192):
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], chunk):
+        block = vectors[start:start + chunk] @ centroids.T
+        labels[start:start + chunk] = np.argmax(block, axis=1)
+    return labels
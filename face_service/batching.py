@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler:
+    """
+    Dynamic micro-batching in front of an ArcFaceONNX model.
+
+    Concurrent callers submit preprocessed NCHW crops; a single worker
+    thread coalesces whatever is queued (up to ``max_batch`` rows, waiting
+    at most ``max_wait_ms`` after the first one) into one ``sess.run`` and
+    resolves each caller's future with its own embeddings.
+    """
+
+    def __init__(self, model, max_batch=16, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._requests = 0
+        self._max_depth = 0
+        self._batch_sizes = Counter()
+        self._busy_seconds = 0.0
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="arcface-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch):
+        """Queue an (N, 3, 112, 112) tensor; the future resolves to (N, D) embeddings."""
+        if self._closed:
+            raise RuntimeError("InferenceScheduler is closed")
+
+        future = Future()
+        self._queue.put((batch, future))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._requests += 1
+            if depth > self._max_depth:
+                self._max_depth = depth
+        return future
+
+    def embed(self, batch, timeout=None):
+        """Blocking single-crop helper mirroring ArcFaceONNX.embed_from_rgb output."""
+        return self.submit(batch).result(timeout=timeout)[0]
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        items = [first]
+        rows = first[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            items.append(item)
+            rows += item[0].shape[0]
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                batch = np.concatenate([x for x, _ in items])
+                emb = self.model.embed_batch(batch)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for x, future in items:
+                n = x.shape[0]
+                future.set_result(emb[offset:offset + n])
+                offset += n
+
+            with self._stats_lock:
+                self._batches += 1
+                self._rows += batch.shape[0]
+                self._batch_sizes[batch.shape[0]] += 1
+                self._busy_seconds += time.perf_counter() - started
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "enabled": True,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "requests": self._requests,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": (self._rows / self._batches) if self._batches else 0.0,
+                "batch_sizes": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "busy_seconds": round(self._busy_seconds, 3),
+            }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
@@ -1,5 +1,6 @@
 
 import os
+import time
 import numpy as np
 import cv2
 import onnxruntime as ort
@@ -12,11 +13,16 @@ except Exception:
 
 _MP_BACKEND = None
 _mp_detector = None
+_mp_detect_all = None
+
+
+# smallest face box the detectors report; MediaPipe's tiny-crop cutoff
+MIN_FACE = 40
 
 
 def _init_mediapipe_detector():
     
-    global _MP_BACKEND, _mp_detector
+    global _MP_BACKEND, _mp_detector, _mp_detect_all
 
     if mp is None:
         return None
@@ -46,26 +52,40 @@ def _init_mediapipe_detector():
         min_detection_confidence=0.3
     )
 
-    def detect(rgb_image: np.ndarray):
+    def detect_all(rgb_image: np.ndarray):
+        # every detection as ((x1, y1, x2, y2), score), best first
         h, w = rgb_image.shape[:2]
         results = _mp_detector.process(rgb_image)
         if not results.detections:
-            return None
+            return []
 
-        det = max(results.detections, key=lambda d: float(d.score[0]) if d.score else 0.0)
-        box = det.location_data.relative_bounding_box
+        faces = []
+        for det in results.detections:
+            box = det.location_data.relative_bounding_box
+            x1 = int(max(0, box.xmin * w))
+            y1 = int(max(0, box.ymin * h))
+            x2 = int(min(w, (box.xmin + box.width) * w))
+            y2 = int(min(h, (box.ymin + box.height) * h))
+            score = float(det.score[0]) if det.score else 0.0
+            faces.append(((x1, y1, x2, y2), score))
 
-        x1 = int(max(0, box.xmin * w))
-        y1 = int(max(0, box.ymin * h))
-        x2 = int(min(w, (box.xmin + box.width) * w))
-        y2 = int(min(h, (box.ymin + box.height) * h))
+        faces.sort(key=lambda f: f[1], reverse=True)
+        return faces
+
+    def detect(rgb_image: np.ndarray):
+        faces = detect_all(rgb_image)
+        if not faces:
+            return None
+
+        x1, y1, x2, y2 = faces[0][0]
 
         # reject tiny crops
-        if (x2 - x1) < 40 or (y2 - y1) < 40:
+        if (x2 - x1) < MIN_FACE or (y2 - y1) < MIN_FACE:
             return None
 
         return (x1, y1, x2, y2)
 
+    _mp_detect_all = detect_all
     return detect
 
 
@@ -83,47 +103,116 @@ def _init_haar():
         _haar = None
 
 
-def _detect_face_bbox_haar(rgb_image: np.ndarray):
- 
+def _detect_faces_haar(rgb_image: np.ndarray, min_face: int = 60):
+
     if _haar is None:
-        return None
+        return []
 
     gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
     faces = _haar.detectMultiScale(
         gray,
         scaleFactor=1.1,
         minNeighbors=5,
-        minSize=(60, 60)
+        minSize=(min_face, min_face)
     )
-    if len(faces) == 0:
-        return None
-
-    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-    return (int(x), int(y), int(x + w), int(y + h))
+    boxes = [(int(x), int(y), int(x + w), int(y + h)) for x, y, w, h in faces]
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+    return boxes
 
 
 _detect_face_bbox = _init_mediapipe_detector()
 _init_haar()
 
 
-def detect_single_face_bbox_rgb(rgb_image: np.ndarray, min_size: int = 60):
+# detection runs on a copy whose long side is at most this many pixels
+DETECT_MAX_SIDE = 640
+# smallest face the Haar cascade can see (its training window)
+HAAR_WINDOW = 24
 
-    bbox = None
 
-    if _detect_face_bbox is not None:
-        bbox = _detect_face_bbox(rgb_image)
+def _lap(timings, stage, started):
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000.0
 
-    if bbox is None:
-        bbox = _detect_face_bbox_haar(rgb_image)
 
-    if bbox is not None:
-        x1, y1, x2, y2 = bbox
-        if (x2 - x1) < min_size or (y2 - y1) < min_size:
-            bbox = None
-        else:
-            return bbox
+def detection_scale(shape, max_side: int = DETECT_MAX_SIDE) -> float:
+    # bring the long side down to the detector input size
+    if not max_side:
+        return 1.0
+    h, w = shape[:2]
+    return min(1.0, max_side / float(max(h, w)))
+
+
+def rescue_scale(min_size: int = MIN_FACE) -> float:
+    # the scale at which a min_size face still fills the Haar window
+    return min(1.0, HAAR_WINDOW / float(max(min_size, 1)))
+
 
+def _detect_at(rgb_image, scale, min_size, timings):
+    started = time.perf_counter()
     h, w = rgb_image.shape[:2]
+    small = rgb_image
+    if scale < 1.0:
+        small = cv2.resize(rgb_image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    _lap(timings, "downscale", started)
+
+    sx = w / float(small.shape[1])
+    sy = h / float(small.shape[0])
+
+    def full_size(faces):
+        out = []
+        for (x1, y1, x2, y2), score in faces:
+            box = (
+                max(0, int(x1 * sx)),
+                max(0, int(y1 * sy)),
+                min(w, int(round(x2 * sx))),
+                min(h, int(round(y2 * sy))),
+            )
+            if (box[2] - box[0]) >= min_size and (box[3] - box[1]) >= min_size:
+                out.append((box, score))
+        return out
+
+    started = time.perf_counter()
+    faces = []
+    if _mp_detect_all is not None:
+        faces = full_size(_mp_detect_all(small))
+    if not faces:
+        # also when MediaPipe only found faces below min_size
+        min_face = max(HAAR_WINDOW, int(min_size * scale))
+        faces = full_size([(b, None) for b in _detect_faces_haar(small, min_face=min_face)])
+    _lap(timings, "detect", started)
+    return faces
+
+
+def detect_faces_rgb(rgb_image: np.ndarray, min_size: int = MIN_FACE, max_side: int = DETECT_MAX_SIDE, timings=None):
+    """
+    Faces as ((x1, y1, x2, y2), score) in full-resolution coordinates, best
+    first. Detection runs on a copy scaled to the detector input size
+    (see detection_scale); on a miss it is retried at rescue_scale, where a
+    min_size face is still detectable. MediaPipe first, Haar when MediaPipe
+    finds nothing of at least min_size. Haar has no score.
+    """
+    scale = detection_scale(rgb_image.shape, max_side)
+    faces = _detect_at(rgb_image, scale, min_size, timings)
+    rescue = rescue_scale(min_size)
+    if not faces and scale < rescue:
+        faces = _detect_at(rgb_image, rescue, min_size, timings)
+    return faces
+
+
+def detect_single_face_bbox_rgb(rgb_image: np.ndarray, min_size: int = MIN_FACE,
+                                max_side: int = DETECT_MAX_SIDE, timings=None):
+
+    faces = detect_faces_rgb(rgb_image, min_size=min_size, max_side=max_side, timings=timings)
+    if faces:
+        return faces[0][0]
+    return centre_crop_bbox(rgb_image.shape)
+
+
+def centre_crop_bbox(shape):
+    # stand-in box when no face is detected
+    h, w = shape[:2]
     size = int(min(h, w) * 0.6)
     x1 = (w - size) // 2
     y1 = (h - size) // 2
@@ -133,6 +222,18 @@ def detect_single_face_bbox_rgb(rgb_image: np.ndarray, min_size: int = 60):
 
 
 
+def detect_all_faces_bbox_rgb(rgb_image: np.ndarray, min_size: int = 60, max_faces: int = 0,
+                              max_side: int = DETECT_MAX_SIDE, timings=None):
+    # all faces in the frame (no centre-crop fallback), MediaPipe first, then Haar
+    bboxes = [
+        bbox for bbox, _ in
+        detect_faces_rgb(rgb_image, min_size=min_size, max_side=max_side, timings=timings)
+    ]
+    if max_faces:
+        bboxes = bboxes[:max_faces]
+    return bboxes
+
+
 def crop_and_preprocess_for_arcface(rgb_image: np.ndarray, bbox):
  
     x1, y1, x2, y2 = bbox
@@ -147,8 +248,30 @@ def crop_and_preprocess_for_arcface(rgb_image: np.ndarray, bbox):
     return face
 
 
+def preprocess_batch_for_arcface(rgb_image: np.ndarray, bboxes):
+    # one NCHW float32 tensor for all crops
+    crops = []
+    for x1, y1, x2, y2 in bboxes:
+        face = rgb_image[y1:y2, x1:x2]
+        if face.size == 0:
+            raise ValueError("BAD_CROP")
+        crops.append(cv2.resize(face, (112, 112), interpolation=cv2.INTER_AREA))
+
+    batch = np.stack(crops).astype(np.float32)
+    batch = (batch - 127.5) / 127.5
+    return np.ascontiguousarray(np.transpose(batch, (0, 3, 1, 2)))
+
+
+def optimized_model_path(model_path: str) -> str:
+    # cache file is tied to the ORT version that produced it
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.ort{ort.__version__}.opt.onnx"
+
+
 class ArcFaceONNX:
-    def __init__(self, model_path: str, providers=None):
+    def __init__(self, model_path: str, providers=None, intra_op_threads: int = 0,
+                 inter_op_threads: int = 0, cache_optimized: bool = False,
+                 detect_max_side: int = DETECT_MAX_SIDE):
         if not model_path:
             raise ValueError("model_path is required")
 
@@ -161,22 +284,127 @@ class ArcFaceONNX:
         if providers is None:
             providers = ["CPUExecutionProvider"]
 
-        self.sess = ort.InferenceSession(model_path, providers=providers)
+        self.model_path = model_path
+        self.detect_max_side = detect_max_side
+        self.loaded_from_cache = False
+        self.sess = self._create_session(model_path, providers, intra_op_threads,
+                                         inter_op_threads, cache_optimized)
         self.input_name = self.sess.get_inputs()[0].name
         self.output_name = self.sess.get_outputs()[0].name
 
-    def embed_from_rgb(self, rgb_image: np.ndarray) -> np.ndarray:
-      
-        bbox = detect_single_face_bbox_rgb(rgb_image)
+        # models exported with a fixed batch of 1 have to be run crop by crop
+        batch_dim = self.sess.get_inputs()[0].shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+
+    def _create_session(self, model_path, providers, intra_op_threads, inter_op_threads, cache_optimized):
+        def options():
+            so = ort.SessionOptions()
+            if intra_op_threads:
+                so.intra_op_num_threads = int(intra_op_threads)
+            if inter_op_threads:
+                so.inter_op_num_threads = int(inter_op_threads)
+            return so
+
+        if not cache_optimized:
+            return ort.InferenceSession(model_path, sess_options=options(), providers=providers)
+
+        cached = optimized_model_path(model_path)
+        if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(model_path):
+            so = options()
+            # graph was already optimized when the cache was written
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                sess = ort.InferenceSession(cached, sess_options=so, providers=providers)
+                self.loaded_from_cache = True
+                return sess
+            except Exception:
+                pass
+
+        # ENABLE_ALL may bake in CPU-specific layouts: the cache is only
+        # meant for workers on the machine that wrote it
+        so = options()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # workers starting together each write their own file; the rename
+        # means a reader never sees a half-written cache
+        partial = f"{cached}.{os.getpid()}.tmp"
+        so.optimized_model_filepath = partial
+        sess = ort.InferenceSession(model_path, sess_options=so, providers=providers)
+        try:
+            os.replace(partial, cached)
+        except OSError:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+        return sess
+
+    def warmup(self, runs: int = 3) -> float:
+        # dummy inferences plus one pass through the detectors; returns seconds
+        started = time.perf_counter()
+        dummy = np.zeros((1, 3, 112, 112), dtype=np.float32)
+        for _ in range(max(1, runs)):
+            self.embed_batch(dummy)
+        detect_single_face_bbox_rgb(np.zeros((480, 640, 3), dtype=np.uint8))
+        return time.perf_counter() - started
+
+    def detect_faces(self, rgb_image: np.ndarray, min_size: int = MIN_FACE, timings=None):
+        return detect_faces_rgb(rgb_image, min_size=min_size, max_side=self.detect_max_side, timings=timings)
+
+    def preprocess_rgb(self, rgb_image: np.ndarray, timings=None, bbox=None, detect=True) -> np.ndarray:
+        # (1, 3, 112, 112) input for the main face, cropped from the full-resolution frame;
+        # detect=False: the caller already detected and found nothing, use the centre crop
+        if bbox is None and not detect:
+            bbox = centre_crop_bbox(rgb_image.shape)
+        if bbox is None:
+            bbox = detect_single_face_bbox_rgb(rgb_image, max_side=self.detect_max_side, timings=timings)
+        started = time.perf_counter()
         x = crop_and_preprocess_for_arcface(rgb_image, bbox)
+        _lap(timings, "crop", started)
+        return x
 
+    def embed_from_rgb(self, rgb_image: np.ndarray, timings=None, bbox=None, detect=True) -> np.ndarray:
+      
+        x = self.preprocess_rgb(rgb_image, timings=timings, bbox=bbox, detect=detect)
+
+        started = time.perf_counter()
         out = self.sess.run([self.output_name], {self.input_name: x})[0]
         emb = out[0].astype(np.float32)
 
         
         emb = emb / (np.linalg.norm(emb) + 1e-8)
+        _lap(timings, "embed", started)
         return emb
 
+    def embed_batch(self, batch: np.ndarray) -> np.ndarray:
+        # batch: (N, 3, 112, 112) -> L2-normalised (N, D) embeddings
+        if self.fixed_batch == 1 and batch.shape[0] > 1:
+            out = np.concatenate([
+                self.sess.run([self.output_name], {self.input_name: batch[i:i + 1]})[0]
+                for i in range(batch.shape[0])
+            ])
+        else:
+            out = self.sess.run([self.output_name], {self.input_name: batch})[0]
+
+        emb = out.astype(np.float32)
+        emb = emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-8)
+        return emb
+
+    def embed_all_from_rgb(self, rgb_image: np.ndarray, min_size: int = 60, max_faces: int = 0, timings=None):
+        # (bboxes, embeddings) for every face in the frame
+        bboxes = detect_all_faces_bbox_rgb(rgb_image, min_size=min_size, max_faces=max_faces,
+                                           max_side=self.detect_max_side, timings=timings)
+        if not bboxes:
+            return [], np.zeros((0, 0), dtype=np.float32)
+
+        started = time.perf_counter()
+        x = preprocess_batch_for_arcface(rgb_image, bboxes)
+        _lap(timings, "crop", started)
+
+        started = time.perf_counter()
+        emb = self.embed_batch(x)
+        _lap(timings, "embed", started)
+        return bboxes, emb
+
     def detect_and_crop_face(self, rgb_image: np.ndarray):
       
         bbox = detect_single_face_bbox_rgb(rgb_image)
@@ -0,0 +1,357 @@
+import threading
+
+import numpy as np
+
+
+STORAGE_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+# rows upcast to float32 at a time when scoring a compact matrix
+SCORE_CHUNK = 8192
+
+
+class FaceGallery:
+    """
+    In-memory embedding gallery: one contiguous matrix with a parallel id
+    array. Removed rows are tombstoned (id -1) and reused, so row indices
+    stay stable. ``storage`` is float32, float16 or int8 (per-row scale);
+    compact galleries re-rank their top ``rerank`` hits exactly through
+    ``rerank_source`` (keys -> float32 embeddings).
+    """
+
+    def __init__(self, dim=None, capacity=1024, storage="float32", rerank=0, rerank_source=None):
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown gallery storage: {storage}")
+
+        self.dim = dim
+        self.storage = storage
+        self.rerank = int(rerank)
+        self.rerank_source = rerank_source
+        self._capacity = capacity
+        self._matrix = None
+        self._scales = None
+        self._ids = None
+        self._rows = {}
+        self._free = []
+        self._size = 0
+        self._lock = threading.RLock()
+        self.version = 0
+
+        self.index = None
+        self._lists = None
+        self._inverted = None
+
+        if dim is not None:
+            self._allocate(dim, capacity)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    @property
+    def nbytes(self):
+        """Bytes held by the embedding codes (and int8 scales)."""
+        if self._matrix is None:
+            return 0
+        total = self._matrix[:self._size].nbytes
+        if self._scales is not None:
+            total += self._scales[:self._size].nbytes
+        return total
+
+    def _allocate(self, dim, capacity):
+        self.dim = int(dim)
+        self._capacity = max(int(capacity), 1)
+        self._matrix = np.zeros((self._capacity, self.dim), dtype=STORAGE_DTYPES[self.storage])
+        self._ids = np.full(self._capacity, -1, dtype=np.int64)
+        if self.storage == "int8":
+            self._scales = np.zeros(self._capacity, dtype=np.float32)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        matrix = np.zeros((capacity, self.dim), dtype=self._matrix.dtype)
+        ids = np.full(capacity, -1, dtype=np.int64)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        if self._scales is not None:
+            scales = np.zeros(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+        if self._lists is not None:
+            lists = np.full(capacity, -1, dtype=np.int32)
+            lists[:self._size] = self._lists[:self._size]
+            self._lists = lists
+        self._matrix, self._ids, self._capacity = matrix, ids, capacity
+
+    def _as_vector(self, embedding):
+        if isinstance(embedding, np.ndarray):
+            vec = embedding.astype(np.float32, copy=False).reshape(-1)
+        else:
+            vec = np.frombuffer(embedding, dtype=np.float32)
+        if vec.size == 0:
+            return None
+        if self.dim is None:
+            self._allocate(vec.size, self._capacity)
+        if vec.size != self.dim:
+            return None
+        return vec
+
+    def _encode(self, row, vec):
+        if self.storage == "int8":
+            scale = float(np.abs(vec).max()) / 127.0 or 1.0
+            self._matrix[row] = np.clip(np.rint(vec / scale), -127, 127)
+            self._scales[row] = scale
+        else:
+            self._matrix[row] = vec
+
+    def _decode(self, rows):
+        block = self._matrix[rows].astype(np.float32)
+        if self._scales is not None:
+            block *= self._scales[rows, None]
+        return block
+
+    def _scores(self, rows, probes):
+        # probes: (D, M) float32 -> (len(rows), M) scores
+        if self.storage == "float32":
+            return self._matrix[rows] @ probes
+
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(self._size))
+        out = np.empty((rows.size, probes.shape[1]), dtype=np.float32)
+        for start in range(0, rows.size, SCORE_CHUNK):
+            part = rows[start:start + SCORE_CHUNK]
+            out[start:start + part.size] = self._matrix[part].astype(np.float32) @ probes
+        if self._scales is not None:
+            out *= self._scales[rows, None]
+        return out
+
+    def upsert(self, key, embedding, assign=True):
+        """Insert or replace the embedding owned by ``key``. Returns the row or None."""
+        with self._lock:
+            vec = self._as_vector(embedding)
+            if vec is None:
+                self.remove(key)
+                return None
+
+            row = self._rows.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == self._capacity:
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[key] = row
+                self._ids[row] = key
+
+            self._encode(row, vec)
+            if self.index is not None and assign:
+                self._assign_row(key, row, vec)
+            self.version += 1
+            return row
+
+    def remove(self, key):
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return None
+            self._ids[row] = -1
+            self._matrix[row] = 0
+            if self._scales is not None:
+                self._scales[row] = 0.0
+            self._free.append(row)
+            if self.index is not None:
+                self.index.assignments.pop(key, None)
+                self._lists[row] = -1
+                self._inverted = None
+            self.version += 1
+            return row
+
+    def load(self, items):
+        """Replace the whole gallery from an iterable of (key, embedding)."""
+        with self._lock:
+            self._rows = {}
+            self._free = []
+            self._size = 0
+            if self._ids is not None:
+                self._ids[:] = -1
+            if self._lists is not None:
+                self._lists[:] = -1
+            for key, embedding in items:
+                self.upsert(key, embedding, assign=False)
+            if self.index is not None:
+                self._assign_all()
+            self.version += 1
+
+    def attach_index(self, index):
+        """
+        Route full-gallery searches through an IVF index. Every row is
+        assigned to its cell from the current embeddings, here and on each
+        load(); assignments stored with the index are not trusted, since
+        students may have re-enrolled since it was built.
+        """
+        with self._lock:
+            self.index = index
+            self._assign_all()
+
+    def _assign_all(self):
+        self._lists = np.full(self._capacity, -1, dtype=np.int32)
+        self._inverted = None
+        if not self._rows:
+            self.index.assignments = {}
+            return
+        keys = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        cells = self.index.assign(self._decode(rows))
+        self._lists[rows] = cells
+        self.index.assignments = dict(zip(keys.tolist(), cells.tolist()))
+
+    def detach_index(self):
+        with self._lock:
+            self.index = None
+            self._lists = None
+            self._inverted = None
+
+    def _assign_row(self, key, row, vec):
+        cell = int(self.index.assign(vec)[0])
+        self.index.assignments[key] = cell
+        self._lists[row] = cell
+        self._inverted = None
+
+    def _candidate_rows(self, probe, nprobe):
+        if self._inverted is None:
+            lists = self._lists[:self._size]
+            order = np.argsort(lists, kind="stable")
+            offsets = np.searchsorted(lists[order], np.arange(self.index.nlist + 1))
+            self._inverted = (order, offsets)
+
+        order, offsets = self._inverted
+        cells = self.index.probe_lists(probe, nprobe)
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in cells])
+
+    def vectors(self):
+        """(keys, float32 matrix) copies of the live rows."""
+        with self._lock:
+            if self._ids is None:
+                return np.empty(0, np.int64), np.empty((0, 0), np.float32)
+            live = np.flatnonzero(self._ids[:self._size] >= 0)
+            return self._ids[live].copy(), self._decode(live)
+
+    def sample_vectors(self, n, rng):
+        with self._lock:
+            live = np.flatnonzero(self._ids[:self._size] >= 0)
+            pick = rng.choice(live, min(n, live.size), replace=False)
+            return self._decode(pick)
+
+    def row_of(self, key):
+        return self._rows.get(key)
+
+    def rows_for(self, keys):
+        rows = [self._rows[k] for k in keys if k in self._rows]
+        return np.asarray(sorted(rows), dtype=np.int64)
+
+    def search(self, probe, k=1, rows=None, exact=False, nprobe=None):
+        """
+        Top-k (key, score) pairs by dot product, best first.
+        ``rows`` restricts the search to a subset of gallery rows; otherwise
+        an attached IVF index picks the shortlist unless ``exact`` is set.
+        """
+        with self._lock:
+            if not self._rows:
+                return []
+
+            probe = np.asarray(probe, dtype=np.float32).reshape(-1)
+            if probe.size != self.dim:
+                return []
+
+            if rows is None and self.index is not None and not exact:
+                rows = self._candidate_rows(probe, nprobe)
+
+            if rows is None:
+                rows = slice(0, self._size)
+            else:
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[rows < self._size]
+            ids = self._ids[rows]
+            scores = self._scores(rows, probe[:, None])[:, 0]
+
+        matches = _top_k(ids, scores, max(k, self._rerank_depth()))
+        return self._rerank([matches], probe[None, :])[0][:k]
+
+    def search_batch(self, probes, k=1, rows=None, exact=False, nprobe=None):
+        """search() for an (M, D) block of probes, as one matrix product."""
+        probes = np.asarray(probes, dtype=np.float32)
+        if probes.ndim == 1:
+            probes = probes[None, :]
+
+        # IVF shortlists differ per probe
+        if rows is None and self.index is not None and not exact:
+            return [self.search(p, k=k, nprobe=nprobe) for p in probes]
+
+        with self._lock:
+            if not self._rows or probes.shape[1] != self.dim:
+                return [[] for _ in range(probes.shape[0])]
+
+            if rows is None:
+                rows = slice(0, self._size)
+            else:
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[rows < self._size]
+            ids = self._ids[rows]
+            scores = self._scores(rows, probes.T)
+
+        depth = max(k, self._rerank_depth())
+        results = self._rerank([_top_k(ids, scores[:, j], depth) for j in range(probes.shape[0])], probes)
+        return [r[:k] for r in results]
+
+    def _rerank_depth(self):
+        if self.storage == "float32" or self.rerank_source is None:
+            return 0
+        return self.rerank
+
+    def _rerank(self, results, probes):
+        # exact float32 re-scoring of compact-code candidates
+        if not self._rerank_depth():
+            return results
+
+        keys = {key for matches in results for key, _ in matches}
+        if not keys:
+            return results
+        exact = self.rerank_source(sorted(keys))
+
+        reranked = []
+        for probe, matches in zip(probes, results):
+            rescored = []
+            for key, score in matches:
+                vec = exact.get(key)
+                if vec is not None:
+                    score = float(np.dot(vec, probe))
+                rescored.append((key, score))
+            rescored.sort(key=lambda m: m[1], reverse=True)
+            reranked.append(rescored)
+        return reranked
+
+
+def _top_k(ids, scores, k):
+    scores = np.where(ids >= 0, scores, -np.inf)
+    n = scores.shape[0]
+    if n == 0 or k <= 0:
+        return []
+
+    k = min(k, n)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+
+    return [
+        (int(ids[i]), float(scores[i]))
+        for i in idx
+        if np.isfinite(scores[i])
+    ]
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+
+# reason codes returned by assess_face
+QUALITY_OK = "OK"
+NO_FACE = "NO_FACE"
+FACE_TOO_SMALL = "FACE_TOO_SMALL"
+LOW_DETECTOR_CONFIDENCE = "LOW_DETECTOR_CONFIDENCE"
+UNDEREXPOSED = "UNDEREXPOSED"
+OVEREXPOSED = "OVEREXPOSED"
+TOO_BLURRY = "TOO_BLURRY"
+
+# blur is measured on a crop of this size so the score does not depend on face size
+_SHARPNESS_SIDE = 112
+
+
+def assess_face(rgb_image: np.ndarray, bbox, score=None, min_face: int = 60, min_score: float = 0.5,
+                min_sharpness: float = 40.0, min_brightness: float = 40.0, max_brightness: float = 220.0):
+    """
+    Cheap pre-embedding checks on a detected face, cheapest first.
+    Returns (ok, reason, metrics); ``reason`` is one of the codes above.
+    ``score`` is the detector confidence (None for Haar, which has none).
+    """
+    if bbox is None:
+        return False, NO_FACE, {}
+
+    x1, y1, x2, y2 = bbox
+    metrics = {"face_size": int(min(x2 - x1, y2 - y1))}
+    if metrics["face_size"] < min_face:
+        return False, FACE_TOO_SMALL, metrics
+
+    if score is not None:
+        metrics["detector_score"] = round(float(score), 3)
+        if score < min_score:
+            return False, LOW_DETECTOR_CONFIDENCE, metrics
+
+    gray = cv2.cvtColor(rgb_image[y1:y2, x1:x2], cv2.COLOR_RGB2GRAY)
+    if gray.size == 0:
+        return False, NO_FACE, metrics
+    if max(gray.shape) > _SHARPNESS_SIDE:
+        gray = cv2.resize(gray, (_SHARPNESS_SIDE, _SHARPNESS_SIDE), interpolation=cv2.INTER_AREA)
+
+    brightness = float(gray.mean())
+    metrics["brightness"] = round(brightness, 1)
+    if brightness < min_brightness:
+        return False, UNDEREXPOSED, metrics
+    if brightness > max_brightness:
+        return False, OVEREXPOSED, metrics
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    metrics["sharpness"] = round(sharpness, 1)
+    if sharpness < min_sharpness:
+        return False, TOO_BLURRY, metrics
+
+    return True, QUALITY_OK, metrics
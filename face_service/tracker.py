@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def box_iou(a, b) -> float:
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    iw = min(ax2, bx2) - max(ax1, bx1)
+    ih = min(ay2, by2) - max(ay1, by1)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("bbox", "identity", "score", "last_seen", "embedded_at", "hits")
+
+    def __init__(self, bbox, identity, score, now):
+        self.bbox = bbox
+        self.identity = identity
+        self.score = score
+        self.last_seen = now
+        self.embedded_at = now
+        self.hits = 0
+
+
+class FaceTracker:
+    """
+    Per-device IoU tracker for kiosk cameras.
+
+    A face box that overlaps a live track of the same device (IoU at or
+    above ``iou_threshold``, seen within ``ttl`` seconds) inherits that
+    track's identity, so the caller can skip the embedding and gallery
+    search. A track is re-embedded once ``reembed_after`` seconds have
+    passed since its last embedding, and forgotten when it stops being
+    seen for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=1.5, iou_threshold=0.4, reembed_after=3.0, max_devices=256):
+        self.ttl = float(ttl)
+        self.iou_threshold = float(iou_threshold)
+        self.reembed_after = float(reembed_after)
+        self.max_devices = int(max_devices)
+        self._devices = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _tracks(self, device, now):
+        tracks = self._devices.get(device)
+        if tracks is None:
+            tracks = []
+            self._devices[device] = tracks
+            while len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(device)
+            tracks[:] = [t for t in tracks if now - t.last_seen <= self.ttl]
+        return tracks
+
+    def _best(self, tracks, bbox):
+        best, best_iou = None, self.iou_threshold
+        for track in tracks:
+            iou = box_iou(track.bbox, bbox)
+            if iou >= best_iou:
+                best, best_iou = track, iou
+        return best
+
+    def lookup(self, device, bbox, now=None):
+        """
+        Track to reuse for ``bbox``, or None when the face must be embedded.
+        A hit moves the track to the new box.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            track = self._best(self._tracks(device, now), bbox)
+            if track is None or track.identity is None or now - track.embedded_at >= self.reembed_after:
+                self.misses += 1
+                return None
+
+            track.bbox = bbox
+            track.last_seen = now
+            track.hits += 1
+            self.hits += 1
+            return track
+
+    def update(self, device, bbox, identity, score, now=None):
+        """Record a fresh embedding result for the face at ``bbox``."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tracks = self._tracks(device, now)
+            track = self._best(tracks, bbox)
+            if track is None:
+                track = Track(bbox, identity, score, now)
+                tracks.append(track)
+            else:
+                track.bbox = bbox
+                track.identity = identity
+                track.score = score
+                track.last_seen = now
+                track.embedded_at = now
+            return track
+
+    def forget(self, device):
+        with self._lock:
+            self._devices.pop(device, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "devices": len(self._devices),
+                "tracks": sum(len(t) for t in self._devices.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 import os
+import django
 import environ
 
 
@@ -17,6 +18,122 @@ ARCFACE_MODEL_PATH = env(
     default=str(BASE_DIR / "face_service" / "arcface.onnx")
 )
 
+# load + warm up the face engine at startup instead of on the first request
+# (runserver; under gunicorn use the post_worker_init hook from the README)
+FACE_EAGER_LOAD = env.bool("FACE_EAGER_LOAD", default=True)
+FACE_WARMUP_RUNS = env.int("FACE_WARMUP_RUNS", default=3)
+ARCFACE_CACHE_OPTIMIZED = env.bool("ARCFACE_CACHE_OPTIMIZED", default=True)  # persist ORT-optimized graph next to the model
+ORT_INTRA_OP_THREADS = env.int("ORT_INTRA_OP_THREADS", default=0)  # 0 = ORT default, per worker process
+ORT_INTER_OP_THREADS = env.int("ORT_INTER_OP_THREADS", default=0)
+
+# face detection runs on a copy downscaled to this long side (0 = full resolution);
+# the ArcFace crop always comes from the full-resolution frame
+FACE_DETECT_MAX_SIDE = env.int("FACE_DETECT_MAX_SIDE", default=640)
+
+# cheap checks before any ArcFace inference; rejected frames return a reason code
+# (NO_FACE, FACE_TOO_SMALL, LOW_DETECTOR_CONFIDENCE, UNDEREXPOSED, OVEREXPOSED, TOO_BLURRY)
+FACE_QUALITY_GATE = env.bool("FACE_QUALITY_GATE", default=True)
+FACE_QUALITY_MIN_FACE = env.int("FACE_QUALITY_MIN_FACE", default=60)
+FACE_QUALITY_MIN_SCORE = env.float("FACE_QUALITY_MIN_SCORE", default=0.5)
+FACE_QUALITY_MIN_SHARPNESS = env.float("FACE_QUALITY_MIN_SHARPNESS", default=40.0)
+FACE_QUALITY_MIN_BRIGHTNESS = env.float("FACE_QUALITY_MIN_BRIGHTNESS", default=40.0)
+FACE_QUALITY_MAX_BRIGHTNESS = env.float("FACE_QUALITY_MAX_BRIGHTNESS", default=220.0)
+
+# per-camera face tracking: a face box overlapping the previous frame's box (IoU)
+# reuses its identity and is only re-embedded every FACE_TRACK_REEMBED_SECONDS.
+# Only matched faces are tracked, and only to repeat a row already written.
+# Cameras are told apart by the X-DEVICE-ID header (else device key + client address)
+FACE_TRACKING_ENABLED = env.bool("FACE_TRACKING_ENABLED", default=True)
+FACE_TRACK_TTL = env.float("FACE_TRACK_TTL", default=1.5)
+FACE_TRACK_IOU = env.float("FACE_TRACK_IOU", default=0.4)
+FACE_TRACK_REEMBED_SECONDS = env.float("FACE_TRACK_REEMBED_SECONDS", default=3.0)
+
+# in-memory gallery codes: float32 | float16 | int8 (per-vector scale);
+# compact codes re-rank their top FACE_GALLERY_RERANK candidates exactly
+FACE_GALLERY_STORAGE = env("FACE_GALLERY_STORAGE", default="float32")
+FACE_GALLERY_RERANK = env.int("FACE_GALLERY_RERANK", default=8)
+FACE_GALLERY_RERANK_CACHE = env.int("FACE_GALLERY_RERANK_CACHE", default=4096)  # float32 vectors kept for re-ranking
+
+# approximate nearest-neighbour (IVF) index for very large galleries
+FACE_ANN_INDEX_PATH = env("FACE_ANN_INDEX_PATH", default=str(BASE_DIR / "face_service" / "gallery_ivf.npz"))
+FACE_ANN_MIN_GALLERY = env.int("FACE_ANN_MIN_GALLERY", default=50000)
+FACE_ANN_NLIST = env.int("FACE_ANN_NLIST", default=0)  # 0 = 4 * sqrt(gallery size)
+FACE_ANN_NPROBE = env.int("FACE_ANN_NPROBE", default=0)  # 0 = calibrated value stored in the index
+FACE_ANN_RECALL_TARGET = env.float("FACE_ANN_RECALL_TARGET", default=0.99)
+FACE_ANN_EXACT_FALLBACK = env.bool("FACE_ANN_EXACT_FALLBACK", default=True)
+
+# multi-face classroom capture (/auth/verify-multi/)
+FACE_MULTI_MIN_SIZE = env.int("FACE_MULTI_MIN_SIZE", default=32)
+FACE_MULTI_MAX_FACES = env.int("FACE_MULTI_MAX_FACES", default=80)
+
+# dynamic micro-batching of concurrent ArcFace inferences
+FACE_BATCHING_ENABLED = env.bool("FACE_BATCHING_ENABLED", default=False)
+FACE_BATCH_MAX_SIZE = env.int("FACE_BATCH_MAX_SIZE", default=16)
+FACE_BATCH_MAX_WAIT_MS = env.float("FACE_BATCH_MAX_WAIT_MS", default=5.0)
+
+# AuditLog / AttendanceBackup rows are journaled to AUDIT_JOURNAL_DIR and
+# bulk-inserted in the background (size or time trigger, flushed at exit);
+# journals of crashed processes are replayed by the next writer
+AUDIT_WRITER_ENABLED = env.bool("AUDIT_WRITER_ENABLED", default=True)
+AUDIT_WRITER_BATCH = env.int("AUDIT_WRITER_BATCH", default=200)
+AUDIT_WRITER_FLUSH_SECONDS = env.float("AUDIT_WRITER_FLUSH_SECONDS", default=1.0)
+AUDIT_JOURNAL_DIR = env("AUDIT_JOURNAL_DIR", default=str(BASE_DIR / "audit_journal"))
+AUDIT_JOURNAL_FSYNC = env.bool("AUDIT_JOURNAL_FSYNC", default=False)
+AUDIT_WRITER_MAX_QUEUED = env.int("AUDIT_WRITER_MAX_QUEUED", default=50000)  # records held in memory; the rest are read back from the journal
+
+# repeat recognitions of the same (student, room, status) within this many
+# seconds return the earlier Attendance row instead of writing (0 = off)
+ATTENDANCE_DEBOUNCE_SECONDS = env.float("ATTENDANCE_DEBOUNCE_SECONDS", default=60.0)
+ATTENDANCE_DEBOUNCE_MAX_ENTRIES = env.int("ATTENDANCE_DEBOUNCE_MAX_ENTRIES", default=4096)
+
+# /auth/rollups/ occupancy: students whose latest IN was in the room within
+# this many minutes (cameras record arrivals only, so IN - OUT only grows)
+OCCUPANCY_WINDOW_MINUTES = env.float("OCCUPANCY_WINDOW_MINUTES", default=60.0)
+
+# opt-in: students enrolled in a CourseSession running in the room (on its
+# weekday) are authorized without a RoomAccess row (an explicit
+# allowed=False still denies); attendance is tagged with the session either way
+SCHEDULE_AUTHORIZATION = env.bool("SCHEDULE_AUTHORIZATION", default=False)
+# a session accepts (and tags) arrivals from this many minutes before it starts
+SCHEDULE_EARLY_MINUTES = env.float("SCHEDULE_EARLY_MINUTES", default=15.0)
+
+# dashboard push (/auth/attendance/stream/): each open stream holds a worker
+# thread, so it is opt-in (the dashboard polls ?since= otherwise) and capped
+# per process; streams poll the attendance version stamp every
+# ATTENDANCE_STREAM_POLL_SECONDS and close after ATTENDANCE_STREAM_SECONDS
+ATTENDANCE_STREAM_ENABLED = env.bool("ATTENDANCE_STREAM_ENABLED", default=False)
+ATTENDANCE_STREAM_MAX = env.int("ATTENDANCE_STREAM_MAX", default=4)
+ATTENDANCE_STREAM_SECONDS = env.float("ATTENDANCE_STREAM_SECONDS", default=300.0)
+ATTENDANCE_STREAM_POLL_SECONDS = env.float("ATTENDANCE_STREAM_POLL_SECONDS", default=1.0)
+
+# term reports (/auth/reports/attendance/): arrivals later than this many
+# minutes after session start count as late; sessions without a weekday
+# meet on these Python weekdays (0 = Monday) unless the request passes weekdays=
+REPORT_LATE_MINUTES = env.float("REPORT_LATE_MINUTES", default=10.0)
+REPORT_WEEKDAYS = env.list("REPORT_WEEKDAYS", cast=int, default=[0, 1, 2, 3, 4])
+
+# cold tier: archive_attendance moves rows older than this many days into
+# memory-mapped segment files under ATTENDANCE_ARCHIVE_DIR
+ATTENDANCE_ARCHIVE_DIR = env("ATTENDANCE_ARCHIVE_DIR", default=str(BASE_DIR / "archive"))
+ATTENDANCE_ARCHIVE_AFTER_DAYS = env.int("ATTENDANCE_ARCHIVE_AFTER_DAYS", default=365)
+
+# compact_audit_log keeps this many days of AuditLog in the table and rolls
+# older days into signed, compressed day segments under AUDIT_ARCHIVE_DIR
+AUDIT_ARCHIVE_DIR = env("AUDIT_ARCHIVE_DIR", default=str(BASE_DIR / "audit_archive"))
+AUDIT_RETENTION_DAYS = env.int("AUDIT_RETENTION_DAYS", default=90)
+
+# verify_integrity / /auth/integrity/: rows per sealed hash-chain block,
+# how old rows must be before they are sealed, and worker processes
+# (0 = one per CPU; the API checks in-process by default)
+INTEGRITY_BLOCK_ROWS = env.int("INTEGRITY_BLOCK_ROWS", default=4096)
+INTEGRITY_SEAL_LAG_SECONDS = env.float("INTEGRITY_SEAL_LAG_SECONDS", default=300.0)
+INTEGRITY_WORKERS = env.int("INTEGRITY_WORKERS", default=0)
+INTEGRITY_API_WORKERS = env.int("INTEGRITY_API_WORKERS", default=1)
+
+# backup_attendance --incremental leaves rows younger than this for the
+# next run, so a row committed late behind a higher id is not skipped
+BACKUP_LAG_SECONDS = env.float("BACKUP_LAG_SECONDS", default=300.0)
+
 
 
 SECRET_KEY = env("SECRET_KEY", default="django-insecure-dev-key") 
@@ -114,6 +231,29 @@ DATABASES = {
     }
 }
 
+# Version stamps (auth_app.versioning) tell every worker process that the
+# gallery, room access, schedule, search index or attendance changed, so
+# the cache must be shared by all workers. The file cache works for workers
+# on one host; point CACHE_URL at Redis/Memcached across hosts. A
+# per-process cache (locmemcache://) is refused when WEB_CONCURRENCY > 1.
+CACHES = {"default": env.cache("CACHE_URL", default=f"filecache://{BASE_DIR / 'cache'}")}
+
+# High-concurrency SQLite mode: WAL, synchronous=NORMAL, busy timeout and
+# mmap on every connection, BEGIN IMMEDIATE transactions (no lock-upgrade
+# deadlocks between workers), and verify/enroll/audit writes grouped into
+# shared commits by one writer thread per process. Compare with
+# `manage.py bench_sqlite_writes` on a throwaway database.
+SQLITE_CONCURRENCY_MODE = env.bool("SQLITE_CONCURRENCY_MODE", default=False)
+SQLITE_SINGLE_WRITER = env.bool("SQLITE_SINGLE_WRITER", default=True)
+SQLITE_WRITER_BATCH = env.int("SQLITE_WRITER_BATCH", default=64)  # jobs per group commit
+SQLITE_WRITER_TIMEOUT_SECONDS = env.float("SQLITE_WRITER_TIMEOUT_SECONDS", default=30.0)
+SQLITE_BUSY_TIMEOUT_MS = env.int("SQLITE_BUSY_TIMEOUT_MS", default=5000)
+SQLITE_MMAP_SIZE = env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024)
+SQLITE_CACHE_KB = env.int("SQLITE_CACHE_KB", default=64 * 1024)
+if SQLITE_CONCURRENCY_MODE and django.VERSION >= (5, 1):
+    # transaction_mode is new in Django 5.1; older versions keep DEFERRED
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.TokenAuthentication",